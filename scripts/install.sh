@@ -186,7 +186,8 @@ sed "s/\$SERVICE_USER/$SERVICE_USER/" "$SYSTEM_FILES/etc/sudoers.d/oakhz-camilla
 chmod 440 /etc/sudoers.d/oakhz-camilladsp
 
 # Give permissions to write on CamillaDSP config
-chown $SERVICE_USER:$SERVICE_USER /opt/camilladsp/config.yml
+# (the directory too: config.yml is replaced atomically through a temp file)
+chown $SERVICE_USER:$SERVICE_USER /opt/camilladsp /opt/camilladsp/config.yml
 
 echo -e "${GREEN}OaKhz Audio hostname configuration...${NC}"
 
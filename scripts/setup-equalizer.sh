@@ -86,7 +86,12 @@ apt install -y \
     python3-flask-cors \
     python3-yaml \
     python3-websocket \
-    python3-ruamel.yaml
+    python3-ruamel.yaml \
+    python3-dbus \
+    python3-gi \
+    python3-pulsectl \
+    python3-brotli \
+    python3-numpy
 
 echo -e "${GREEN}✓ Python dependencies installed${NC}"
 
@@ -96,15 +101,31 @@ echo -e "${GREEN}✓ Python dependencies installed${NC}"
 echo -e "${YELLOW}[2/4] Installing web interface...${NC}"
 
 # Creating directories
-mkdir -p $INSTALL_DIR/templates
+mkdir -p $INSTALL_DIR/templates $INSTALL_DIR/static
 cd $INSTALL_DIR
 
 # Flask server
 copy_system_file "opt/oakhz/eq_server.py" "$INSTALL_DIR/eq_server.py"
 chmod +x $INSTALL_DIR/eq_server.py
 
+# Shared modules (also used by the rotary controller)
+copy_system_file "opt/oakhz/bluez_client.py" "$INSTALL_DIR/bluez_client.py"
+copy_system_file "opt/oakhz/pulse_client.py" "$INSTALL_DIR/pulse_client.py"
+copy_system_file "opt/oakhz/async_server.py" "$INSTALL_DIR/async_server.py"
+copy_system_file "opt/oakhz/captive_portal.py" "$INSTALL_DIR/captive_portal.py"
+
 # Web Interface HTML
 copy_system_file "opt/oakhz/templates/index.html" "$INSTALL_DIR/templates/index.html"
+copy_system_file "opt/oakhz/static/oakhz.css" "$INSTALL_DIR/static/oakhz.css"
+copy_system_file "opt/oakhz/static/oakhz.js" "$INSTALL_DIR/static/oakhz.js"
+copy_system_file "opt/oakhz/web_assets.py" "$INSTALL_DIR/web_assets.py"
+copy_system_file "opt/oakhz/eq_response.py" "$INSTALL_DIR/eq_response.py"
+copy_system_file "opt/oakhz/dsp_cost.py" "$INSTALL_DIR/dsp_cost.py"
+copy_system_file "opt/oakhz/dsp_diff.py" "$INSTALL_DIR/dsp_diff.py"
+copy_system_file "opt/oakhz/loudness.py" "$INSTALL_DIR/loudness.py"
+
+# Hashed + precompressed (gzip, brotli) copies of the CSS/JS, served from memory
+python3 $INSTALL_DIR/web_assets.py build
 
 # Service systemd pour l'equalizer
 copy_system_file "etc/systemd/system/oakhz-equalizer.service" "/etc/systemd/system/oakhz-equalizer.service"
@@ -173,6 +194,6 @@ echo "  sudo journalctl -u oakhz-equalizer -f"
 echo ""
 echo "Configuration files:"
 echo "  • Flask server: /opt/oakhz/eq_server.py"
-echo "  • Web UI: /opt/oakhz/templates/index.html"
+echo "  • Web UI: /opt/oakhz/templates/index.html, /opt/oakhz/static/"
 echo "  • CamillaDSP config: /opt/camilladsp/config.yml"
 echo ""
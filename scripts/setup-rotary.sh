@@ -37,7 +37,7 @@ echo -e "${GREEN}Installing rotary encoder control...${NC}"
 # Install dependencies
 echo "Installing Python dependencies..."
 apt update
-apt install -y python3-gpiozero python3-rpi.gpio playerctl
+apt install -y python3-gpiozero python3-rpi.gpio python3-dbus python3-pulsectl playerctl
 
 echo "Creating rotary encoder control script..."
 
@@ -48,6 +48,13 @@ copy_system_file "usr/local/bin/oakhz-rotary.py" "/usr/local/bin/oakhz-rotary.py
 
 chmod +x /usr/local/bin/oakhz-rotary.py
 
+# Shared BlueZ D-Bus and PulseAudio clients (also used by the web equalizer)
+mkdir -p /opt/oakhz
+copy_system_file "opt/oakhz/bluez_client.py" "/opt/oakhz/bluez_client.py"
+copy_system_file "opt/oakhz/pulse_client.py" "/opt/oakhz/pulse_client.py"
+copy_system_file "opt/oakhz/button_gestures.py" "/opt/oakhz/button_gestures.py"
+copy_system_file "opt/oakhz/volume_accel.py" "/opt/oakhz/volume_accel.py"
+
 # ============================================
 # Systemd service for rotary encoder
 # ============================================
@@ -31,8 +31,8 @@ echo "Installing audio feedback services..."
 # Create sounds directory
 mkdir -p $SOUNDS_DIR
 
-# Install sox for WAV generation (no mpg123 needed with paplay)
-apt install -y sox pulseaudio-utils
+# sox converts the sounds at install time (no mpg123 needed: nothing is decoded at runtime)
+apt install -y sox pulseaudio-utils python3-dbus python3-gi python3-pulsectl python3-ruamel.yaml python3-alsaaudio
 
 echo "Creating audio feedback scripts..."
 
@@ -44,6 +44,12 @@ copy_system_file "usr/local/bin/oakhz-audio-events.py" "/usr/local/bin/oakhz-aud
 
 chmod +x /usr/local/bin/oakhz-audio-events.py
 
+# Shared BlueZ D-Bus and PulseAudio clients
+copy_system_file "opt/oakhz/bluez_client.py" "/opt/oakhz/bluez_client.py"
+copy_system_file "opt/oakhz/pulse_client.py" "/opt/oakhz/pulse_client.py"
+copy_system_file "opt/oakhz/sound_assets.py" "/opt/oakhz/sound_assets.py"
+copy_system_file "opt/oakhz/alsa_playback.py" "/opt/oakhz/alsa_playback.py"
+
 # Systemd service for unified audio events manager
 copy_system_file "etc/systemd/system/oakhz-audio-events.service" "/etc/systemd/system/oakhz-audio-events.service"
 
@@ -67,9 +73,12 @@ copy_system_file "opt/oakhz/sounds/connect.wav"    "$SOUNDS_DIR/connect.wav"
 copy_system_file "opt/oakhz/sounds/disconnect.wav" "$SOUNDS_DIR/disconnect.wav"
 copy_system_file "opt/oakhz/sounds/shutdown.wav"   "$SOUNDS_DIR/shutdown.wav"
 
+# Convert to CamillaDSP's capture format (48 kHz S16LE stereo), trim and normalize
+python3 /opt/oakhz/sound_assets.py build
+
 # Permissions
 chown -R root:root $SOUNDS_DIR
-chmod 644 $SOUNDS_DIR/*.wav
+chmod 644 $SOUNDS_DIR/*.wav $SOUNDS_DIR/native/*
 
 echo "Enabling services..."
 
@@ -94,7 +103,8 @@ echo "  - connect.wav     : Played on Bluetooth device connection"
 echo "  - disconnect.wav  : Played on device disconnection (not used currently)"
 echo "  - shutdown.wav    : Played before system shutdown"
 echo ""
-echo "To replace sounds, copy your own WAV files (48kHz, stereo) to $SOUNDS_DIR"
+echo "To replace sounds, copy your own WAV/MP3/FLAC files to $SOUNDS_DIR"
+echo "then run: sudo python3 /opt/oakhz/sound_assets.py build"
 echo ""
 echo "Useful commands:"
 echo "  sudo systemctl status oakhz-audio-events"
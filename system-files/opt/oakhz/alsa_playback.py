@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+OaKhz Audio - Direct ALSA playback of preconverted sounds
+Writes the PCM of a native sound build (sound_assets.py) straight into the ALSA
+loopback CamillaDSP captures from, without PulseAudio, so the ready chime can
+play as soon as CamillaDSP runs. The sound file is mapped, not read: each period
+handed to ALSA is a slice of the mapping, and only a final partial period is
+copied, to pad it with silence.
+
+`device` is an ALSA PCM name ('hw:Loopback,0,0', or 'null' for alsa-lib's null
+plugin) or 'file:PATH', which writes the periods to a file instead of a sound card:
+
+    python3 /opt/oakhz/alsa_playback.py ready file:/tmp/ready.raw
+"""
+import logging
+import os
+import sys
+import time
+
+try:
+    import alsaaudio
+except ImportError:
+    alsaaudio = None
+
+logger = logging.getLogger(__name__)
+
+# Subdevice 0 pinned: it is the one CamillaDSP captures (hw:Loopback,1,0), and the one
+# PulseAudio's camilladsp_out sink holds once it runs (DeviceBusy then)
+ALSA_DEVICE = 'hw:Loopback,0,0'
+ALSA_PERIOD_FRAMES = 1024      # CamillaDSP's chunksize: one period per chunk it captures
+ALSA_PERIODS = 4               # periods in the ALSA buffer (about 85 ms at 48 kHz)
+LOOPBACK_CAPTURE_STATUS = '/proc/asound/Loopback/pcm1c/sub0/status'
+LOOPBACK_WAIT_INTERVAL = 0.05  # seconds between checks for CamillaDSP's capture
+
+
+class DeviceBusy(RuntimeError):
+    """The playback subdevice is held by another client"""
+
+
+class FileSink:
+    """Stand-in for an ALSA PCM that appends every period to a file"""
+
+    def __init__(self, path, frame_bytes):
+        self.path = path
+        self.frame_bytes = frame_bytes
+        self.periods = 0
+        self._file = open(path, 'wb')
+
+    def write(self, data):
+        """Frames written, as PCM.write returns them"""
+        self._file.write(data)
+        self.periods += 1
+        return len(data) // self.frame_bytes
+
+    def close(self):
+        self._file.close()
+
+
+def open_sink(device, rate, channels, period_frames=ALSA_PERIOD_FRAMES, periods=ALSA_PERIODS):
+    """Open `device` for S16LE playback at exactly `rate` and `channels`"""
+    if device.startswith('file:'):
+        return FileSink(device[len('file:'):], 2 * channels)
+    if alsaaudio is None:
+        raise RuntimeError("python3-alsaaudio is not installed")
+    # Non-blocking: a blocking open of a busy hw device waits for it to be released
+    try:
+        return alsaaudio.PCM(alsaaudio.PCM_PLAYBACK, alsaaudio.PCM_NONBLOCK, device=device, rate=rate,
+                             channels=channels, format=alsaaudio.PCM_FORMAT_S16_LE,
+                             periodsize=period_frames, periods=periods)
+    except alsaaudio.ALSAAudioError as e:
+        if 'busy' in str(e).lower():
+            raise DeviceBusy(f"{device} is busy") from e
+        raise
+
+
+def wait_for_capture(timeout, status_path=LOOPBACK_CAPTURE_STATUS):
+    """Wait until CamillaDSP captures from the loopback (frames written before that are lost)"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with open(status_path, 'r') as f:
+                if 'RUNNING' in f.read():
+                    return True
+        except OSError:
+            pass
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(LOOPBACK_WAIT_INTERVAL)
+
+
+def play_pcm(pcm, rate, channels, device=ALSA_DEVICE, period_frames=ALSA_PERIOD_FRAMES, periods=ALSA_PERIODS):
+    """Write interleaved S16LE `pcm` (bytes-like, e.g. SoundAssets.pcm()) to `device` period by period.
+
+    Raises DeviceBusy if the subdevice is taken.
+    """
+    frame_bytes = 2 * channels
+    period = period_frames * frame_bytes
+    period_time = period_frames / rate
+    sink = open_sink(device, rate, channels, period_frames, periods)
+    try:
+        for offset in range(0, len(pcm), period):
+            chunk = pcm[offset:offset + period]
+            if len(chunk) < period:
+                chunk = bytes(chunk) + bytes(period - len(chunk))
+            chunk = memoryview(chunk)
+            while chunk:
+                # A non-blocking write takes what fits in the buffer: 0 frames when it is full
+                written = sink.write(chunk)
+                if written > 0:
+                    chunk = chunk[written * frame_bytes:]
+                else:
+                    time.sleep(period_time / 2)
+        if not isinstance(sink, FileSink):
+            # A non-blocking PCM can't drain: let the buffered periods play out before closing
+            time.sleep(periods * period_time)
+    finally:
+        sink.close()
+    return len(pcm) // frame_bytes
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (2, 3):
+        print(f"Usage: {sys.argv[0]} SOUND [DEVICE]")
+        sys.exit(1)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from sound_assets import SoundAssets
+    assets = SoundAssets()
+    fmt = assets.manifest['format']
+    start = time.monotonic()
+    frames = play_pcm(assets.pcm(sys.argv[1]), fmt['rate'], fmt['channels'], *sys.argv[2:3])
+    print(f"{sys.argv[1]}: {frames} frames in {time.monotonic() - start:.3f} s")
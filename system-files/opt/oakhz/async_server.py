@@ -0,0 +1,221 @@
+"""
+OaKhz Audio - asyncio HTTP server for the equalizer web app
+Serves the same WSGI app (eq_server.py's Flask app) from one asyncio event loop.
+Connections, keep-alive and slow clients are handled by the loop; every request
+runs in a worker thread, so blocking subprocess, D-Bus and PulseAudio calls never
+stall other clients. Each route has its own concurrency cap: a burst of slow
+requests on one route queues behind its cap instead of using every worker.
+"""
+import asyncio
+import io
+import logging
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote
+
+logger = logging.getLogger(__name__)
+
+HTTP_WORKERS = 32             # worker threads shared by all routes
+HTTP_ROUTE_LIMIT = 4          # concurrent requests per route unless listed in limits
+HTTP_QUEUE_TIMEOUT = 5        # seconds a request may wait for its route before a 503
+HTTP_KEEPALIVE_TIMEOUT = 15   # seconds an idle keep-alive connection is kept open
+HTTP_MAX_HEADER_LINES = 100
+HTTP_MAX_BODY = 64 * 1024     # the API only takes small JSON bodies
+
+REASONS = {503: 'Service Unavailable', 400: 'Bad Request', 413: 'Payload Too Large'}
+
+
+def path_route_key(environ):
+    """Default route key: the request path"""
+    return environ.get('PATH_INFO', '/')
+
+
+def flask_route_key(app):
+    """Route key resolving a request to its Flask endpoint name"""
+    def route_key(environ):
+        try:
+            adapter = app.url_map.bind_to_environ(environ)
+            endpoint, _ = adapter.match()
+            return endpoint
+        except Exception:
+            return 'unmatched'
+    return route_key
+
+
+class AsyncWSGIServer:
+    """HTTP/1.1 server on asyncio that dispatches to a WSGI app in worker threads"""
+
+    def __init__(self, app, host='0.0.0.0', port=80, limits=None, route_key=path_route_key,
+                 workers=HTTP_WORKERS, fast_path=None):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.limits = limits or {}
+        self.route_key = route_key
+        # Optional `fast_path(method, path, client) -> bytes | None` answered on the loop
+        self.fast_path = fast_path
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='http')
+        self._semaphores = {}
+
+    def _semaphore(self, key):
+        if key not in self._semaphores:
+            self._semaphores[key] = asyncio.Semaphore(self.limits.get(key, HTTP_ROUTE_LIMIT))
+        return self._semaphores[key]
+
+    async def serve_forever(self):
+        server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        logger.info(f"Async HTTP server listening on {self.host}:{self.port}")
+        async with server:
+            await server.serve_forever()
+
+    # --- Connection handling ---
+
+    async def _handle_connection(self, reader, writer):
+        peer = writer.get_extra_info('peername') or ('', 0)
+        try:
+            while True:
+                request = await asyncio.wait_for(self._read_request(reader), HTTP_KEEPALIVE_TIMEOUT)
+                if request is None:
+                    break
+                keep_alive = await self._respond(request, peer, writer)
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.error(f"HTTP connection error: {e}")
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode('latin-1').split()
+        except ValueError:
+            raise ConnectionError("malformed request line")
+        headers = {}
+        for _ in range(HTTP_MAX_HEADER_LINES):
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get('content-length') or 0)
+        if length > HTTP_MAX_BODY:
+            raise ConnectionError("request body too large")
+        body = await reader.readexactly(length) if length else b''
+        return method, target, version, headers, body
+
+    def _environ(self, request, peer):
+        method, target, version, headers, body = request
+        path, _, query = target.partition('?')
+        environ = {
+            'REQUEST_METHOD': method,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': unquote(path, 'latin-1'),
+            'QUERY_STRING': query,
+            'SERVER_NAME': self.host,
+            'SERVER_PORT': str(self.port),
+            'SERVER_PROTOCOL': version,
+            'REMOTE_ADDR': peer[0],
+            'CONTENT_TYPE': headers.get('content-type', ''),
+            'CONTENT_LENGTH': str(len(body)) if body else '',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for name, value in headers.items():
+            if name not in ('content-type', 'content-length'):
+                environ['HTTP_' + name.upper().replace('-', '_')] = value
+        return environ
+
+    async def _respond(self, request, peer, writer):
+        method, target, version, headers, body = request
+        keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+
+        if self.fast_path is not None:
+            response = self.fast_path(method, target.partition('?')[0], peer[0])
+            if response is not None:
+                writer.write(response)
+                await writer.drain()
+                return keep_alive
+
+        environ = self._environ(request, peer)
+        semaphore = self._semaphore(self.route_key(environ))
+        try:
+            await asyncio.wait_for(semaphore.acquire(), HTTP_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            await self._write_error(writer, 503)
+            return keep_alive
+        try:
+            loop = asyncio.get_running_loop()
+            status, response_headers, body, stream = await loop.run_in_executor(
+                self.executor, self._call_app, environ)
+            has_length = any(name.lower() == 'content-length' for name, _ in response_headers)
+            if stream is not None and not has_length:
+                keep_alive = False  # streamed responses are delimited by closing the connection
+            response_headers.append(('Connection', 'keep-alive' if keep_alive else 'close'))
+            head = f"HTTP/1.1 {status}\r\n" + ''.join(f"{k}: {v}\r\n" for k, v in response_headers)
+            writer.write(head.encode('latin-1') + b'\r\n')
+            if body:
+                writer.write(body)
+            await writer.drain()
+            if stream is not None:
+                await self._stream(stream, writer)
+        finally:
+            semaphore.release()
+        return keep_alive
+
+    def _call_app(self, environ):
+        """Run the WSGI app; buffer the body unless it is a stream without Content-Length"""
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = status
+            started['headers'] = list(headers)
+
+        result = self.app(environ, start_response)
+        iterator = iter(result)
+        first = next(iterator, b'')
+        has_length = any(name.lower() == 'content-length' for name, _ in started['headers'])
+        if has_length or isinstance(result, (list, tuple)):
+            body = first + b''.join(iterator)
+            if hasattr(result, 'close'):
+                result.close()
+            return started['status'], started['headers'], body, None
+        return started['status'], started['headers'], first, (result, iterator)
+
+    async def _stream(self, stream, writer):
+        result, iterator = stream
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                chunk = await loop.run_in_executor(self.executor, next, iterator, None)
+                if chunk is None:
+                    break
+                writer.write(chunk)
+                await writer.drain()
+        finally:
+            if hasattr(result, 'close'):
+                await loop.run_in_executor(self.executor, result.close)
+
+    async def _write_error(self, writer, code):
+        reason = REASONS.get(code, 'Error')
+        writer.write(f"HTTP/1.1 {code} {reason}\r\nContent-Length: 0\r\n\r\n".encode('latin-1'))
+        await writer.drain()
+
+
+def serve(app, host='0.0.0.0', port=80, limits=None, route_key=None, fast_path=None):
+    """Run `app` on the asyncio server until interrupted"""
+    server = AsyncWSGIServer(app, host, port, limits=limits,
+                             route_key=route_key or path_route_key, fast_path=fast_path)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,320 @@
+"""
+OaKhz Audio - BlueZ D-Bus client
+Shared by eq_server.py and oakhz-rotary.py: keeps one in-process connection to the
+system bus and talks to org.bluez directly instead of forking bluetoothctl and dbus-send.
+BluezMonitor mirrors BlueZ objects from D-Bus signals for callers that need to react
+to changes instead of polling.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+try:
+    import dbus
+except ImportError:
+    dbus = None
+
+try:
+    from dbus.mainloop.glib import DBusGMainLoop
+    from gi.repository import GLib
+except ImportError:
+    DBusGMainLoop = None
+    GLib = None
+
+logger = logging.getLogger(__name__)
+
+BLUEZ_SERVICE = 'org.bluez'
+DEVICE_IFACE = 'org.bluez.Device1'
+MEDIA_CONTROL_IFACE = 'org.bluez.MediaControl1'
+MEDIA_PLAYER_IFACE = 'org.bluez.MediaPlayer1'
+OBJECT_MANAGER_IFACE = 'org.freedesktop.DBus.ObjectManager'
+PROPERTIES_IFACE = 'org.freedesktop.DBus.Properties'
+
+# 'system' on the speaker; 'session' to run against a stand-in such as tools/fake_bluez.py
+BLUEZ_BUS = os.environ.get('OAKHZ_BLUEZ_BUS', 'system')
+DBUS_TIMEOUT = 2  # seconds, same budget as the former dbus-send calls
+
+
+def unwrap(value):
+    """Convert dbus-python values to plain Python types"""
+    if dbus is None:
+        return value
+    if isinstance(value, dbus.Boolean):
+        return bool(value)
+    if isinstance(value, (dbus.String, dbus.ObjectPath, dbus.Signature)):
+        return str(value)
+    if isinstance(value, (dbus.Byte, dbus.Int16, dbus.Int32, dbus.Int64,
+                          dbus.UInt16, dbus.UInt32, dbus.UInt64)):
+        return int(value)
+    if isinstance(value, dbus.Double):
+        return float(value)
+    if isinstance(value, dict):
+        return {unwrap(k): unwrap(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [unwrap(v) for v in value]
+    return value
+
+
+class BluezClient:
+    """BlueZ device lookup and AVRCP media control over a shared D-Bus connection"""
+
+    def __init__(self, bus=None, bus_type=BLUEZ_BUS):
+        self._bus = bus
+        self._bus_type = bus_type
+        self._lock = threading.Lock()
+
+    @property
+    def bus(self):
+        with self._lock:
+            if self._bus is None:
+                if dbus is None:
+                    raise RuntimeError("python3-dbus is not installed")
+                self._bus = dbus.SessionBus() if self._bus_type == 'session' else dbus.SystemBus()
+            return self._bus
+
+    def _reset(self):
+        """Drop the connection so the next call reconnects (e.g. after a bus restart)"""
+        with self._lock:
+            self._bus = None
+
+    def _call(self, path, interface, method, *args):
+        bus = self.bus
+        try:
+            obj = bus.get_object(BLUEZ_SERVICE, path)
+            return getattr(dbus.Interface(obj, interface), method)(*args, timeout=DBUS_TIMEOUT)
+        except dbus.exceptions.DBusException as e:
+            if e.get_dbus_name() in ('org.freedesktop.DBus.Error.Disconnected',
+                                     'org.freedesktop.DBus.Error.NoReply'):
+                self._reset()
+            raise
+
+    # --- Lookup ---
+
+    def managed_objects(self):
+        """All BlueZ objects as {path: {interface: {property: value}}}"""
+        return unwrap(self._call('/', OBJECT_MANAGER_IFACE, 'GetManagedObjects'))
+
+    def connected_devices(self, objects=None):
+        """Connected devices as a list of {'path', 'address', 'name'}"""
+        if objects is None:
+            objects = self.managed_objects()
+        devices = []
+        for path, interfaces in sorted(objects.items()):
+            device = interfaces.get(DEVICE_IFACE)
+            if device and device.get('Connected'):
+                devices.append({
+                    'path': path,
+                    'address': device.get('Address', ''),
+                    'name': device.get('Alias') or device.get('Name') or device.get('Address', ''),
+                })
+        return devices
+
+    def connected_device_path(self, objects=None):
+        devices = self.connected_devices(objects)
+        return devices[0]['path'] if devices else None
+
+    def player_path(self, device_path=None, objects=None):
+        """Object path of the MediaPlayer1 belonging to `device_path` (or the connected device)"""
+        if objects is None:
+            objects = self.managed_objects()
+        if device_path is None:
+            device_path = self.connected_device_path(objects)
+        if device_path is None:
+            return None
+        for path, interfaces in sorted(objects.items()):
+            player = interfaces.get(MEDIA_PLAYER_IFACE)
+            if player is not None and player.get('Device', path.rsplit('/', 1)[0]) == device_path:
+                return path
+        return None
+
+    # --- Media ---
+
+    def get_player_properties(self, player_path):
+        return unwrap(self._call(player_path, PROPERTIES_IFACE, 'GetAll', MEDIA_PLAYER_IFACE))
+
+    def get_player_property(self, player_path, name):
+        return unwrap(self._call(player_path, PROPERTIES_IFACE, 'Get', MEDIA_PLAYER_IFACE, name))
+
+    def playback_status(self, device_path=None):
+        """'playing', 'paused', 'stopped'... or None when there is no player"""
+        player = self.player_path(device_path)
+        if player is None:
+            return None
+        status = self.get_player_property(player, 'Status')
+        return status.lower() if status else None
+
+    def media_info(self, objects=None):
+        """Status and track of the connected device, None when no device is connected"""
+        if objects is None:
+            objects = self.managed_objects()
+        device_path = self.connected_device_path(objects)
+        if device_path is None:
+            return None
+        info = {'status': 'stopped', 'artist': 'Unknown Artist', 'title': 'Unknown Title', 'album': ''}
+        player = self.player_path(device_path, objects)
+        if player is not None:
+            info.update(track_info(objects[player].get(MEDIA_PLAYER_IFACE, {})))
+        return info
+
+    def media_command(self, command, device_path=None):
+        """Send Play, Pause, Next, Previous... through MediaControl1, False if no device"""
+        if device_path is None:
+            device_path = self.connected_device_path()
+        if device_path is None:
+            return False
+        self._call(device_path, MEDIA_CONTROL_IFACE, command)
+        return True
+
+    def disconnect(self, device_path):
+        self._call(device_path, DEVICE_IFACE, 'Disconnect')
+
+    def play_pause(self, device_path=None):
+        """Toggle playback, returns the command sent or None if no device is connected"""
+        if device_path is None:
+            device_path = self.connected_device_path()
+        if device_path is None:
+            return None
+        command = 'Pause' if self.playback_status(device_path) == 'playing' else 'Play'
+        self.media_command(command, device_path)
+        return command
+
+
+def track_info(player_properties):
+    """Map MediaPlayer1 properties to the {'status', 'artist', 'title', 'album'} fields the UI uses"""
+    info = {}
+    if 'Status' in player_properties:
+        info['status'] = (player_properties['Status'] or 'stopped').lower()
+    track = player_properties.get('Track')
+    if track is not None:
+        info['artist'] = track.get('Artist') or 'Unknown Artist'
+        info['title'] = track.get('Title') or 'Unknown Title'
+        info['album'] = track.get('Album') or ''
+    return info
+
+
+class BluezMonitor:
+    """Local mirror of BlueZ objects kept up to date from D-Bus signals.
+
+    The mirror is seeded with GetManagedObjects, then updated from InterfacesAdded,
+    InterfacesRemoved and PropertiesChanged. Listeners are called as
+    `listener(event, path, interface, changed)` after the mirror was updated, where
+    event is 'added', 'removed' or 'changed'. Events can also be fed through
+    `handle_event()` directly, e.g. replayed from a recording in tests.
+    """
+
+    def __init__(self, bus_type=BLUEZ_BUS):
+        self._bus_type = bus_type
+        self._bus = None
+        self._objects = {}
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._thread = None
+
+    @property
+    def objects(self):
+        with self._lock:
+            return {path: {iface: dict(props) for iface, props in interfaces.items()}
+                    for path, interfaces in self._objects.items()}
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def handle_event(self, event, path, interface=None, changed=None):
+        """Apply one event to the mirror and notify listeners"""
+        path = str(path)
+        changed = unwrap(changed) if changed is not None else {}
+        with self._lock:
+            if event == 'added':
+                # `changed` holds {interface: properties} for every added interface
+                interfaces = self._objects.setdefault(path, {})
+                for iface, props in changed.items():
+                    interfaces[iface] = dict(props)
+            elif event == 'removed':
+                interfaces = self._objects.get(path, {})
+                for iface in changed:
+                    interfaces.pop(iface, None)
+                if not interfaces:
+                    self._objects.pop(path, None)
+            elif event == 'changed':
+                self._objects.setdefault(path, {}).setdefault(interface, {}).update(changed)
+            elif event == 'reset':
+                self._objects = {p: dict(i) for p, i in changed.items()}
+        for listener in list(self._listeners):
+            try:
+                listener(event, path, interface, changed)
+            except Exception as e:
+                logger.error(f"BlueZ listener error: {e}")
+
+    def start(self):
+        """Subscribe to BlueZ signals and run the GLib main loop in a daemon thread"""
+        if self._thread is not None:
+            return
+        if dbus is None or GLib is None:
+            raise RuntimeError("python3-dbus and python3-gi are required for BlueZ signals")
+        mainloop = DBusGMainLoop()
+        if self._bus_type == 'session':
+            self._bus = dbus.SessionBus(mainloop=mainloop, private=True)
+        else:
+            self._bus = dbus.SystemBus(mainloop=mainloop, private=True)
+        self._bus.add_signal_receiver(
+            lambda path, interfaces: self.handle_event('added', path, None, interfaces),
+            signal_name='InterfacesAdded', dbus_interface=OBJECT_MANAGER_IFACE,
+            bus_name=BLUEZ_SERVICE)
+        self._bus.add_signal_receiver(
+            lambda path, interfaces: self.handle_event('removed', path, None, interfaces),
+            signal_name='InterfacesRemoved', dbus_interface=OBJECT_MANAGER_IFACE,
+            bus_name=BLUEZ_SERVICE)
+        self._bus.add_signal_receiver(
+            lambda interface, changed, invalidated, path=None: self.handle_event(
+                'changed', path, str(interface), changed),
+            signal_name='PropertiesChanged', dbus_interface=PROPERTIES_IFACE,
+            bus_name=BLUEZ_SERVICE, path_keyword='path')
+        # Re-seed whenever bluetoothd (re)appears on the bus, clear when it goes away
+        self._bus.watch_name_owner(BLUEZ_SERVICE, self._on_owner_changed)
+        self._thread = threading.Thread(target=GLib.MainLoop().run, daemon=True)
+        self._thread.start()
+
+    def _on_owner_changed(self, owner):
+        objects = {}
+        if owner:
+            try:
+                client = BluezClient(bus=self._bus)
+                objects = client.managed_objects()
+            except Exception as e:
+                logger.error(f"BlueZ seed error: {e}")
+        self.handle_event('reset', '/', None, objects)
+
+
+# --- Recording and replay of monitor events ---
+
+class EventRecorder:
+    """BluezMonitor listener appending every event to a JSON-lines file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._start = time.monotonic()
+
+    def __call__(self, event, path, interface, changed):
+        with open(self.path, 'a') as f:
+            f.write(json.dumps({
+                't': round(time.monotonic() - self._start, 3),
+                'event': event, 'path': path, 'interface': interface, 'changed': changed,
+            }) + '\n')
+
+
+def load_events(path):
+    with open(path, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def replay_events(monitor, events, realtime=False):
+    """Feed recorded events into `monitor` as if they came from the bus"""
+    start = time.monotonic()
+    for event in events:
+        if realtime:
+            delay = event.get('t', 0) - (time.monotonic() - start)
+            if delay > 0:
+                time.sleep(delay)
+        monitor.handle_event(event['event'], event['path'], event.get('interface'), event.get('changed'))
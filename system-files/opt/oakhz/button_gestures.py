@@ -0,0 +1,180 @@
+"""
+OaKhz Audio - Encoder button gestures
+Classifies presses of the rotary encoder's push button from gpiozero's
+when_pressed/when_released callbacks and timers, without ever waiting in a
+callback:
+
+    short        released before GESTURE_MEDIUM, no second press within GESTURE_DOUBLE_CLICK
+    double       two short presses, the second starting within GESTURE_DOUBLE_CLICK
+    medium       released after GESTURE_MEDIUM
+    long         held for GESTURE_LONG (fires while still held)
+    press_turn   the encoder turned while the button was held (once per press,
+                 with the direction of the first detent)
+
+Gestures are handed to an ActionWorker, whose thread runs the (blocking) D-Bus
+and shutdown actions, so gpiozero's callback threads are never held up.
+
+    gestures = ButtonGestures(button, worker.submit)
+"""
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SHORT = 'short'
+DOUBLE = 'double'
+MEDIUM = 'medium'
+LONG = 'long'
+PRESS_TURN = 'press_turn'
+GESTURES = (SHORT, DOUBLE, MEDIUM, LONG, PRESS_TURN)
+
+GESTURE_DOUBLE_CLICK = 0.35  # seconds from a short release to the next press for a double click
+GESTURE_MEDIUM = 1.0         # seconds held for a medium press
+GESTURE_LONG = 3.0           # seconds held for a long press
+ACTION_QUEUE_SIZE = 8        # gestures waiting for the worker, further ones are dropped
+
+
+class ButtonGestures:
+    """Press classifier for a gpiozero Button.
+
+    `on_gesture(gesture, direction)` is called from a gpiozero or timer thread and
+    must not block (ActionWorker.submit doesn't); `direction` is +1/-1 for
+    press_turn, else 0.
+    """
+
+    def __init__(self, button, on_gesture, double_click=GESTURE_DOUBLE_CLICK,
+                 medium=GESTURE_MEDIUM, long=GESTURE_LONG, clock=time.monotonic):
+        self.on_gesture = on_gesture
+        self.double_click = double_click
+        self.medium = medium
+        self.long = long
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._pressed_at = None
+        self._consumed = False     # the current press already produced its gesture
+        self._long_timer = None
+        self._click_timer = None   # pending short press, waiting for a second click
+        self._second_click = False
+        button.when_pressed = self.pressed
+        button.when_released = self.released
+
+    def _emit(self, gesture, direction=0):
+        try:
+            self.on_gesture(gesture, direction)
+        except Exception as e:
+            logger.error(f"Gesture handler error: {e}")
+
+    def pressed(self):
+        with self._lock:
+            self._pressed_at = self.clock()
+            self._consumed = False
+            self._second_click = self._click_timer is not None
+            if self._second_click:
+                self._click_timer.cancel()
+                self._click_timer = None
+            self._long_timer = threading.Timer(self.long, self._held)
+            self._long_timer.daemon = True
+            self._long_timer.start()
+
+    def _held(self):
+        with self._lock:
+            if self._pressed_at is None or self._consumed:
+                return
+            self._consumed = True
+            first_click = self._take_first_click()
+        if first_click:
+            self._emit(SHORT)
+        self._emit(LONG)
+
+    def _take_first_click(self):
+        """True if this press followed a short one that isn't a double click after all"""
+        first_click, self._second_click = self._second_click, False
+        return first_click
+
+    def released(self):
+        with self._lock:
+            if self._pressed_at is None:
+                return
+            duration = self.clock() - self._pressed_at
+            self._pressed_at = None
+            if self._long_timer is not None:
+                self._long_timer.cancel()
+                self._long_timer = None
+            if self._consumed:
+                return
+            self._consumed = True
+            first_click = False
+            if duration >= self.medium:
+                gesture = MEDIUM
+                first_click = self._take_first_click()
+            elif self._take_first_click():
+                gesture = DOUBLE
+            else:
+                self._click_timer = threading.Timer(self.double_click, self._click_expired)
+                self._click_timer.daemon = True
+                self._click_timer.start()
+                return
+        if first_click:
+            self._emit(SHORT)
+        self._emit(gesture)
+
+    def _click_expired(self):
+        with self._lock:
+            if self._click_timer is None:
+                return  # a second press got there first
+            self._click_timer = None
+        self._emit(SHORT)
+
+    def rotated(self, direction):
+        """Called on every encoder detent: True if it belongs to a press-and-turn (not a volume step)"""
+        with self._lock:
+            if self._pressed_at is None:
+                return False
+            if self._consumed:
+                return True
+            self._consumed = True
+            if self._long_timer is not None:
+                self._long_timer.cancel()
+                self._long_timer = None
+            first_click = self._take_first_click()
+        if first_click:
+            self._emit(SHORT)
+        self._emit(PRESS_TURN, direction)
+        return True
+
+
+class ActionWorker:
+    """Runs gesture actions one at a time in a daemon thread"""
+
+    def __init__(self, actions, size=ACTION_QUEUE_SIZE):
+        self.actions = actions      # {gesture: callable(direction)}
+        self._queue = queue.Queue(size)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, gesture, direction=0):
+        """Queue a gesture's action; never blocks"""
+        if gesture not in self.actions:
+            return False
+        try:
+            self._queue.put_nowait((gesture, direction))
+            return True
+        except queue.Full:
+            logger.warning(f"Action queue full, dropping {gesture}")
+            return False
+
+    def join(self):
+        """Wait until every queued action has run"""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            gesture, direction = self._queue.get()
+            try:
+                self.actions[gesture](direction)
+            except Exception as e:
+                logger.error(f"{gesture} action error: {e}")
+            finally:
+                self._queue.task_done()
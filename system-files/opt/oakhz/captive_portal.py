@@ -0,0 +1,114 @@
+"""
+OaKhz Audio - Captive portal probe responder
+Phones, laptops and browsers joining the AP poll a handful of well-known URLs to
+detect a captive portal. They are answered here from precomputed bytes, ahead of
+the Flask app: on the asyncio loop of async_server.py (no worker thread, no
+routing) or as WSGI middleware when Flask serves directly. Every answer sends the
+client to the equalizer UI, which the OS then opens in its portal window.
+Probes are counted and logged as one summary per interval instead of per request.
+"""
+import collections
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+PORTAL_URL = 'http://192.168.50.1/'
+PROBE_LOG_INTERVAL = 300  # seconds between probe summaries in the log
+
+# Apple's captive network assistant opens the page when it is not "Success";
+# the refresh takes it to the UI. Everything else follows a plain redirect.
+APPLE_PAGE = (
+    '<HTML><HEAD><TITLE>OaKhz</TITLE>'
+    f'<meta http-equiv="refresh" content="0;url={PORTAL_URL}"></HEAD>'
+    f'<BODY><a href="{PORTAL_URL}">OaKhz Audio</a></BODY></HTML>'
+).encode()
+
+PROBE_PATHS = {
+    '/generate_204': 'android',                 # Android, Chrome OS, Chrome
+    '/gen_204': 'android',
+    '/hotspot-detect.html': 'apple',            # iOS, macOS
+    '/library/test/success.html': 'apple',
+    '/connecttest.txt': 'windows',              # Windows 10+
+    '/ncsi.txt': 'windows',                     # Windows 7/8
+    '/redirect': 'windows',
+    '/success.txt': 'firefox',                  # Firefox
+    '/canonical.html': 'firefox',
+    '/check_network_status.txt': 'linux',       # KDE
+    '/nm': 'linux',                             # NetworkManager (Fedora, Arch)
+}
+
+
+def _build(status, headers, body=b''):
+    headers = [('Content-Length', str(len(body))), ('Cache-Control', 'no-store')] + headers
+    raw = f"HTTP/1.1 {status}\r\n" + ''.join(f"{k}: {v}\r\n" for k, v in headers) + "\r\n"
+    return {'status': status, 'headers': headers, 'body': body, 'raw': raw.encode('latin-1')}
+
+
+RESPONSES = {
+    'redirect': _build('302 Found', [('Location', PORTAL_URL)]),
+    'apple': _build('200 OK', [('Content-Type', 'text/html')], APPLE_PAGE),
+}
+
+
+class ProbeLog:
+    """Counts probes per OS and logs one summary per PROBE_LOG_INTERVAL"""
+
+    def __init__(self, interval=PROBE_LOG_INTERVAL):
+        self.interval = interval
+        self._counts = collections.Counter()
+        self._clients = set()
+        self._last = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, kind, client):
+        with self._lock:
+            self._counts[kind] += 1
+            self._clients.add(client)
+            now = time.monotonic()
+            if now - self._last < self.interval:
+                return
+            summary = ', '.join(f"{k}={n}" for k, n in sorted(self._counts.items()))
+            clients = len(self._clients)
+            self._counts.clear()
+            self._clients.clear()
+            self._last = now
+        logger.info(f"Captive portal probes: {summary} from {clients} client(s)")
+
+
+class ProbeResponder:
+    """Precomputed answers for the known captive portal probe URLs"""
+
+    def __init__(self):
+        self.log = ProbeLog()
+
+    def match(self, method, path):
+        """Response dict for a probe request, None for anything else"""
+        if method not in ('GET', 'HEAD'):
+            return None
+        kind = PROBE_PATHS.get(path)
+        if kind is None:
+            return None
+        return RESPONSES['apple' if kind == 'apple' else 'redirect'], kind
+
+    def fast_path(self, method, path, client):
+        """async_server hook: raw response bytes, or None to pass the request on"""
+        found = self.match(method, path)
+        if found is None:
+            return None
+        response, kind = found
+        self.log.record(kind, client)
+        return response['raw'] if method == 'HEAD' else response['raw'] + response['body']
+
+    def middleware(self, app):
+        """WSGI middleware answering probes before `app` sees them"""
+        def wrapped(environ, start_response):
+            found = self.match(environ['REQUEST_METHOD'], environ.get('PATH_INFO', ''))
+            if found is None:
+                return app(environ, start_response)
+            response, kind = found
+            self.log.record(kind, environ.get('REMOTE_ADDR', ''))
+            start_response(response['status'], list(response['headers']))
+            return [b''] if environ['REQUEST_METHOD'] == 'HEAD' else [response['body']]
+        return wrapped
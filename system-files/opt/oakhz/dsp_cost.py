@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+OaKhz Audio - CamillaDSP pipeline cost estimator
+Counts the arithmetic a CamillaDSP config costs per chunk and compares it with
+what a Pi Zero can sustain at the configured sample rate. Also points out
+redundant work: unity filters, channels running identical chains on identical
+signals, and stages that could be merged.
+
+    python3 /opt/oakhz/dsp_cost.py /opt/camilladsp/config.yml
+
+The model is deliberately simple (operations per sample per stage, plus a fixed
+overhead per stage and chunk); its budget fraction is an estimate to compare
+configs and catch expensive ones, not a measurement. tools/dsp_sim.py measures.
+"""
+import sys
+
+from eq_response import apply_overrides, DEFAULT_SAMPLERATE
+
+DSP_OPS_PER_SECOND = 40e6   # sustained float ops/s CamillaDSP gets on a Pi Zero (ARMv6 @ 1 GHz)
+DSP_BUDGET_WARN = 0.6       # above this fraction of the CPU, xruns become likely under load
+DSP_BUDGET_LIMIT = 0.9      # states estimated above this are refused
+DEFAULT_CHUNKSIZE = 1024
+STAGE_OVERHEAD_OPS = 500    # per stage and chunk: dispatch, buffer walk, parameter checks
+
+OPS_BIQUAD_SECTION = 9      # transposed direct form II: 5 mul + 4 add per sample
+OPS_GAIN = 1
+OPS_LIMITER_SOFT = 8
+OPS_LIMITER_HARD = 2
+OPS_MIXER_SOURCE = 2        # mul + add per source per sample
+
+SHAPING_BIQUADS = ('Peaking', 'Lowshelf', 'Highshelf')
+
+
+def filter_ops(definition):
+    """Operations per sample of one filter instance"""
+    ftype = definition.get('type')
+    params = definition.get('parameters', {})
+    if ftype == 'Biquad':
+        return OPS_BIQUAD_SECTION
+    if ftype == 'BiquadCombo':
+        order = int(params.get('order', 2))
+        if params.get('type', '').startswith('LinkwitzRiley'):
+            return OPS_BIQUAD_SECTION * (order // 2)
+        return OPS_BIQUAD_SECTION * ((order + 1) // 2)
+    if ftype == 'Gain':
+        return OPS_GAIN
+    if ftype == 'Limiter':
+        return OPS_LIMITER_SOFT if params.get('soft_clip') else OPS_LIMITER_HARD
+    return OPS_BIQUAD_SECTION  # unknown types: assume about one biquad
+
+
+def is_identity(definition):
+    """True for filters that leave the signal unchanged (0 dB shaping biquads and gains)"""
+    ftype = definition.get('type')
+    params = definition.get('parameters', {})
+    if ftype == 'Biquad' and params.get('type') in SHAPING_BIQUADS:
+        return float(params.get('gain', 0)) == 0.0
+    if ftype == 'Gain':
+        unity = 1.0 if params.get('scale') == 'linear' else 0.0
+        return float(params.get('gain', 0)) == unity and not params.get('inverted') and not params.get('mute')
+    return False
+
+
+def _step_channels(step, channels):
+    targets = step.get('channels')
+    if targets is None:
+        targets = [step['channel']] if 'channel' in step else range(channels)
+    return list(targets)
+
+
+def estimate(config, overrides=None):
+    """Cost report of a CamillaDSP config, optionally with {filter: {parameter: value}} overrides"""
+    devices = config.get('devices', {})
+    samplerate = devices.get('samplerate', DEFAULT_SAMPLERATE)
+    chunksize = devices.get('chunksize', DEFAULT_CHUNKSIZE)
+    channels = devices.get('capture', {}).get('channels', 2)
+    filters = apply_overrides(config.get('filters') or {}, overrides)
+    mixers = config.get('mixers') or {}
+
+    per_filter = {}
+    identity = {}       # filter name -> channels where it runs as a no-op
+    runs = {}           # (input signature, names) -> [(channel, mixer before)]
+    gain_chains = []    # (channel, [gain filter names]) for chains with several gains
+    signatures = [('in', c) for c in range(channels)]
+    last_mixer = None
+    total = 0
+
+    for step in config.get('pipeline') or []:
+        if step.get('bypassed'):
+            continue
+        if step.get('type') == 'Mixer':
+            mixer = mixers[step['name']]
+            sources = sum(len(m.get('sources', [])) for m in mixer.get('mapping', []))
+            ops = sources * OPS_MIXER_SOURCE * chunksize + STAGE_OVERHEAD_OPS
+            per_filter[step['name']] = per_filter.get(step['name'], 0) + ops
+            total += ops
+            mixed = [('silent',)] * mixer['channels']['out']
+            for mapping in mixer.get('mapping', []):
+                mixed[mapping['dest']] = ('mix', tuple(sorted(
+                    (repr(signatures[s['channel']]), s.get('gain', 0), bool(s.get('inverted')))
+                    for s in mapping.get('sources', []))))
+            signatures = mixed
+            last_mixer = step['name']
+        elif step.get('type') == 'Filter':
+            names = tuple(step.get('names', []))
+            for channel in _step_channels(step, len(signatures)):
+                gains = []
+                for name in names:
+                    definition = filters.get(name, {})
+                    ops = filter_ops(definition) * chunksize + STAGE_OVERHEAD_OPS
+                    per_filter[name] = per_filter.get(name, 0) + ops
+                    total += ops
+                    if is_identity(definition):
+                        identity.setdefault(name, []).append(channel)
+                    elif definition.get('type') == 'Gain':
+                        gains.append(name)
+                if len(gains) > 1:
+                    gain_chains.append((channel, gains))
+                runs.setdefault((repr(signatures[channel]), names), []).append((channel, last_mixer))
+                signatures[channel] = ('filter', repr(signatures[channel]), names)
+
+    chunks_per_second = samplerate / chunksize
+    budget = total * chunks_per_second / DSP_OPS_PER_SECOND
+
+    def share(ops):
+        return f"{ops * chunks_per_second / DSP_OPS_PER_SECOND * 100:.1f}% of the budget"
+
+    warnings = []
+    suggestions = []
+    if budget > DSP_BUDGET_WARN:
+        warnings.append(f"estimated at {budget * 100:.0f}% of a Pi Zero: expect xruns under load")
+    if identity:
+        ops = sum(per_filter[name] for name in identity)
+        warnings.append(f"unity filters that could be skipped: {', '.join(sorted(identity))} ({share(ops)})")
+    for (_, names), instances in runs.items():
+        if len(instances) > 1 and names:
+            chs = ', '.join(str(c) for c, _ in instances)
+            ops = sum(filter_ops(filters.get(n, {})) * chunksize + STAGE_OVERHEAD_OPS for n in names)
+            after = f" after {instances[0][1]}" if instances[0][1] else ''
+            warnings.append(f"channels {chs} carry the same signal{after} and run the same "
+                            f"{len(names)} filters: filter one and copy it in the next mixer "
+                            f"({share(ops * (len(instances) - 1))})")
+    for channel, gains in gain_chains:
+        suggestions.append(f"channel {channel}: fold {', '.join(gains)} into one Gain (gains commute with the filters)")
+    for step in config.get('pipeline') or []:
+        if step.get('type') != 'Filter':
+            continue
+        names = step.get('names', [])
+        for a, b in zip(names, names[1:]):
+            pa = filters.get(a, {}).get('parameters', {})
+            pb = filters.get(b, {}).get('parameters', {})
+            if (filters.get(a, {}).get('type') == filters.get(b, {}).get('type') == 'Biquad'
+                    and pa.get('type') == pb.get('type') == 'Peaking'
+                    and pa.get('freq') == pb.get('freq') and pa.get('q') == pb.get('q')):
+                suggestions.append(f"{a} and {b} are peaking filters at the same frequency and Q: "
+                                   f"one filter with the summed gain is a close equivalent")
+
+    return {
+        'samplerate': samplerate,
+        'chunksize': chunksize,
+        'ops_per_chunk': total,
+        'ops_per_second': round(total * chunks_per_second),
+        'budget': round(budget, 3),
+        'over_budget': budget > DSP_BUDGET_LIMIT,
+        'filters': per_filter,
+        'warnings': warnings,
+        'suggestions': sorted(set(suggestions)),
+    }
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(f"Usage: {sys.argv[0]} CONFIG.yml [CONFIG.yml...]")
+        sys.exit(1)
+    from ruamel.yaml import YAML
+    yaml = YAML(typ='safe')
+    for path in sys.argv[1:]:
+        with open(path, 'r') as f:
+            report = estimate(yaml.load(f))
+        print(f"{path}: {report['ops_per_chunk']} ops/chunk, {report['ops_per_second'] / 1e6:.1f} Mops/s, "
+              f"{report['budget'] * 100:.0f}% of a Pi Zero")
+        for name, ops in sorted(report['filters'].items(), key=lambda item: -item[1])[:8]:
+            print(f"  {name:<22}{ops:>10} ops/chunk")
+        for warning in report['warnings']:
+            print(f"  warning: {warning}")
+        for suggestion in report['suggestions']:
+            print(f"  suggestion: {suggestion}")
+
+
+if __name__ == '__main__':
+    main()
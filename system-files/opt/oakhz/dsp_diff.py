@@ -0,0 +1,52 @@
+"""
+OaKhz Audio - Structural diff of CamillaDSP configs
+Classifies the change from the config CamillaDSP is running to a target config:
+
+    noop        nothing differs: send nothing
+    parameters  only filter parameters differ: CamillaDSP updates them in place
+    topology    devices, mixers, the pipeline or the set/types of filters differ:
+                CamillaDSP has to rebuild its pipeline
+
+Configs are plain dicts (parsed YAML or GetConfigJson output).
+"""
+NOOP = 'noop'
+PARAMETERS = 'parameters'
+TOPOLOGY = 'topology'
+KINDS = (NOOP, PARAMETERS, TOPOLOGY)
+
+
+def _filter_changes(current, target):
+    """{parameter: value} turning filter `current` into `target`, None if that needs a rebuild"""
+    if set(current) != set(target) or current.get('type') != target.get('type'):
+        return None
+    if any(current[key] != target[key] for key in current if key != 'parameters'):
+        return None
+    old = current.get('parameters') or {}
+    new = target.get('parameters') or {}
+    if set(old) - set(new):
+        return None  # a parameter back to its default is not a partial update
+    return {key: value for key, value in new.items() if old.get(key) != value}
+
+
+def diff(current, target):
+    """(kind, {filter: {parameter: value}}), the changes being listed for PARAMETERS only"""
+    if current == target:
+        return NOOP, {}
+    if current is None or target is None:
+        return TOPOLOGY, {}
+    for key in set(current) | set(target):
+        if key != 'filters' and current.get(key) != target.get(key):
+            return TOPOLOGY, {}
+    old = current.get('filters') or {}
+    new = target.get('filters') or {}
+    if set(old) != set(new):
+        return TOPOLOGY, {}
+    changes = {}
+    for name, definition in new.items():
+        if old[name] == definition:
+            continue
+        params = _filter_changes(old[name], definition)
+        if params is None:
+            return TOPOLOGY, {}
+        changes[name] = params
+    return PARAMETERS, changes
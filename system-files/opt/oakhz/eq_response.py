@@ -0,0 +1,303 @@
+"""
+OaKhz Audio - Frequency response of a CamillaDSP config
+Computes magnitude and phase of every Biquad, BiquadCombo and Gain filter of a
+CamillaDSP config over a log frequency grid and follows the pipeline (filters and
+mixers) to the combined response of each output channel.
+
+Biquad coefficients follow CamillaDSP (RBJ cookbook, shelves by slope or q,
+Linkwitz transform, Linkwitz-Riley and Butterworth combos). All filters that
+changed since the last call are evaluated together in one vectorized pass; the
+others come from a per-filter cache keyed on their parameters, so moving one EQ
+band only recomputes that band. Limiters are non-linear and counted as unity.
+"""
+import math
+import threading
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+RESPONSE_POINTS = 256
+RESPONSE_FMIN = 20.0
+RESPONSE_FMAX = 20000.0
+DEFAULT_SAMPLERATE = 48000
+
+
+# --- Coefficients (b0, b1, b2, a0, a1, a2) ---
+
+def _rbj(kind, fs, freq, q=None, gain=0.0, slope=None):
+    w0 = 2 * math.pi * freq / fs
+    cs, sn = math.cos(w0), math.sin(w0)
+    a = 10 ** (gain / 40)
+    if slope is not None:
+        # CamillaDSP slope is in dB/octave, the cookbook shelf slope S is 1 at 12 dB/octave
+        s = slope / 12.0
+        alpha = sn / 2 * math.sqrt((a + 1 / a) * (1 / s - 1) + 2)
+    else:
+        alpha = sn / (2 * q)
+
+    if kind == 'Lowpass':
+        return ((1 - cs) / 2, 1 - cs, (1 - cs) / 2, 1 + alpha, -2 * cs, 1 - alpha)
+    if kind == 'Highpass':
+        return ((1 + cs) / 2, -(1 + cs), (1 + cs) / 2, 1 + alpha, -2 * cs, 1 - alpha)
+    if kind == 'Allpass':
+        return (1 - alpha, -2 * cs, 1 + alpha, 1 + alpha, -2 * cs, 1 - alpha)
+    if kind == 'Notch':
+        return (1, -2 * cs, 1, 1 + alpha, -2 * cs, 1 - alpha)
+    if kind == 'Bandpass':
+        return (alpha, 0, -alpha, 1 + alpha, -2 * cs, 1 - alpha)
+    if kind == 'Peaking':
+        return (1 + alpha * a, -2 * cs, 1 - alpha * a, 1 + alpha / a, -2 * cs, 1 - alpha / a)
+    sq = 2 * math.sqrt(a) * alpha
+    if kind == 'Lowshelf':
+        return (a * ((a + 1) - (a - 1) * cs + sq), 2 * a * ((a - 1) - (a + 1) * cs),
+                a * ((a + 1) - (a - 1) * cs - sq), (a + 1) + (a - 1) * cs + sq,
+                -2 * ((a - 1) + (a + 1) * cs), (a + 1) + (a - 1) * cs - sq)
+    if kind == 'Highshelf':
+        return (a * ((a + 1) + (a - 1) * cs + sq), -2 * a * ((a - 1) + (a + 1) * cs),
+                a * ((a + 1) + (a - 1) * cs - sq), (a + 1) - (a - 1) * cs + sq,
+                2 * ((a - 1) - (a + 1) * cs), (a + 1) - (a - 1) * cs - sq)
+    raise ValueError(f"Unsupported biquad type: {kind}")
+
+
+def _first_order(kind, fs, freq):
+    k = math.tan(math.pi * freq / fs)
+    if kind == 'LowpassFO':
+        return (k, k, 0.0, 1 + k, k - 1, 0.0)
+    return (1.0, -1.0, 0.0, 1 + k, k - 1, 0.0)
+
+
+def _linkwitz_transform(fs, freq_act, q_act, freq_target, q_target):
+    # Zeros cancel the driver's actual poles, new poles at the target
+    d0i = (2 * math.pi * freq_act) ** 2
+    d1i = 2 * math.pi * freq_act / q_act
+    c0i = (2 * math.pi * freq_target) ** 2
+    c1i = 2 * math.pi * freq_target / q_target
+    fc = math.sqrt(freq_target * freq_act)
+    gn = 2 * math.pi * fc / math.tan(math.pi * fc / fs)
+    cci = c0i + gn * c1i + gn ** 2
+    return ((d0i + gn * d1i + gn ** 2) / cci, 2 * (d0i - gn ** 2) / cci,
+            (d0i - gn * d1i + gn ** 2) / cci, 1.0,
+            2 * (c0i - gn ** 2) / cci, (c0i - gn * c1i + gn ** 2) / cci)
+
+
+def biquad_sections(params, fs):
+    """Coefficient rows of a Biquad filter"""
+    kind = params['type']
+    if kind == 'LinkwitzTransform':
+        return [_linkwitz_transform(fs, params['freq_act'], params['q_act'],
+                                    params['freq_target'], params['q_target'])]
+    if kind in ('LowpassFO', 'HighpassFO'):
+        return [_first_order(kind, fs, params['freq'])]
+    if kind in ('Lowshelf', 'Highshelf') and 'slope' in params:
+        return [_rbj(kind, fs, params['freq'], gain=params.get('gain', 0.0), slope=params['slope'])]
+    q = params.get('q')
+    if q is None and 'bandwidth' in params:
+        w0 = 2 * math.pi * params['freq'] / fs
+        q = 1 / (2 * math.sinh(math.log(2) / 2 * params['bandwidth'] * w0 / math.sin(w0)))
+    return [_rbj(kind, fs, params['freq'], q if q is not None else 0.7071, params.get('gain', 0.0))]
+
+
+def butterworth_qs(order):
+    """Q of each second-order section of a Butterworth filter, None for the first-order one"""
+    qs = [1 / (2 * math.sin(math.pi * (2 * k + 1) / (2 * order))) for k in range(order // 2)]
+    return qs + ([None] if order % 2 else [])
+
+
+def biquad_combo_sections(params, fs):
+    """Coefficient rows of a BiquadCombo filter"""
+    kind = params['type']
+    order = int(params['order'])
+    if kind.startswith('LinkwitzRiley'):
+        qs = butterworth_qs(order // 2) * 2  # LR = the Butterworth of half the order, squared
+    elif kind.startswith('Butterworth'):
+        qs = butterworth_qs(order)
+    else:
+        raise ValueError(f"Unsupported BiquadCombo type: {kind}")
+    passband = 'Lowpass' if kind.endswith('Lowpass') else 'Highpass'
+    return [_first_order(passband + 'FO', fs, params['freq']) if q is None
+            else _rbj(passband, fs, params['freq'], q) for q in qs]
+
+
+def filter_sections(definition, fs):
+    """Coefficient rows of any filter; a pure gain is a constant b0 row; None for non-linear filters"""
+    ftype = definition.get('type')
+    params = definition.get('parameters', {})
+    if ftype == 'Biquad':
+        return biquad_sections(params, fs)
+    if ftype == 'BiquadCombo':
+        return biquad_combo_sections(params, fs)
+    if ftype == 'Gain':
+        if params.get('mute'):
+            return [(0.0, 0.0, 0.0, 1.0, 0.0, 0.0)]
+        gain = params.get('gain', 0.0)
+        linear = gain if params.get('scale') == 'linear' else 10 ** (gain / 20)
+        return [(-linear if params.get('inverted') else linear, 0.0, 0.0, 1.0, 0.0, 0.0)]
+    return None
+
+
+def apply_overrides(filters, overrides):
+    """Filter definitions with {filter: {parameter: value}} merged in, leaving `filters` untouched"""
+    if not overrides:
+        return filters
+    merged = dict(filters)
+    for name, params in overrides.items():
+        if name in merged:
+            definition = merged[name]
+            merged[name] = dict(definition, parameters=dict(definition.get('parameters', {}), **params))
+    return merged
+
+
+def _frozen(value):
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), _frozen(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_frozen(v) for v in value)
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    return str(value)
+
+
+class FrequencyResponse:
+    """Cached, vectorized frequency response of CamillaDSP configs"""
+
+    def __init__(self, points=RESPONSE_POINTS, fmin=RESPONSE_FMIN, fmax=RESPONSE_FMAX):
+        if np is None:
+            raise RuntimeError("python3-numpy is not installed")
+        self.freqs = np.geomspace(fmin, fmax, points)
+        self._grids = {}      # samplerate -> (z^-1, z^-2) over the grid
+        self._responses = {}  # filter name -> (key, complex response or None)
+        self._lock = threading.Lock()
+
+    def _grid(self, fs):
+        if fs not in self._grids:
+            z1 = np.exp(-1j * 2 * np.pi * self.freqs / fs)
+            self._grids[fs] = (z1, z1 * z1)
+        return self._grids[fs]
+
+    def filter_responses(self, filters, fs=DEFAULT_SAMPLERATE):
+        """{name: complex response} for the filters of a config, None for non-linear ones"""
+        with self._lock:
+            return self._filter_responses(filters, fs)
+
+    def _filter_responses(self, filters, fs):
+        pending = []
+        for name, definition in filters.items():
+            key = (fs, _frozen(definition))
+            cached = self._responses.get(name)
+            if cached is None or cached[0] != key:
+                pending.append((name, key, definition))
+        if pending:
+            self._evaluate(pending, fs)
+        for name in list(self._responses):
+            if name not in filters:
+                del self._responses[name]
+        return {name: self._responses[name][1] for name in filters}
+
+    def _evaluate(self, pending, fs):
+        """Evaluate every section of the pending filters in one pass"""
+        rows, owners = [], []
+        for index, (name, key, definition) in enumerate(pending):
+            sections = filter_sections(definition, fs)
+            if sections is None:
+                self._responses[name] = (key, None)
+                continue
+            rows.extend(sections)
+            owners.extend([index] * len(sections))
+        if rows:
+            c = np.asarray(rows, dtype=float)
+            z1, z2 = self._grid(fs)
+            num = c[:, 0:1] + c[:, 1:2] * z1 + c[:, 2:3] * z2
+            den = c[:, 3:4] + c[:, 4:5] * z1 + c[:, 5:6] * z2
+            h = num / den
+            owners = np.asarray(owners)
+            starts = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]])
+            products = np.multiply.reduceat(h, starts, axis=0)
+            for row, start in zip(products, starts):
+                name, key, _ = pending[owners[start]]
+                self._responses[name] = (key, row)
+
+    def channel_responses(self, config, overrides=None, probes=None):
+        """Complex response of every output channel to a signal fed equally to all inputs.
+
+        `overrides` ({filter: {parameter: value}}) evaluates a proposed state without
+        touching `config`. When `probes` is a dict, it receives the peak linear gain
+        seen at the input of each non-linear filter (limiters).
+        """
+        fs = config.get('devices', {}).get('samplerate', DEFAULT_SAMPLERATE)
+        definitions = apply_overrides(config.get('filters') or {}, overrides)
+        filters = self.filter_responses(definitions, fs)
+        mixers = config.get('mixers') or {}
+        channels = config.get('devices', {}).get('capture', {}).get('channels', 2)
+        state = np.ones((channels, len(self.freqs)), dtype=complex)
+        for step in config.get('pipeline') or []:
+            if step.get('bypassed'):
+                continue
+            if step.get('type') == 'Mixer':
+                mixer = mixers[step['name']]
+                mixed = np.zeros((mixer['channels']['out'], len(self.freqs)), dtype=complex)
+                for mapping in mixer.get('mapping', []):
+                    if mapping.get('mute'):
+                        continue
+                    for source in mapping.get('sources', []):
+                        if source.get('mute'):
+                            continue
+                        gain = 10 ** (source.get('gain', 0) / 20)
+                        if source.get('inverted'):
+                            gain = -gain
+                        mixed[mapping['dest']] += gain * state[source['channel']]
+                state = mixed
+            elif step.get('type') == 'Filter':
+                targets = step.get('channels')
+                if targets is None:
+                    targets = [step['channel']] if 'channel' in step else range(len(state))
+                chain = np.ones(len(self.freqs), dtype=complex)
+                for name in step.get('names', []):
+                    if filters.get(name) is not None:
+                        chain = chain * filters[name]
+                    elif probes is not None and name in definitions:
+                        peak = max(float(np.abs(state[channel] * chain).max()) for channel in targets)
+                        probes[name] = max(probes.get(name, 0.0), peak)
+                for channel in targets:
+                    state[channel] = state[channel] * chain
+        return state
+
+    def response(self, config, channel=0):
+        """{'freqs', 'magnitude' (dB), 'phase' (degrees)} of one output channel"""
+        h = self.channel_responses(config)[channel]
+        magnitude = 20 * np.log10(np.maximum(np.abs(h), 1e-12))
+        phase = np.degrees(np.angle(h))
+        return {'freqs': self.freqs, 'magnitude': magnitude, 'phase': phase}
+
+    def headroom(self, config, overrides=None):
+        """Predicted peak gain of the linear chain for a full-scale input at any frequency.
+
+        'peak_db' is the highest gain at any output (at 'peak_freq'), before the output limiters act;
+        'limiters' lists the peak reaching each limiter against its clip level.
+        """
+        probes = {}
+        outputs = self.channel_responses(config, overrides, probes)
+        limiters = {}
+        for name, peak in probes.items():
+            params = config['filters'][name].get('parameters', {})
+            peak_db = _db(peak)
+            limit_db = params.get('clip_limit')
+            limiters[name] = {
+                'peak_db': round(peak_db, 2),
+                'clip_limit': limit_db,
+                'over_db': round(max(0.0, peak_db - limit_db), 2) if limit_db is not None else None,
+            }
+        magnitude = np.abs(outputs).max(axis=0)
+        peak = int(magnitude.argmax())
+        return {
+            'peak_db': round(_db(float(magnitude[peak])), 2),
+            'peak_freq': round(float(self.freqs[peak]), 1),
+            'limiters': limiters,
+        }
+
+
+def _db(linear):
+    return 20 * math.log10(max(linear, 1e-12))
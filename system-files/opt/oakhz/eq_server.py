@@ -1,4 +1,4 @@
-from flask import Flask, jsonify, request, render_template, redirect
+from flask import Flask, Response, jsonify, request, render_template, redirect
 from flask_cors import CORS
 import subprocess
 import os
@@ -7,11 +7,31 @@ import logging
 import threading
 import time
 import socket
+import tempfile
+import collections
+import math
 from ruamel.yaml import YAML
 import signal
 
-app = Flask(__name__, template_folder='templates')
+from bluez_client import BluezClient, BluezMonitor, DEVICE_IFACE, MEDIA_PLAYER_IFACE
+from pulse_client import PulseVolume
+import async_server
+from captive_portal import ProbeResponder
+from web_assets import AssetStore
+from eq_response import FrequencyResponse
+from loudness import GainRamp, build_table
+import dsp_cost
+import dsp_diff
+
+try:
+    import websocket
+except ImportError:
+    websocket = None
+
+app = Flask(__name__, template_folder='templates', static_folder=None)
 CORS(app)
+probes = ProbeResponder()
+assets = AssetStore()
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -19,22 +39,368 @@ logger = logging.getLogger(__name__)
 CONFIG_FILE = os.path.expanduser('~/.oakhz_eq.json')
 CAMILLADSP_CONFIG = '/opt/camilladsp/config.yml'
 
-# --- Volume adaptive profile settings ---
-# When volume drops below LOW_THRESHOLD, apply a loudness compensation boost
-# to maintain perceived bass and treble at low listening levels (Fletcher-Munson)
-VOLUME_ADAPTIVE_LOW_THRESHOLD = -20    # dB preamp below which "night boost" kicks in
-VOLUME_ADAPTIVE_HIGH_THRESHOLD = 0     # dB preamp above which boosts are reduced
-VOLUME_ADAPTIVE_CHECK_INTERVAL = 2     # seconds between volume checks
+# 'async' serves through async_server.py; 'flask' falls back to the Werkzeug server
+HTTP_SERVER = os.environ.get('OAKHZ_HTTP_SERVER', 'async')
+# Concurrent requests per Flask endpoint (others get async_server.HTTP_ROUTE_LIMIT).
+# Event streams hold a worker for their whole lifetime, probes should never crowd out the API.
+HTTP_ROUTE_LIMITS = {
+    'volume_events': 8,
+    'media_events': 8,
+    'captive_portal_redirect': 2,
+    'static_asset': 8,
+}
+
+# --- CamillaDSP live control ---
+# camilladsp.service starts with `-p 1234`: parameter changes are pushed over the
+# websocket and config.yml is only rewritten lazily, in the background.
+CAMILLADSP_WS_URL = 'ws://127.0.0.1:1234'
+CAMILLADSP_WS_TIMEOUT = 1.0            # seconds per websocket request
+CAMILLADSP_PERSIST_DELAY = 2.0         # seconds of quiet before live changes are written to config.yml
+CAMILLADSP_RELOAD_DELAY = 0.25         # debounce window when a write must be followed by SIGHUP
+CAMILLADSP_MAX_WRITE_DELAY = 1.0       # upper bound on how long a reload can be held back
+LIVE_FILTER_PREFIXES = ('eq_', 'preamp_gain', 'loudness_')
+
+# --- Adaptive volume (loudness compensation) ---
+# The sink volume drives ISO 226 loudness compensation (loudness.py) on top of the
+# voicing gains of the loudness filters, ramped live as the volume changes.
+LOUDNESS_FILTERS = {
+    # filter: (voicing gain at full volume, maximum extra boost, frequency it acts on)
+    'loudness_bass_mid': (4, 8, 80),
+    'loudness_treble': (2, 4, 10000),
+}
+
+# Gain range of the web UI sliders (dB)
+GAIN_MIN = -12
+GAIN_MAX = 12
+
+PRESETS = {
+    'flat':      [0,  0,  0,  0,  0,  0,  0,  0,  0,  0],
+    'rock':      [5,  4, -2, -3, -1,  2,  4,  5,  5,  5],
+    'pop':       [-1, 3,  4,  4,  2, -1, -2, -2, -1, -1],
+    'jazz':      [4,  3,  1,  2, -1, -1,  0,  1,  2,  3],
+    'classical': [5,  4,  3,  2, -1, -1,  0,  2,  3,  4],
+    'bass':      [6,  5,  4,  2,  0, -1, -2, -3, -3, -3],
+    'treble':    [-3,-3, -2, -1,  0,  2,  4,  5,  6,  6],
+    'vocal':     [-2,-3, -2,  1,  3,  3,  2,  1,  0, -1],
+
+    # Outdoor: compensates open air absorption of bass and treble
+    # Strong bass + treble boost to cut through ambient noise outdoors
+    'outdoor':   [6,  6,  5,  2, -1,  0,  2,  5,  6,  6],
+
+    # Night: optimized for low volume listening (Fletcher-Munson compensation)
+    # Boosted mids for speech intelligibility, reduced sub and extreme treble
+    'night':     [2,  3,  4,  3,  3,  4,  3,  2,  1,  0],
+}
+
+
+def _validate_gain(value, name):
+    """Return `value` as a gain in dB, raise ValueError if out of range"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"{name} must be a number")
+    if not GAIN_MIN <= value <= GAIN_MAX:
+        raise ValueError(f"{name} must be between {GAIN_MIN} and {GAIN_MAX} dB")
+    return value
+
+
+class CamillaDSPClient:
+    """Minimal CamillaDSP websocket client used to update filter parameters live"""
+
+    def __init__(self, url=CAMILLADSP_WS_URL, timeout=CAMILLADSP_WS_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+        self._ws = None
+        self._lock = threading.Lock()
+        self._can_patch = None  # PatchConfig support (CamillaDSP 2.0+), None until tried
+
+    def _connect(self):
+        if websocket is None:
+            raise RuntimeError("python3-websocket is not installed")
+        if self._ws is None:
+            self._ws = websocket.create_connection(self.url, timeout=self.timeout)
+        return self._ws
+
+    def close(self):
+        if self._ws is not None:
+            try:
+                self._ws.close()
+            except Exception:
+                pass
+            self._ws = None
+
+    def _request(self, command, argument=None):
+        """Send one command and return the reply value, raise on any failure"""
+        ws = self._connect()
+        ws.send(json.dumps(command if argument is None else {command: argument}))
+        reply = json.loads(ws.recv()).get(command, {})
+        if reply.get('result') != 'Ok':
+            raise RuntimeError(f"{command} failed: {reply}")
+        return reply.get('value')
+
+    def _update_config(self, update):
+        """Fetch the running config, let `update(config)` edit it and send it back.
+
+        Returns False when the websocket is down or `update` returns False.
+        """
+        with self._lock:
+            try:
+                config = json.loads(self._request('GetConfigJson'))
+                if update(config) is False:
+                    return False
+                self._request('SetConfigJson', json.dumps(config))
+                return True
+            except Exception as e:
+                logger.warning(f"CamillaDSP websocket unavailable: {e}")
+                self.close()
+                return False
+
+    def _patch_config(self, patch):
+        """Send a partial config with PatchConfig; None if the server does not take it"""
+        with self._lock:
+            try:
+                self._request('PatchConfig', patch)
+                self._can_patch = True
+                return True
+            except RuntimeError as e:
+                # CamillaDSP answered, but not Ok: older than 2.0, or a patch it can't apply
+                if self._can_patch is None:
+                    logger.info(f"CamillaDSP PatchConfig unavailable, using Get/SetConfigJson: {e}")
+                    self._can_patch = False
+                return None
+            except Exception as e:
+                logger.warning(f"CamillaDSP websocket unavailable: {e}")
+                self.close()
+                return False
+
+    def set_filter_parameters(self, changes):
+        """Patch the parameters of existing filters in the running config.
+
+        `changes` maps filter names to a dict of parameters. Only filters matching
+        LIVE_FILTER_PREFIXES can be updated this way; CamillaDSP applies a config that
+        only differs in filter parameters in place, without rebuilding the pipeline.
+        The changes alone are sent with PatchConfig when CamillaDSP supports it, else
+        the whole config makes a GetConfigJson/SetConfigJson round trip.
+        Returns False when the websocket is down or the change needs a full reload.
+        """
+        if not all(name.startswith(LIVE_FILTER_PREFIXES) for name in changes):
+            return False
+        if self._can_patch is not False:
+            patched = self._patch_config(
+                {'filters': {name: {'parameters': params} for name, params in changes.items()}})
+            if patched is not None:
+                return patched
+
+        def update(config):
+            filters = config.get('filters') or {}
+            if any(name not in filters for name in changes):
+                return False
+            for name, params in changes.items():
+                filters[name]['parameters'].update(params)
+        return self._update_config(update)
+
+    def set_config(self, config):
+        """Replace the running config; CamillaDSP rebuilds its pipeline but keeps the devices open"""
+        with self._lock:
+            try:
+                self._request('SetConfigJson', json.dumps(config))
+                return True
+            except Exception as e:
+                logger.warning(f"CamillaDSP websocket unavailable: {e}")
+                self.close()
+                return False
+
+
+class CamillaDSPConfig:
+    """In-memory CamillaDSP config document with debounced, atomic write-back.
+
+    config.yml is parsed once; edits are applied to the document and bursts of
+    edits are coalesced into a single temp-file + rename write (and a single
+    SIGHUP when any of them could not be applied live).
+    """
+
+    def __init__(self, path=CAMILLADSP_CONFIG, eq_filters=()):
+        self.path = path
+        self.eq_filters = list(eq_filters)  # band filters, pruned from the pipeline while at 0 dB
+        self._yaml = YAML()
+        self._yaml.preserve_quotes = True
+        self._doc = None
+        self._lock = threading.RLock()
+        self._timer = None
+        self._dirty_since = None
+        self._reload_pending = False
+
+    @property
+    def doc(self):
+        with self._lock:
+            if self._doc is None:
+                with open(self.path, 'r') as f:
+                    self._doc = self._yaml.load(f)
+            return self._doc
+
+    def read(self, fn):
+        """Call `fn(doc)` with the document locked and return its result"""
+        with self._lock:
+            return fn(self.doc)
+
+    def filter_parameter(self, name, key, default=None):
+        try:
+            return self.doc['filters'][name]['parameters'][key]
+        except Exception:
+            return default
+
+    def set_filter_gains(self, gains):
+        """Apply filter gains to the document, adding preamp_gain to the pipeline if needed"""
+        with self._lock:
+            self._edit_gains(self.doc, gains)
+
+    def _edit_gains(self, cdsp_config, gains):
+        if 'preamp_gain' in gains and 'preamp_gain' not in cdsp_config['filters']:
+            cdsp_config['filters']['preamp_gain'] = {
+                'type': 'Gain',
+                'parameters': {
+                    'gain': gains['preamp_gain'],
+                    'inverted': False
+                }
+            }
+
+        for name, gain in gains.items():
+            if name in cdsp_config['filters']:
+                cdsp_config['filters'][name]['parameters']['gain'] = gain
+
+        if 'preamp_gain' in gains:
+            for step in self._eq_steps(cdsp_config):
+                if 'preamp_gain' not in step['names']:
+                    step['names'].insert(0, 'preamp_gain')
+
+    def _eq_steps(self, doc):
+        """Filter steps carrying the EQ: those holding preamp_gain or any band filter"""
+        hosts = set(self.eq_filters) | {'preamp_gain'}
+        return [step for step in doc.get('pipeline') or []
+                if step.get('type') == 'Filter' and hosts & set(step.get('names') or [])]
+
+    def set_active_eq_filters(self, active):
+        """Keep only the `active` band filters in the EQ steps of the pipeline.
+
+        Band filters sit together, in `eq_filters` order, where the first of them
+        was (at the end of the step when none was left), so a given set of active
+        bands always yields the same pipeline. Returns True if a step changed.
+        """
+        with self._lock:
+            return self._edit_active(self.doc, active)
+
+    def _edit_active(self, doc, active):
+        changed = False
+        for step in self._eq_steps(doc):
+            names = list(step['names'])
+            present = [i for i, name in enumerate(names) if name in self.eq_filters]
+            fixed = [name for name in names if name not in self.eq_filters]
+            at = present[0] if present else len(fixed)
+            wanted = fixed[:at] + [name for name in self.eq_filters if name in active] + fixed[at:]
+            if wanted != names:
+                del step['names'][:]
+                step['names'].extend(wanted)
+                changed = True
+        return changed
+
+    def snapshot(self):
+        """Plain copy of the document, for diffing and for the websocket"""
+        with self._lock:
+            return json.loads(json.dumps(self.doc))
+
+    def preview(self, gains, active=None):
+        """Plain copy of the document as set_filter_gains + set_active_eq_filters would leave it"""
+        config = self.snapshot()
+        self._edit_gains(config, gains)
+        if active is not None:
+            self._edit_active(config, active)
+        return config
+
+    def schedule_write(self, reload=False):
+        """Write the document once edits settle, then SIGHUP CamillaDSP if `reload`"""
+        with self._lock:
+            now = time.monotonic()
+            if self._dirty_since is None:
+                self._dirty_since = now
+            self._reload_pending = self._reload_pending or reload
+            if self._reload_pending:
+                delay = min(CAMILLADSP_RELOAD_DELAY,
+                            max(0.0, self._dirty_since + CAMILLADSP_MAX_WRITE_DELAY - now))
+            else:
+                delay = CAMILLADSP_PERSIST_DELAY
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """Write pending edits now"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._dirty_since is None:
+                return True
+            reload, self._reload_pending = self._reload_pending, False
+            self._dirty_since = None
+            try:
+                self._write_atomic()
+            except Exception as e:
+                logger.error(f"CamillaDSP config write error: {e}")
+                return False
+        if reload:
+            subprocess.run(['sudo', 'pkill', '-HUP', 'camilladsp'], check=False)
+            logger.info("CamillaDSP config updated and reloaded")
+        return True
+
+    def _write_atomic(self):
+        directory = os.path.dirname(self.path)
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix='.config.', suffix='.yml', dir=directory)
+        except OSError:
+            # No write access to the directory: fall back to an in-place write
+            with open(self.path, 'w') as f:
+                self._yaml.dump(self._doc, f)
+            return
+        try:
+            with os.fdopen(fd, 'w') as f:
+                self._yaml.dump(self._doc, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def discard(self):
+        """Drop pending edits; the document is re-read from disk on next access"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._dirty_since = None
+            self._reload_pending = False
+            self._doc = None
 
 
 class EqualizerController:
-    def __init__(self):
+    def __init__(self, dsp_config_path=CAMILLADSP_CONFIG):
         self.bands = 10
         self.band_names = ['eq_31', 'eq_63', 'eq_125', 'eq_250', 'eq_500', 'eq_1k', 'eq_2k', 'eq_4k', 'eq_8k', 'eq_16k']
-        self._adaptive_volume_enabled = False
-        self._adaptive_thread = None
-        self._adaptive_stop = threading.Event()
-        self._last_adaptive_state = None  # 'low', 'normal', 'high'
+        self._volume = None         # sink volume (%) from PulseAudio events
+        self.dsp = CamillaDSPClient()
+        self.dsp_config = CamillaDSPConfig(dsp_config_path, eq_filters=self.band_names)
+        self.loudness_table = build_table(LOUDNESS_FILTERS)
+        self.loudness = GainRamp(self._apply_loudness_gains)
+        self.loudness.current = self._read_loudness_from_camilladsp()
+        self._running = None        # snapshot of the config CamillaDSP runs, None: config.yml as on disk
+        self.dsp_updates = dict.fromkeys(dsp_diff.KINDS, 0)
+        self._state_lock = threading.Lock()
+        try:
+            self.curve = FrequencyResponse()
+        except RuntimeError as e:
+            logger.warning(f"Frequency response disabled: {e}")
+            self.curve = None
         self.load_config()
 
     def load_config(self):
@@ -42,44 +408,48 @@ class EqualizerController:
             if os.path.exists(CONFIG_FILE):
                 with open(CONFIG_FILE, 'r') as f:
                     self.config = json.load(f)
-                # Ensure adaptive_volume key exists for backward compat
+                # Ensure adaptive_volume and auto_preamp keys exist for backward compat
                 if 'adaptive_volume' not in self.config:
                     self.config['adaptive_volume'] = False
+                self.config.setdefault('auto_preamp', False)
             else:
-                self.config = {
-                    'enabled': True,
-                    'preamp': self._read_preamp_from_camilladsp(),
-                    'bands': self._read_bands_from_camilladsp(),
-                    'preset': 'default',
-                    'adaptive_volume': False
-                }
+                self.config = self._default_config()
                 self.save_config()
         except Exception as e:
             logger.error(f"Config load error: {e}")
-            self.config = {'enabled': True, 'preamp': 0, 'bands': [0] * self.bands, 'preset': 'default', 'adaptive_volume': False}
+            self.config = {'enabled': True, 'preamp': 0, 'bands': [0] * self.bands, 'preset': 'default',
+                           'adaptive_volume': False, 'auto_preamp': False}
+
+    def _default_config(self):
+        """EQ state matching config.yml as it is on disk (first start, reset to default)"""
+        return {
+            'enabled': True,
+            'preamp': self._read_preamp_from_camilladsp(),
+            'bands': self._read_bands_from_camilladsp(),
+            'preset': 'default',
+            'adaptive_volume': False,
+            'auto_preamp': False
+        }
 
     def _read_preamp_from_camilladsp(self):
-        try:
-            ryaml = YAML()
-            with open(CAMILLADSP_CONFIG, 'r') as f:
-                cdsp_config = ryaml.load(f)
-            return cdsp_config['filters']['preamp_gain']['parameters']['gain']
-        except Exception:
-            return 0
+        return self.dsp_config.filter_parameter('preamp_gain', 'gain', 0)
 
     def _read_bands_from_camilladsp(self):
         try:
-            ryaml = YAML()
-            with open(CAMILLADSP_CONFIG, 'r') as f:
-                cdsp_config = ryaml.load(f)
+            filters = self.dsp_config.doc['filters']
             return [
-                cdsp_config['filters'][name]['parameters']['gain']
+                filters[name]['parameters']['gain']
                 for name in self.band_names
-                if name in cdsp_config['filters']
+                if name in filters
             ]
         except Exception:
             return [0] * self.bands
 
+    def _read_loudness_from_camilladsp(self):
+        """Loudness filter gains as config.yml has them, compensation included (the ramp starts there)"""
+        return {name: self.dsp_config.filter_parameter(name, 'gain', base)
+                for name, (base, _, _) in LOUDNESS_FILTERS.items()}
+
     def save_config(self):
         try:
             with open(CONFIG_FILE, 'w') as f:
@@ -87,213 +457,301 @@ class EqualizerController:
         except Exception as e:
             logger.error(f"Config save error: {e}")
 
-    def update_camilladsp(self):
-        """Update CamillaDSP config and reload"""
-        try:
-            ryaml = YAML()
-            ryaml.preserve_quotes = True
-
-            with open(CAMILLADSP_CONFIG, 'r') as f:
-                cdsp_config = ryaml.load(f)
-
-            preamp_gain = self.config['preamp'] if self.config['enabled'] else 0.0
-            if 'preamp_gain' not in cdsp_config['filters']:
-                cdsp_config['filters']['preamp_gain'] = {
-                    'type': 'Gain',
-                    'parameters': {
-                        'gain': preamp_gain,
-                        'inverted': False
-                    }
-                }
-            else:
-                cdsp_config['filters']['preamp_gain']['parameters']['gain'] = preamp_gain
+    def _target_gains(self, config=None):
+        """Filter gains for the current (or a proposed) EQ state"""
+        config = config or self.config
+        gains = {'preamp_gain': config['preamp'] if config['enabled'] else 0.0}
+        for i, band_name in enumerate(self.band_names):
+            gains[band_name] = config['bands'][i] if config['enabled'] else 0.0
+        return gains
 
-            for i, band_name in enumerate(self.band_names):
-                gain = self.config['bands'][i] if self.config['enabled'] else 0.0
-                if band_name in cdsp_config['filters']:
-                    cdsp_config['filters'][band_name]['parameters']['gain'] = gain
+    def _active_bands(self, gains):
+        """Band filters kept in the pipeline: 0 dB bands are pruned"""
+        return [name for name in self.band_names if gains[name] != 0]
 
-            if 'pipeline' in cdsp_config:
-                for channel_pipeline in cdsp_config['pipeline']:
-                    if 'names' in channel_pipeline:
-                        if 'preamp_gain' not in channel_pipeline['names']:
-                            channel_pipeline['names'].insert(0, 'preamp_gain')
+    def target_pipeline(self, config=None):
+        """The config CamillaDSP gets for the current (or a proposed) EQ state, pruned bands left out"""
+        gains = self._target_gains(config)
+        return self.dsp_config.preview(gains, self._active_bands(gains))
 
-            with open(CAMILLADSP_CONFIG, 'w') as f:
-                ryaml.dump(cdsp_config, f)
-
-            subprocess.run(['sudo', 'pkill', '-HUP', 'camilladsp'], check=False)
-            logger.info("CamillaDSP config updated and reloaded")
-            return True
+    def update_camilladsp(self):
+        """Push the EQ state to CamillaDSP, with 0 dB bands left out of the pipeline"""
+        self._update_auto_preamp()
+        gains = self._target_gains()
+        return self._apply_filter_gains(gains, active=self._active_bands(gains))
+
+    # --- Headroom ---
+
+    def predict_headroom(self, config=None):
+        """Predicted peak gain of the DSP chain for the current (or a proposed) EQ state"""
+        if self.curve is None:
+            return None
+        return self.curve.headroom(self.target_pipeline(config))
+
+    def auto_preamp_gain(self, config=None):
+        """Highest preamp keeping the predicted peak at or below 0 dBFS, None without NumPy"""
+        config = dict(config or self.config, preamp=0.0, enabled=True)
+        headroom = self.predict_headroom(config)
+        if headroom is None:
+            return None
+        # Round down to 0.1 dB so rounding never pushes the peak over 0 dBFS
+        gain = math.floor(-headroom['peak_db'] * 10) / 10
+        return max(GAIN_MIN, min(GAIN_MAX, gain))
+
+    def preview_headroom(self, state=None):
+        """Headroom of the applied state, or of a proposed one (validated like apply_state, auto preamp resolved).
+
+        'clipping_db' is what is left above 0 dBFS; 'preamp_limited' tells that auto
+        preamp is at GAIN_MIN and could not bring the peak down to 0 dBFS.
+        """
+        if state is None:
+            config = self.config
+        else:
+            config = self.validate_state(state)
+            if config.get('auto_preamp') and config['enabled']:
+                gain = self.auto_preamp_gain(config)
+                if gain is not None:
+                    config['preamp'] = gain
+        headroom = self.predict_headroom(config)
+        if headroom is not None:
+            auto = config.get('auto_preamp', False) and config['enabled']
+            headroom['preamp'] = config['preamp'] if config['enabled'] else 0.0
+            headroom['auto_preamp'] = config.get('auto_preamp', False)
+            headroom['clipping'] = headroom['peak_db'] > 0
+            headroom['clipping_db'] = round(max(0.0, headroom['peak_db']), 2)
+            headroom['preamp_limited'] = auto and headroom['clipping'] and config['preamp'] <= GAIN_MIN
+        return headroom
+
+    # --- Pipeline cost ---
+
+    def estimate_cost(self, config=None):
+        """Estimated DSP load of the pipeline for the current (or a proposed) EQ state"""
+        return dsp_cost.estimate(self.target_pipeline(config))
+
+    def _check_cost(self, config):
+        try:
+            report = self.estimate_cost(config)
         except Exception as e:
-            logger.error(f"CamillaDSP update error: {e}")
-            return False
-
-    def set_band(self, band_index, value):
+            logger.error(f"DSP cost estimate error: {e}")
+            return
+        if report['over_budget']:
+            raise ValueError(f"DSP load estimated at {report['budget'] * 100:.0f}% of the CPU")
+
+    def _update_auto_preamp(self):
+        if not self.config.get('auto_preamp') or not self.config['enabled']:
+            return
         try:
-            self.config['bands'][band_index] = value
+            gain = self.auto_preamp_gain()
+        except Exception as e:
+            logger.error(f"Auto preamp error: {e}")
+            return
+        if gain is not None and gain != self.config['preamp']:
+            self.config['preamp'] = gain
             self.save_config()
-            self.update_camilladsp()
-            logger.info(f"Band {band_index} set to {value} dB")
-            return True
+            logger.info(f"Auto preamp: {gain} dB")
+            if gain <= GAIN_MIN:
+                headroom = self.predict_headroom()
+                if headroom is not None and headroom['peak_db'] > 0:
+                    logger.warning(f"Auto preamp at its {GAIN_MIN} dB limit: "
+                                   f"predicted peak {headroom['peak_db']:+.2f} dBFS")
+
+    def _apply_filter_gains(self, gains, active=None):
+        """Bring CamillaDSP to the given filter gains with the least disruption.
+
+        With `active`, the band filters not listed are also pruned from the pipeline.
+        The edited config is diffed against the running one: no-ops send nothing,
+        parameter-only changes are pushed live, and only topology changes rebuild the
+        pipeline (over the websocket, or by rewriting config.yml and reloading).
+        """
+        try:
+            if self._running is None:
+                self._running = self.dsp_config.snapshot()
+            self.dsp_config.set_filter_gains(gains)
+            if active is not None:
+                self.dsp_config.set_active_eq_filters(active)
+            target = self.dsp_config.snapshot()
         except Exception as e:
-            logger.error(f"Band {band_index} error: {e}")
+            logger.error(f"CamillaDSP update error: {e}")
             return False
+        kind, changes = dsp_diff.diff(self._running, target)
+        self.dsp_updates[kind] += 1
+        if kind == dsp_diff.NOOP:
+            return True
+        if kind == dsp_diff.PARAMETERS:
+            live = self.dsp.set_filter_parameters(changes)
+        else:
+            live = self.dsp.set_config(target)
+        self.dsp_config.schedule_write(reload=not live)
+        self._running = target
+        how = 'live' if live else 'by reload'
+        logger.info(f"CamillaDSP {kind} update {how}: {', '.join(changes) or 'pipeline rebuilt'}")
+        return True
 
-    def set_preamp(self, value):
+    def forget_dsp_state(self):
+        """Drop pending writes and the running snapshot before config.yml is replaced externally"""
+        self.dsp_config.discard()
+        self._running = None
+
+    # Single-action setters of the legacy API, applied as partial states under the same lock
+
+    def _apply_legacy(self, state, label):
         try:
-            self.config['preamp'] = value
-            self.save_config()
-            self.update_camilladsp()
-            logger.info(f"Preamp set to {value} dB")
-            return True
+            return self.apply_state(state)
         except Exception as e:
-            logger.error(f"Preamp error: {e}")
+            logger.error(f"{label} error: {e}")
             return False
 
+    def set_band(self, band_index, value):
+        return self._apply_legacy({'bands': {band_index: value}}, f"Band {band_index}")
+
+    def set_preamp(self, value):
+        return self._apply_legacy({'preamp': value}, 'Preamp')
+
     def set_enabled(self, enabled):
-        try:
-            self.config['enabled'] = enabled
-            self.save_config()
-            self.update_camilladsp()
-            logger.info(f"Equalizer {'enabled' if enabled else 'disabled'}")
-            return True
-        except Exception as e:
-            logger.error(f"Enable error: {e}")
-            return False
+        return self._apply_legacy({'enabled': enabled}, 'Enable')
 
     def apply_preset(self, preset_name):
-        presets = {
-            'flat':      [0,  0,  0,  0,  0,  0,  0,  0,  0,  0],
-            'rock':      [5,  4, -2, -3, -1,  2,  4,  5,  5,  5],
-            'pop':       [-1, 3,  4,  4,  2, -1, -2, -2, -1, -1],
-            'jazz':      [4,  3,  1,  2, -1, -1,  0,  1,  2,  3],
-            'classical': [5,  4,  3,  2, -1, -1,  0,  2,  3,  4],
-            'bass':      [6,  5,  4,  2,  0, -1, -2, -3, -3, -3],
-            'treble':    [-3,-3, -2, -1,  0,  2,  4,  5,  6,  6],
-            'vocal':     [-2,-3, -2,  1,  3,  3,  2,  1,  0, -1],
-
-            # Outdoor: compensates open air absorption of bass and treble
-            # Strong bass + treble boost to cut through ambient noise outdoors
-            'outdoor':   [6,  6,  5,  2, -1,  0,  2,  5,  6,  6],
-
-            # Night: optimized for low volume listening (Fletcher-Munson compensation)
-            # Boosted mids for speech intelligibility, reduced sub and extreme treble
-            'night':     [2,  3,  4,  3,  3,  4,  3,  2,  1,  0],
-        }
-        if preset_name not in presets:
-            return False
-        values = presets[preset_name]
-        for i, value in enumerate(values):
-            self.config['bands'][i] = value
-        self.config['preset'] = preset_name
-        self.save_config()
-        self.update_camilladsp()
-        logger.info(f"Preset '{preset_name}' applied")
-        return True
+        return self._apply_legacy({'preset': preset_name}, f"Preset '{preset_name}'")
+
+    # --- Batch state updates ---
+
+    def validate_state(self, state):
+        """Merge a full or partial EQ state into a copy of the config, raise ValueError if invalid"""
+        if not isinstance(state, dict):
+            raise ValueError("state must be an object")
+        unknown = set(state) - {'bands', 'preamp', 'enabled', 'preset', 'adaptive_volume', 'auto_preamp'}
+        if unknown:
+            raise ValueError(f"unknown keys: {', '.join(sorted(unknown))}")
+
+        config = dict(self.config, bands=list(self.config['bands']))
+
+        if 'preset' in state:
+            if state['preset'] not in PRESETS:
+                raise ValueError(f"unknown preset: {state['preset']}")
+            config['preset'] = state['preset']
+            config['bands'] = list(PRESETS[state['preset']])
+
+        if 'bands' in state:
+            bands = state['bands']
+            if isinstance(bands, list):
+                if len(bands) != self.bands:
+                    raise ValueError(f"bands must have {self.bands} values")
+                bands = dict(enumerate(bands))
+            elif isinstance(bands, dict):
+                bands = {int(index): value for index, value in bands.items()}
+            else:
+                raise ValueError("bands must be an array or an {index: value} object")
+            for index, value in bands.items():
+                if not 0 <= index < self.bands:
+                    raise ValueError(f"band index out of range: {index}")
+                config['bands'][index] = _validate_gain(value, f"band {index}")
+            if 'preset' not in state:
+                config['preset'] = 'custom'
+
+        if 'preamp' in state:
+            config['preamp'] = _validate_gain(state['preamp'], 'preamp')
+            config['auto_preamp'] = False  # a manual preamp overrides auto mode
+
+        for key in ('enabled', 'adaptive_volume', 'auto_preamp'):
+            if key in state:
+                if not isinstance(state[key], bool):
+                    raise ValueError(f"{key} must be a boolean")
+                config[key] = state[key]
+
+        return config
+
+    def apply_state(self, state):
+        """Validate and apply a full or partial EQ state with one persist and one DSP update"""
+        with self._state_lock:
+            config = self.validate_state(state)
+            self._check_cost(config)
+            adaptive_changed = config['adaptive_volume'] != self.config.get('adaptive_volume', False)
+            self.config = config
+            self.save_config()
+            success = self.update_camilladsp()
+            if adaptive_changed:
+                self._sync_loudness()
+            logger.info(f"EQ state applied: {', '.join(sorted(state))}")
+            return success
 
     # --- Adaptive volume profile ---
 
     def set_adaptive_volume(self, enabled):
         """Enable or disable adaptive volume profile"""
-        self.config['adaptive_volume'] = enabled
-        self._adaptive_volume_enabled = enabled
-        self.save_config()
-        if enabled:
-            self._start_adaptive_thread()
-        else:
-            self._stop_adaptive_thread()
-            self._last_adaptive_state = None
-        logger.info(f"Adaptive volume {'enabled' if enabled else 'disabled'}")
-
-    def _start_adaptive_thread(self):
-        if self._adaptive_thread is None or not self._adaptive_thread.is_alive():
-            self._adaptive_stop.clear()
-            self._adaptive_thread = threading.Thread(target=self._adaptive_loop, daemon=True)
-            self._adaptive_thread.start()
-
-    def _stop_adaptive_thread(self):
-        self._adaptive_stop.set()
-
-    def _adaptive_loop(self):
-        """Background thread that adjusts loudness compensation based on preamp volume"""
-        logger.info("Adaptive volume thread started")
-        while not self._adaptive_stop.is_set():
-            try:
-                if self._adaptive_volume_enabled:
-                    preamp = self.config.get('preamp', 0)
+        return self._apply_legacy({'adaptive_volume': enabled}, 'Adaptive volume')
 
-                    if preamp <= VOLUME_ADAPTIVE_LOW_THRESHOLD:
-                        state = 'low'
-                    elif preamp >= VOLUME_ADAPTIVE_HIGH_THRESHOLD:
-                        state = 'high'
-                    else:
-                        state = 'normal'
-
-                    if state != self._last_adaptive_state:
-                        self._apply_adaptive_compensation(state)
-                        self._last_adaptive_state = state
-
-            except Exception as e:
-                logger.error(f"Adaptive volume loop error: {e}")
+    def on_volume(self, percent):
+        """PulseAudio volume event: retarget the loudness compensation"""
+        self._volume = percent
+        self._sync_loudness()
 
-            self._adaptive_stop.wait(VOLUME_ADAPTIVE_CHECK_INTERVAL)
-
-        logger.info("Adaptive volume thread stopped")
-
-    def _apply_adaptive_compensation(self, state):
-        """Apply loudness compensation offsets to CamillaDSP without changing user EQ bands"""
+    def _sync_loudness(self):
+        """Ramp the loudness filters to the compensation for the current volume, or back to voicing"""
+        if self.config.get('adaptive_volume', False) and self._volume is not None:
+            target = self.loudness_table[max(0, min(100, self._volume))]
+        else:
+            target = {name: base for name, (base, _, _) in LOUDNESS_FILTERS.items()}
+        self.loudness.set_target(target)
+
+    def _apply_loudness_gains(self, gains):
+        with self._state_lock:
+            if not self._apply_parameter_gains(gains):
+                raise RuntimeError("loudness gains not applied")
+
+    def _apply_parameter_gains(self, gains):
+        """Gain change of filters that stay in the pipeline: a parameter-only update by construction.
+
+        Used for every step of the loudness ramp: the changed gains are sent as is,
+        without snapshotting and diffing the whole config as _apply_filter_gains does.
+        """
+        running = self._running
+        filters = (running or {}).get('filters') or {}
+        if any(name not in filters for name in gains):
+            return self._apply_filter_gains(gains)
+        changes = {name: {'gain': gain} for name, gain in gains.items()
+                   if filters[name]['parameters'].get('gain') != gain}
+        if not changes:
+            self.dsp_updates[dsp_diff.NOOP] += 1
+            return True
         try:
-            ryaml = YAML()
-            ryaml.preserve_quotes = True
-
-            with open(CAMILLADSP_CONFIG, 'r') as f:
-                cdsp_config = ryaml.load(f)
-
-            # Compensation offsets applied directly to loudness filters in config
-            # low volume: boost bass and treble (Fletcher-Munson)
-            # high volume: reduce boosts to protect drivers
-            if state == 'low':
-                bass_offset = 2    # extra boost on loudness_bass_mid at low volume
-                treble_offset = 2  # extra boost on loudness_treble at low volume
-                logger.info("Adaptive volume: low → applying loudness compensation")
-            elif state == 'high':
-                bass_offset = -2   # reduce bass at high volume to protect HP
-                treble_offset = -1
-                logger.info("Adaptive volume: high → reducing boosts")
-            else:
-                bass_offset = 0
-                treble_offset = 0
-                logger.info("Adaptive volume: normal → no compensation")
-
-            if 'loudness_bass_mid' in cdsp_config['filters']:
-                base_gain = 2  # base value from config
-                cdsp_config['filters']['loudness_bass_mid']['parameters']['gain'] = base_gain + bass_offset
-
-            if 'loudness_treble' in cdsp_config['filters']:
-                base_gain = 4  # base value from config
-                cdsp_config['filters']['loudness_treble']['parameters']['gain'] = base_gain + treble_offset
-
-            with open(CAMILLADSP_CONFIG, 'w') as f:
-                ryaml.dump(cdsp_config, f)
-
-            subprocess.run(['sudo', 'pkill', '-HUP', 'camilladsp'], check=False)
-
+            self.dsp_config.set_filter_gains(gains)
         except Exception as e:
-            logger.error(f"Adaptive compensation error: {e}")
+            logger.error(f"CamillaDSP update error: {e}")
+            return False
+        live = self.dsp.set_filter_parameters(changes)
+        self.dsp_config.schedule_write(reload=not live)
+        for name, params in changes.items():
+            filters[name]['parameters'].update(params)
+        self.dsp_updates[dsp_diff.PARAMETERS] += 1
+        return True
 
     def apply_current_config(self):
+        try:
+            report = self.estimate_cost()
+            logger.info(f"DSP load estimate: {report['budget'] * 100:.0f}% "
+                        f"({report['ops_per_second'] / 1e6:.1f} Mops/s)")
+            for warning in report['warnings']:
+                logger.warning(f"DSP cost: {warning}")
+            for suggestion in report['suggestions']:
+                logger.info(f"DSP cost suggestion: {suggestion}")
+        except Exception as e:
+            logger.error(f"DSP cost estimate error: {e}")
         self.update_camilladsp()
-        # Restart adaptive thread if it was enabled
-        if self.config.get('adaptive_volume', False):
-            self._adaptive_volume_enabled = True
-            self._start_adaptive_thread()
+        self._sync_loudness()
 
     def get_config(self):
         return self.config
 
+    def frequency_response(self, channel=0):
+        """Combined response of the DSP pipeline at one output channel, None without NumPy"""
+        if self.curve is None:
+            return None
+        return self.dsp_config.read(lambda doc: self.curve.response(doc, channel))
+
 
 eq = EqualizerController()
+bluez = BluezClient()
+bluez_monitor = BluezMonitor()
 
 
 # --- System info ---
@@ -323,23 +781,11 @@ def get_cpu_temperature():
     except Exception:
         return None
 
-def get_cpu_usage():
-    """Get CPU usage percentage"""
-    try:
-        with open('/proc/stat', 'r') as f:
-            line = f.readline()
-        parts = list(map(int, line.split()[1:]))
-        idle = parts[3]
-        total = sum(parts)
-        time.sleep(0.1)
-        with open('/proc/stat', 'r') as f:
-            line = f.readline()
-        parts2 = list(map(int, line.split()[1:]))
-        idle2 = parts2[3]
-        total2 = sum(parts2)
-        return round((1 - (idle2 - idle) / (total2 - total)) * 100, 1)
-    except Exception:
-        return None
+def read_cpu_times():
+    """Return (idle, total) jiffies from the aggregate line of /proc/stat"""
+    with open('/proc/stat', 'r') as f:
+        parts = list(map(int, f.readline().split()[1:]))
+    return parts[3], sum(parts)
 
 def get_ram_usage():
     """Get RAM usage percentage"""
@@ -386,53 +832,188 @@ def get_camilladsp_status():
 def get_connected_bluetooth_device():
     """Get name of connected Bluetooth device"""
     try:
-        result = subprocess.run(
-            ['bluetoothctl', 'devices', 'Connected'],
-            capture_output=True, text=True, timeout=2
-        )
-        for line in result.stdout.splitlines():
-            if 'Device' in line:
-                parts = line.split(None, 2)
-                if len(parts) >= 3:
-                    return parts[2].strip()
-        return None
+        # Use the signal-driven mirror when it is running, no D-Bus round trip
+        objects = bluez_monitor.objects if media_state.live else None
+        devices = bluez.connected_devices(objects)
+        return devices[0]['name'] if devices else None
     except Exception:
         return None
 
 
+# --- System metrics sampler ---
+
+METRICS_INTERVAL = 5          # seconds between samples of CPU, temperature, RAM, uptime
+METRICS_SLOW_INTERVAL = 30    # seconds between refreshes of IP, CamillaDSP and Bluetooth status
+METRICS_HISTORY = 120         # samples kept for /api/system/history (10 min)
+
+
+class SystemMetrics:
+    """Background sampler serving /api/system/info from a cache.
+
+    CPU usage is computed from the /proc/stat delta between two samples, so no
+    request ever sleeps. Fast metrics are sampled every METRICS_INTERVAL into a
+    ring buffer; values that need a socket, a fork or D-Bus are refreshed at
+    METRICS_SLOW_INTERVAL.
+    """
+
+    def __init__(self):
+        self.info = {'hostname': socket.gethostname()}
+        self.history = collections.deque(maxlen=METRICS_HISTORY)
+        self._cpu_times = None
+        self._last_slow = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, daemon=True)
+        self.sample()
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(METRICS_INTERVAL)
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error(f"Metrics sampler error: {e}")
+
+    def _cpu_usage(self):
+        try:
+            idle, total = read_cpu_times()
+        except Exception:
+            return None
+        previous, self._cpu_times = self._cpu_times, (idle, total)
+        if previous is None or total == previous[1]:
+            return None
+        return round((1 - (idle - previous[0]) / (total - previous[1])) * 100, 1)
+
+    def sample(self):
+        now = time.time()
+        info = {
+            'cpu_temp': get_cpu_temperature(),
+            'cpu_usage': self._cpu_usage(),
+            'ram_usage': get_ram_usage(),
+            'uptime': get_uptime(),
+        }
+        if self._last_slow is None or now - self._last_slow >= METRICS_SLOW_INTERVAL:
+            self._last_slow = now
+            info.update({
+                'ip': get_ip_address(),
+                'camilladsp': get_camilladsp_status(),
+                'bluetooth_device': get_connected_bluetooth_device(),
+            })
+        with self._lock:
+            self.info = {**self.info, **info}
+            self.history.append((round(now), info['cpu_usage'], info['cpu_temp'], info['ram_usage']))
+
+    def get_info(self):
+        with self._lock:
+            return dict(self.info)
+
+    def get_history(self):
+        with self._lock:
+            samples = list(self.history)
+        return {
+            'interval': METRICS_INTERVAL,
+            'timestamps': [sample[0] for sample in samples],
+            'cpu_usage': [sample[1] for sample in samples],
+            'cpu_temp': [sample[2] for sample in samples],
+            'ram_usage': [sample[3] for sample in samples],
+        }
+
+
+metrics = SystemMetrics()
+
+
+pulse = PulseVolume()
+
+
 def get_pulse_volume():
     """Get current PulseAudio sink volume (0-100)"""
     try:
-        import re
-        env = os.environ.copy()
-        env['PULSE_SERVER'] = 'unix:/run/pulse/native'
-        result = subprocess.run(
-            ['pactl', 'get-sink-volume', '@DEFAULT_SINK@'],
-            capture_output=True, text=True, timeout=2, env=env
-        )
-        if result.returncode == 0:
-            match = re.search(r'(\d+)%', result.stdout)
-            if match:
-                return int(match.group(1))
+        return pulse.get()
     except Exception:
-        pass
-    return 75
+        return 75
 
 
 def set_pulse_volume(percent):
     """Set PulseAudio sink volume (0-100)"""
     try:
-        env = os.environ.copy()
-        env['PULSE_SERVER'] = 'unix:/run/pulse/native'
-        subprocess.run(
-            ['pactl', 'set-sink-volume', '@DEFAULT_SINK@', f'{percent}%'],
-            timeout=2, env=env
-        )
+        pulse.set(percent)
         return True
     except Exception:
         return False
 
 
+# --- Push streams ---
+
+EVENTS_KEEPALIVE = 15  # seconds between SSE keep-alive comments
+
+
+class LiveState:
+    """Latest snapshot of a value plus a version counter that stream clients wait on"""
+
+    def __init__(self):
+        self.snapshot = None
+        self.version = 0
+        self._cond = threading.Condition()
+
+    def update(self, value):
+        with self._cond:
+            if value != self.snapshot:
+                self.snapshot = dict(value)
+                self.version += 1
+                self._cond.notify_all()
+
+    def get(self):
+        return self.snapshot
+
+    def wait(self, version, timeout):
+        """Block until the snapshot is newer than `version`, return (version, snapshot)"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.version != version, timeout)
+            return self.version, self.snapshot
+
+
+def event_stream(state, fallback):
+    """Server-Sent Events response sending `state` on connect and on every change"""
+    def stream():
+        try:
+            snapshot = state.get() or fallback
+        except Exception:
+            snapshot = fallback
+        version = state.version
+        yield f"data: {json.dumps(snapshot)}\n\n"
+        while True:
+            new_version, snapshot = state.wait(version, EVENTS_KEEPALIVE)
+            if new_version == version:
+                yield ": keep-alive\n\n"
+                continue
+            version = new_version
+            yield f"data: {json.dumps(snapshot)}\n\n"
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+class VolumeState(LiveState):
+    """Sink volume pushed from PulseAudio sink subscription events"""
+
+    def start(self):
+        pulse.subscribe(lambda percent: self.update({'volume': percent}))
+
+    def get(self):
+        if self.snapshot is None:
+            self.update({'volume': get_pulse_volume()})
+        return self.snapshot
+
+
+volume_state = VolumeState()
+
+
 # --- Volume routes ---
 
 @app.route('/api/volume', methods=['GET'])
@@ -446,6 +1027,11 @@ def set_volume():
     success = set_pulse_volume(volume)
     return jsonify({'status': 'ok' if success else 'error', 'volume': volume})
 
+@app.route('/api/volume/events', methods=['GET'])
+def volume_events():
+    """Server-Sent Events stream of the sink volume, pushed on every change"""
+    return event_stream(volume_state, {'volume': 75})
+
 
 # --- EQ routes ---
 
@@ -453,9 +1039,62 @@ def set_volume():
 def get_equalizer():
     return jsonify(eq.get_config())
 
+@app.route('/api/equalizer/response', methods=['GET'])
+def get_equalizer_response():
+    """Magnitude (dB) and phase (degrees) of the whole DSP chain over a log frequency grid"""
+    channel = request.args.get('channel', 0, type=int)
+    try:
+        response = eq.frequency_response(channel)
+    except IndexError:
+        return jsonify({'status': 'error', 'message': f"No output channel {channel}"}), 400
+    except Exception as e:
+        logger.error(f"Frequency response error: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+    if response is None:
+        return jsonify({'status': 'error', 'message': 'Frequency response unavailable'}), 503
+    return jsonify({
+        'freqs': response['freqs'].round(1).tolist(),
+        'magnitude': response['magnitude'].round(2).tolist(),
+        'phase': response['phase'].round(1).tolist(),
+    })
+
+@app.route('/api/equalizer/headroom', methods=['GET', 'POST'])
+def get_equalizer_headroom():
+    """Predicted peak gain of the DSP chain for the current state, or for a proposed one (POST)"""
+    state = request.get_json(silent=True) if request.method == 'POST' else None
+    try:
+        headroom = eq.preview_headroom(state)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Headroom prediction error: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+    if headroom is None:
+        return jsonify({'status': 'error', 'message': 'Headroom prediction unavailable'}), 503
+    return jsonify(headroom)
+
+@app.route('/api/equalizer/cost', methods=['GET'])
+def get_equalizer_cost():
+    """Estimated DSP load of the pipeline, with redundant stages and cheaper equivalents"""
+    try:
+        return jsonify(eq.estimate_cost())
+    except Exception as e:
+        logger.error(f"DSP cost estimate error: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
 @app.route('/api/equalizer', methods=['POST'])
 def update_equalizer():
     data = request.json
+    if isinstance(data, dict) and 'type' not in data:
+        # Batch form: full or partial state applied in one transaction
+        try:
+            success = eq.apply_state(data)
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+        if success:
+            return jsonify({'status': 'ok', 'config': eq.get_config()})
+        return jsonify({'status': 'error'}), 500
+
     action_type = data.get('type')
     action_data = data.get('data')
 
@@ -469,8 +1108,7 @@ def update_equalizer():
     elif action_type == 'preset':
         success = eq.apply_preset(action_data['name'])
     elif action_type == 'adaptive_volume':
-        success = True
-        eq.set_adaptive_volume(action_data['value'])
+        success = eq.set_adaptive_volume(action_data['value'])
 
     if success:
         return jsonify({'status': 'ok', 'config': eq.get_config()})
@@ -482,17 +1120,15 @@ def update_equalizer():
 
 @app.route('/api/system/info', methods=['GET'])
 def get_system_info():
-    """Return system info: IP, CPU temp, CPU usage, RAM, uptime, CamillaDSP status, Bluetooth device"""
-    return jsonify({
-        'ip': get_ip_address(),
-        'hostname': socket.gethostname(),
-        'cpu_temp': get_cpu_temperature(),
-        'cpu_usage': get_cpu_usage(),
-        'ram_usage': get_ram_usage(),
-        'uptime': get_uptime(),
-        'camilladsp': get_camilladsp_status(),
-        'bluetooth_device': get_connected_bluetooth_device()
-    })
+    """Return system info: IP, CPU temp, CPU usage, RAM, uptime, CamillaDSP status and updates, Bluetooth device"""
+    metrics.start()
+    return jsonify({**metrics.get_info(), 'dsp_updates': dict(eq.dsp_updates)})
+
+@app.route('/api/system/history', methods=['GET'])
+def get_system_history():
+    """Return recent CPU usage, CPU temperature and RAM usage samples for charting"""
+    metrics.start()
+    return jsonify(metrics.get_history())
 
 
 # --- Bluetooth routes ---
@@ -500,104 +1136,57 @@ def get_system_info():
 @app.route('/api/bluetooth/devices', methods=['GET'])
 def get_bluetooth_devices():
     try:
-        result = subprocess.run(['bluetoothctl', 'devices', 'Connected'], capture_output=True, text=True)
-        devices = []
-        for line in result.stdout.splitlines():
-            if 'Device' in line:
-                parts = line.split()
-                if len(parts) >= 3:
-                    devices.append({'address': parts[1], 'name': ' '.join(parts[2:])})
+        devices = [{'address': d['address'], 'name': d['name']} for d in bluez.connected_devices()]
         return jsonify({'devices': devices})
     except Exception as e:
         logger.error(f"Bluetooth error: {e}")
         return jsonify({'devices': []}), 500
 
-def get_bluetooth_device_path():
-    """Get the D-Bus path of the connected Bluetooth device"""
-    try:
-        result = subprocess.run(['bluetoothctl', 'devices', 'Connected'],
-                              capture_output=True, text=True, timeout=2)
-        for line in result.stdout.splitlines():
-            if 'Device' in line:
-                parts = line.split()
-                if len(parts) >= 2:
-                    mac = parts[1].replace(':', '_')
-                    return f"/org/bluez/hci0/dev_{mac}"
-        return None
-    except Exception:
-        return None
+NO_DEVICE_MEDIA_INFO = {
+    'status': 'stopped',
+    'artist': 'No device connected',
+    'title': 'Connect a Bluetooth device',
+    'album': ''
+}
+
+
+class MediaState(LiveState):
+    """Track and status snapshot kept current from BlueZ PropertiesChanged signals"""
+
+    def __init__(self, monitor):
+        super().__init__()
+        self.monitor = monitor
+        self.live = False
+
+    def start(self):
+        try:
+            self.monitor.add_listener(self._on_bluez_event)
+            self.monitor.start()
+            self.live = True
+            logger.info("Media state: following BlueZ signals")
+        except Exception as e:
+            logger.warning(f"Media state: BlueZ signals unavailable, reading on demand ({e})")
+
+    def _on_bluez_event(self, event, path, interface, changed):
+        if event == 'changed' and interface not in (DEVICE_IFACE, MEDIA_PLAYER_IFACE):
+            return
+        self.update(bluez.media_info(self.monitor.objects) or NO_DEVICE_MEDIA_INFO)
+
+    def get(self):
+        """Current snapshot, read from BlueZ directly when signals are not available"""
+        if not self.live or self.snapshot is None:
+            self.update(bluez.media_info() or NO_DEVICE_MEDIA_INFO)
+        return self.snapshot
+
+
+media_state = MediaState(bluez_monitor)
 
-def get_dbus_property(device_path, interface, property_name):
-    """Get a D-Bus property value"""
-    try:
-        result = subprocess.run([
-            'dbus-send', '--system', '--print-reply',
-            '--dest=org.bluez',
-            f'{device_path}/player0',
-            'org.freedesktop.DBus.Properties.Get',
-            f'string:{interface}',
-            f'string:{property_name}'
-        ], capture_output=True, text=True, timeout=2)
-
-        if result.returncode == 0:
-            for line in result.stdout.splitlines():
-                if 'variant' in line or 'string' in line:
-                    parts = line.strip().split('"')
-                    if len(parts) >= 2:
-                        return parts[1]
-        return None
-    except Exception:
-        return None
 
 @app.route('/api/media/info', methods=['GET'])
 def get_media_info():
     """Get current playing media metadata (artist, title, status)"""
     try:
-        device_path = get_bluetooth_device_path()
-        if not device_path:
-            return jsonify({
-                'status': 'stopped',
-                'artist': 'No device connected',
-                'title': 'Connect a Bluetooth device',
-                'album': ''
-            })
-
-        info = {}
-        status = get_dbus_property(device_path, 'org.bluez.MediaPlayer1', 'Status')
-        info['status'] = status.lower() if status else 'stopped'
-
-        result = subprocess.run([
-            'dbus-send', '--system', '--print-reply',
-            '--dest=org.bluez',
-            f'{device_path}/player0',
-            'org.freedesktop.DBus.Properties.Get',
-            'string:org.bluez.MediaPlayer1',
-            'string:Track'
-        ], capture_output=True, text=True, timeout=2)
-
-        info['artist'] = 'Unknown Artist'
-        info['title'] = 'Unknown Title'
-        info['album'] = ''
-
-        if result.returncode == 0:
-            lines = result.stdout.splitlines()
-            current_key = None
-            for line in lines:
-                line = line.strip()
-                if 'string "Title"' in line:
-                    current_key = 'title'
-                elif 'string "Artist"' in line:
-                    current_key = 'artist'
-                elif 'string "Album"' in line:
-                    current_key = 'album'
-                elif current_key and 'variant' in line and 'string "' in line:
-                    parts = line.split('string "')
-                    if len(parts) >= 2:
-                        value = parts[1].rstrip('"')
-                        info[current_key] = value
-                        current_key = None
-
-        return jsonify(info)
+        return jsonify(media_state.get())
     except Exception as e:
         logger.error(f"Media info error: {e}")
         return jsonify({
@@ -607,61 +1196,36 @@ def get_media_info():
             'album': ''
         })
 
-@app.route('/api/media/play', methods=['POST'])
-def media_play():
+@app.route('/api/media/events', methods=['GET'])
+def media_events():
+    """Server-Sent Events stream of media info, pushed on every track or status change"""
+    return event_stream(media_state, NO_DEVICE_MEDIA_INFO)
+
+def _media_command(command, label):
     try:
-        device_path = get_bluetooth_device_path()
-        if not device_path:
+        if not bluez.media_command(command):
             return jsonify({'status': 'error', 'message': 'No device connected'}), 400
-        subprocess.run([
-            'dbus-send', '--system', '--type=method_call',
-            '--dest=org.bluez', device_path,
-            'org.bluez.MediaControl1.Play'
-        ], capture_output=True, timeout=2)
-        logger.info("Media: Play")
+        logger.info(f"Media: {label}")
         return jsonify({'status': 'ok'})
     except Exception as e:
-        logger.error(f"Media play error: {e}")
+        logger.error(f"Media {command.lower()} error: {e}")
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@app.route('/api/media/play', methods=['POST'])
+def media_play():
+    return _media_command('Play', 'Play')
+
 @app.route('/api/media/pause', methods=['POST'])
 def media_pause():
-    try:
-        device_path = get_bluetooth_device_path()
-        if not device_path:
-            return jsonify({'status': 'error', 'message': 'No device connected'}), 400
-        subprocess.run([
-            'dbus-send', '--system', '--type=method_call',
-            '--dest=org.bluez', device_path,
-            'org.bluez.MediaControl1.Pause'
-        ], capture_output=True, timeout=2)
-        logger.info("Media: Pause")
-        return jsonify({'status': 'ok'})
-    except Exception as e:
-        logger.error(f"Media pause error: {e}")
-        return jsonify({'status': 'error', 'message': str(e)}), 500
+    return _media_command('Pause', 'Pause')
 
 @app.route('/api/media/play-pause', methods=['POST'])
 def media_play_pause():
     try:
-        device_path = get_bluetooth_device_path()
-        if not device_path:
+        command = bluez.play_pause()
+        if command is None:
             return jsonify({'status': 'error', 'message': 'No device connected'}), 400
-        status = get_dbus_property(device_path, 'org.bluez.MediaPlayer1', 'Status')
-        if status and status.lower() == 'playing':
-            subprocess.run([
-                'dbus-send', '--system', '--type=method_call',
-                '--dest=org.bluez', device_path,
-                'org.bluez.MediaControl1.Pause'
-            ], capture_output=True, timeout=2)
-            logger.info("Media: Pause")
-        else:
-            subprocess.run([
-                'dbus-send', '--system', '--type=method_call',
-                '--dest=org.bluez', device_path,
-                'org.bluez.MediaControl1.Play'
-            ], capture_output=True, timeout=2)
-            logger.info("Media: Play")
+        logger.info(f"Media: {command}")
         return jsonify({'status': 'ok'})
     except Exception as e:
         logger.error(f"Media play-pause error: {e}")
@@ -669,37 +1233,11 @@ def media_play_pause():
 
 @app.route('/api/media/next', methods=['POST'])
 def media_next():
-    try:
-        device_path = get_bluetooth_device_path()
-        if not device_path:
-            return jsonify({'status': 'error', 'message': 'No device connected'}), 400
-        subprocess.run([
-            'dbus-send', '--system', '--type=method_call',
-            '--dest=org.bluez', device_path,
-            'org.bluez.MediaControl1.Next'
-        ], capture_output=True, timeout=2)
-        logger.info("Media: Next track")
-        return jsonify({'status': 'ok'})
-    except Exception as e:
-        logger.error(f"Media next error: {e}")
-        return jsonify({'status': 'error', 'message': str(e)}), 500
+    return _media_command('Next', 'Next track')
 
 @app.route('/api/media/previous', methods=['POST'])
 def media_previous():
-    try:
-        device_path = get_bluetooth_device_path()
-        if not device_path:
-            return jsonify({'status': 'error', 'message': 'No device connected'}), 400
-        subprocess.run([
-            'dbus-send', '--system', '--type=method_call',
-            '--dest=org.bluez', device_path,
-            'org.bluez.MediaControl1.Previous'
-        ], capture_output=True, timeout=2)
-        logger.info("Media: Previous track")
-        return jsonify({'status': 'ok'})
-    except Exception as e:
-        logger.error(f"Media previous error: {e}")
-        return jsonify({'status': 'error', 'message': str(e)}), 500
+    return _media_command('Previous', 'Previous track')
 
 DEFAULT_CONFIG = '/opt/camilladsp/config.default.yml'
 
@@ -751,20 +1289,17 @@ def quit_recovery():
 @app.route('/api/equalizer/reset-default', methods=['POST'])
 def reset_to_default():
     try:
-        if os.path.exists(CONFIG_FILE):
-            os.remove(CONFIG_FILE)
         # Restore from default (oakhz owns config.yml, no sudo needed)
         import shutil
-        shutil.copy(DEFAULT_CONFIG, CAMILLADSP_CONFIG)
-        subprocess.run(['sudo', 'pkill', '-HUP', 'camilladsp'], check=False)
-        # Reload eq state from restored config
-        eq.config = {
-            'enabled': True,
-            'preamp': eq._read_preamp_from_camilladsp(),
-            'bands': eq._read_bands_from_camilladsp(),
-            'preset': 'default',
-            'adaptive_volume': False
-        }
+        with eq._state_lock:
+            eq.forget_dsp_state()
+            shutil.copy(DEFAULT_CONFIG, eq.dsp_config.path)
+            subprocess.run(['sudo', 'pkill', '-HUP', 'camilladsp'], check=False)
+            # Reload eq state from restored config, and persist it so a restart keeps the reset
+            eq.config = eq._default_config()
+            eq.save_config()
+            eq.loudness.current = eq._read_loudness_from_camilladsp()
+            eq._sync_loudness()
         logger.info("Reset to default config.yml")
         return jsonify({'status': 'ok', 'config': eq.get_config()})
     except Exception as e:
@@ -775,15 +1310,32 @@ def reset_to_default():
 
 @app.route('/')
 def home():
-    return render_template('index.html')
+    page = assets.page('/', lambda: render_template('index.html', asset_url=assets.url))
+    return assets.serve(page, request.headers)
+
+@app.route('/assets/<name>')
+def static_asset(name):
+    response = assets.serve(name, request.headers)
+    if response is None:
+        return jsonify({'status': 'error', 'message': 'Not found'}), 404
+    return response
 
 @app.route("/<path:path>")
 def captive_portal_redirect(path):
     """Redirect all unknown paths to home page for captive portal detection"""
-    logger.info(f"Captive portal redirect: {path}")
+    probes.log.record('other', request.remote_addr)
     return redirect("http://192.168.50.1/", code=302)
 
 
 if __name__ == '__main__':
     eq.apply_current_config()
-    app.run(host='0.0.0.0', port=80, debug=False)
+    pulse.subscribe(eq.on_volume)
+    media_state.start()
+    volume_state.start()
+    metrics.start()
+    if HTTP_SERVER == 'flask':
+        app.wsgi_app = probes.middleware(app.wsgi_app)
+        app.run(host='0.0.0.0', port=80, debug=False, threaded=True)
+    else:
+        async_server.serve(app, '0.0.0.0', 80, limits=HTTP_ROUTE_LIMITS,
+                           route_key=async_server.flask_route_key(app), fast_path=probes.fast_path)
@@ -0,0 +1,129 @@
+"""
+OaKhz Audio - Loudness compensation
+ISO 226:2003 equal-loudness contours turned into a lookup table from sink volume
+(0-100%) to extra gain on the loudness filters, and a ramp that moves those gains
+live at a bounded rate so compensation follows the volume knob without steps.
+
+The ear loses bass (and some top treble) faster than midrange as the level drops.
+At the reference level (LOUDNESS_REFERENCE_PHON, full volume) compensation is 0 dB;
+below it, each filter gets the difference between the contour at the listening
+level and at the reference, at the frequency it acts on.
+"""
+import logging
+import math
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+LOUDNESS_REFERENCE_PHON = 85   # listening level at 100% volume, where the voicing was tuned
+LOUDNESS_MIN_PHON = 20         # ISO 226 contours are defined from 20 to 90 phon
+LOUDNESS_MAX_PHON = 90
+LOUDNESS_RAMP_DB_PER_SECOND = 3.0
+LOUDNESS_RAMP_INTERVAL = 0.1   # seconds between live gain steps while ramping
+
+# ISO 226:2003 table 1: frequency (Hz), exponent af, magnitude Lu and threshold Tf (dB)
+ISO226_FREQS = [20, 25, 31.5, 40, 50, 63, 80, 100, 125, 160, 200, 250, 315, 400, 500, 630,
+                800, 1000, 1250, 1600, 2000, 2500, 3150, 4000, 5000, 6300, 8000, 10000, 12500]
+ISO226_AF = [0.532, 0.506, 0.480, 0.455, 0.432, 0.409, 0.387, 0.367, 0.349, 0.330, 0.315,
+             0.301, 0.288, 0.276, 0.267, 0.259, 0.253, 0.250, 0.246, 0.244, 0.243, 0.243,
+             0.243, 0.242, 0.242, 0.245, 0.254, 0.271, 0.301]
+ISO226_LU = [-31.6, -27.2, -23.0, -19.1, -15.9, -13.0, -10.3, -8.1, -6.2, -4.5, -3.1, -2.0,
+             -1.1, -0.4, 0.0, 0.3, 0.5, 0.0, -2.7, -4.1, -1.0, 1.7, 2.5, 1.2, -2.1, -7.1,
+             -11.2, -10.7, -3.1]
+ISO226_TF = [78.5, 68.7, 59.5, 51.1, 44.0, 37.5, 31.5, 26.5, 22.1, 17.9, 14.4, 11.4, 8.6,
+             6.2, 4.4, 3.0, 2.2, 2.4, 3.5, 1.7, -1.3, -4.2, -6.0, -5.4, -1.5, 6.0, 12.6, 13.9, 12.3]
+
+
+def equal_loudness_spl(freq, phon):
+    """SPL (dB) of a tone at `freq` heard as loud as 1 kHz at `phon`, log-interpolated between table points"""
+    def spl(i):
+        af, lu, tf = ISO226_AF[i], ISO226_LU[i], ISO226_TF[i]
+        a = 4.47e-3 * (10 ** (0.025 * phon) - 1.15) + (0.4 * 10 ** ((tf + lu) / 10 - 9)) ** af
+        return 10 / af * math.log10(a) - lu + 94
+
+    freq = max(ISO226_FREQS[0], min(ISO226_FREQS[-1], freq))
+    for i in range(len(ISO226_FREQS) - 1):
+        low, high = ISO226_FREQS[i], ISO226_FREQS[i + 1]
+        if freq <= high:
+            t = math.log(freq / low) / math.log(high / low)
+            return spl(i) + t * (spl(i + 1) - spl(i))
+
+
+def volume_to_phon(percent):
+    """Listening level for a PulseAudio volume (cubic scale: 50% is about -18 dB)"""
+    if percent <= 0:
+        return LOUDNESS_MIN_PHON
+    level = LOUDNESS_REFERENCE_PHON + 60 * math.log10(percent / 100)
+    return max(LOUDNESS_MIN_PHON, min(LOUDNESS_MAX_PHON, level))
+
+
+def compensation_db(freq, phon, reference=LOUDNESS_REFERENCE_PHON):
+    """Boost at `freq` keeping its loudness relative to 1 kHz what it is at `reference`"""
+    return (equal_loudness_spl(freq, phon) - phon) - (equal_loudness_spl(freq, reference) - reference)
+
+
+def build_table(filters):
+    """[percent] -> {filter: gain} for `filters` = {name: (base gain, max boost, freq)}, in 0.1 dB steps"""
+    table = []
+    for percent in range(101):
+        phon = volume_to_phon(percent)
+        table.append({
+            name: round(base + max(0.0, min(max_boost, compensation_db(freq, phon))), 1)
+            for name, (base, max_boost, freq) in filters.items()
+        })
+    return table
+
+
+class GainRamp:
+    """Moves filter gains toward a target at a bounded rate, in a daemon thread.
+
+    `apply({filter: gain})` is called for every step; the first target is applied
+    directly, as there is nothing to ramp from.
+    """
+
+    def __init__(self, apply, rate=LOUDNESS_RAMP_DB_PER_SECOND, interval=LOUDNESS_RAMP_INTERVAL):
+        self.apply = apply
+        self.step = rate * interval
+        self.interval = interval
+        self.current = None
+        self._target = None
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def set_target(self, gains):
+        with self._lock:
+            self._target = dict(gains)
+        self._wake.set()
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _next(self):
+        """Gains one step closer to the target, None once there"""
+        with self._lock:
+            target = self._target
+        if self.current is None or set(self.current) != set(target):
+            return target
+        if self.current == target:
+            return None
+        return {
+            name: round(current + max(-self.step, min(self.step, target[name] - current)), 1)
+            for name, current in self.current.items()
+        }
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            gains = self._next()
+            while gains is not None:
+                try:
+                    self.apply(gains)
+                    self.current = gains
+                except Exception as e:
+                    logger.error(f"Gain ramp error: {e}")
+                    break
+                time.sleep(self.interval)
+                gains = self._next()
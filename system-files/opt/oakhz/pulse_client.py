@@ -0,0 +1,239 @@
+"""
+OaKhz Audio - PulseAudio volume client
+Shared by eq_server.py, oakhz-rotary.py and oakhz-audio-events.py: keeps a persistent
+native-protocol connection to the system PulseAudio server instead of forking pactl,
+and follows sink change events so volume changes are pushed rather than polled.
+Event sounds are kept in PulseAudio's sample cache and played by name (PulseSamples).
+"""
+import logging
+import os
+import subprocess
+import threading
+
+try:
+    import pulsectl
+except (ImportError, OSError):  # OSError: pulsectl is installed but libpulse.so.0 is missing
+    pulsectl = None
+
+logger = logging.getLogger(__name__)
+
+PULSE_SERVER = os.environ.get('PULSE_SERVER', 'unix:/run/pulse/native')
+PULSE_SINK = os.environ.get('OAKHZ_PULSE_SINK', 'camilladsp_out')
+PULSE_RECONNECT_DELAY = 2  # seconds between reconnection attempts
+PULSE_LISTEN_TIMEOUT = 1   # seconds, how often the listener checks for shutdown
+
+
+class PulsectlBackend:
+    """Native protocol access through libpulse (python3-pulsectl)"""
+
+    def __init__(self, server=PULSE_SERVER, client_name='oakhz'):
+        if pulsectl is None:
+            raise RuntimeError("python3-pulsectl is not installed")
+        self.server = server
+        self.client_name = client_name
+
+    def connect(self):
+        return pulsectl.Pulse(self.client_name, server=self.server)
+
+    def get_volume(self, conn, sink):
+        return conn.get_sink_by_name(sink).volume.value_flat
+
+    def set_volume(self, conn, sink, value):
+        conn.volume_set_all_chans(conn.get_sink_by_name(sink), value)
+
+    def listen(self, conn, stop):
+        """Block until a sink changes (True) or `stop` is set (False)"""
+        changed = []
+
+        def on_event(ev):
+            if ev.facility == 'sink' and ev.t == 'change':
+                changed.append(ev.index)
+                raise pulsectl.PulseLoopStop
+
+        conn.event_mask_set('sink')
+        conn.event_callback_set(on_event)
+        try:
+            while not changed and not stop.is_set():
+                conn.event_listen(timeout=PULSE_LISTEN_TIMEOUT)
+        finally:
+            conn.event_callback_set(None)
+        return bool(changed)
+
+    def close(self, conn):
+        conn.close()
+
+    def upload_sample(self, name, path):
+        """Load a sound file into the server's sample cache (pulsectl has no upload call, pactl does it)"""
+        subprocess.run(['pactl', 'upload-sample', path, name], check=True, timeout=10,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                       env=dict(os.environ, PULSE_SERVER=self.server))
+
+    def play_sample(self, conn, name, volume):
+        """Play a cached sample on the default sink, `volume` in 0-1"""
+        conn.play_sample(name, volume=volume)
+
+
+class PulseVolume:
+    """Get, set and subscribe to the volume (0-100%) of one sink.
+
+    Calls share one control connection guarded by a lock; a second connection
+    listens for sink events in a daemon thread and calls subscribers with the new
+    volume whenever it changes. Both reconnect automatically, so a PulseAudio
+    restart only costs the calls made while it is down.
+    """
+
+    def __init__(self, sink=PULSE_SINK, backend=None):
+        self.sink = sink
+        self.backend = backend or PulsectlBackend()
+        self.volume = None  # last known volume, kept current by the listener
+        self._conn = None
+        self._lock = threading.Lock()
+        self._subscribers = []
+        self._connect_callbacks = []
+        self._listener = None
+        self._stop = threading.Event()
+
+    def _with_connection(self, fn):
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._conn is None:
+                        self._conn = self.backend.connect()
+                        for callback in list(self._connect_callbacks):
+                            callback()
+                    return fn(self._conn)
+                except Exception:
+                    self._drop_connection()
+                    if attempt:
+                        raise
+
+    def _drop_connection(self):
+        if self._conn is not None:
+            try:
+                self.backend.close(self._conn)
+            except Exception:
+                pass
+            self._conn = None
+
+    def get(self):
+        """Current volume in percent"""
+        value = self._with_connection(lambda conn: self.backend.get_volume(conn, self.sink))
+        self.volume = round(value * 100)
+        return self.volume
+
+    def set(self, percent):
+        percent = max(0, min(100, int(percent)))
+        self._with_connection(lambda conn: self.backend.set_volume(conn, self.sink, percent / 100))
+        self.volume = percent
+        return percent
+
+    def on_connect(self, callback):
+        """Call `callback()` whenever the control connection is (re)established"""
+        self._connect_callbacks.append(callback)
+
+    def subscribe(self, callback):
+        """Call `callback(percent)` on every volume change of the sink"""
+        self._subscribers.append(callback)
+        self.start()
+
+    def start(self):
+        if self._listener is None:
+            self._stop.clear()
+            self._listener = threading.Thread(target=self._listen_loop, daemon=True)
+            self._listener.start()
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            self._drop_connection()
+
+    def _listen_loop(self):
+        conn = None
+        last = None
+        while not self._stop.is_set():
+            try:
+                if conn is None:
+                    conn = self.backend.connect()
+                    changed = True  # re-read after (re)connecting, a change may have been missed
+                else:
+                    changed = self.backend.listen(conn, self._stop)
+                if changed:
+                    percent = round(self.backend.get_volume(conn, self.sink) * 100)
+                    self.volume = percent
+                    if percent != last:
+                        last = percent
+                        for callback in list(self._subscribers):
+                            try:
+                                callback(percent)
+                            except Exception as e:
+                                logger.error(f"Volume subscriber error: {e}")
+            except Exception as e:
+                logger.warning(f"PulseAudio event connection lost: {e}")
+                if conn is not None:
+                    try:
+                        self.backend.close(conn)
+                    except Exception:
+                        pass
+                    conn = None
+                self._stop.wait(PULSE_RECONNECT_DELAY)
+        if conn is not None:
+            self.backend.close(conn)
+
+
+class PulseSamples:
+    """Sounds uploaded once to PulseAudio's sample cache and played by name.
+
+    Playing a cached sample is one call on the shared control connection of a
+    PulseVolume: no process to start and nothing to read from the SD card. A file
+    is uploaded again when its mtime changes, and every file after a reconnection
+    or a failed play, since a PulseAudio restart empties the cache.
+    """
+
+    def __init__(self, pulse):
+        self.pulse = pulse
+        self._mtimes = {}  # path -> mtime of the uploaded copy
+        self._lock = threading.Lock()
+        pulse.on_connect(self.forget)
+
+    def forget(self, path=None):
+        """Treat `path` (default: every file) as not uploaded, so the next load uploads it"""
+        with self._lock:
+            if path is None:
+                self._mtimes.clear()
+            else:
+                self._mtimes.pop(path, None)
+
+    @staticmethod
+    def sample_name(path):
+        return 'oakhz-' + os.path.splitext(os.path.basename(path))[0]
+
+    def load(self, path):
+        """Upload `path` unless the cached copy is current, return its sample name"""
+        name = self.sample_name(path)
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            if self._mtimes.get(path) != mtime:
+                self.pulse.backend.upload_sample(name, path)
+                self._mtimes[path] = mtime
+                logger.info(f"Uploaded {path} to the sample cache as {name}")
+        return name
+
+    def preload(self, paths):
+        for path in paths:
+            try:
+                self.load(path)
+            except Exception as e:
+                logger.error(f"Sample upload error for {path}: {e}")
+
+    def play(self, path, volume=1.0):
+        """Play `path` from the cache, uploading it again and retrying once if the sample is gone"""
+        for attempt in range(2):
+            name = self.load(path)
+            try:
+                self.pulse._with_connection(lambda conn: self.pulse.backend.play_sample(conn, name, volume))
+                return
+            except Exception as e:
+                if attempt:
+                    raise
+                logger.warning(f"Playing {name} failed ({e}), uploading it again")
+                self.forget(path)
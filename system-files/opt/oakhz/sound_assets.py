@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+OaKhz Audio - Event sound assets
+Converts the sounds in /opt/oakhz/sounds/ once, at install time, to the format
+CamillaDSP captures (devices.samplerate and capture format/channels of
+config.yml: 48 kHz S16LE stereo), so playing them needs no decoding or
+resampling:
+
+    python3 /opt/oakhz/sound_assets.py build
+
+Each sound is converted with sox (any rate or format sox reads, MP3 included),
+trimmed of leading and trailing silence and normalized to a loudness target
+(ITU-R BS.1770 integrated loudness, in LUFS) under a peak ceiling. The results go
+to sounds/native/ with a manifest of checksums; unchanged sources are skipped on
+the next build.
+
+SoundAssets is the runtime side: it resolves a sound name to its native file
+(or the source file when no build exists) and can map the PCM data of a native
+file straight into memory.
+"""
+import array
+import hashlib
+import json
+import logging
+import math
+import mmap
+import os
+import subprocess
+import sys
+import tempfile
+import wave
+
+logger = logging.getLogger(__name__)
+
+SOUNDS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sounds')
+NATIVE_DIR = 'native'
+MANIFEST = 'manifest.json'
+CAMILLADSP_CONFIG = '/opt/camilladsp/config.yml'
+SOURCE_EXTENSIONS = ('.wav', '.mp3', '.flac', '.ogg')
+
+SOUND_RATE = 48000
+SOUND_CHANNELS = 2
+SOUND_FORMAT = 'S16LE'      # the only format written; CamillaDSP's capture format in config.yml
+SOUND_LOUDNESS = -20.0      # LUFS target of the event sounds (played at 60% through PulseAudio)
+SOUND_LOUDNESS_OVERRIDES = {
+    # ready.wav is written straight into the loopback, without the 60% (-13 dB) sample
+    # volume the PulseAudio path applies: -20 LUFS as heard
+    'ready': -33.0,
+    # shutdown.wav goes straight to the DAC with CamillaDSP stopped: no volume control
+    'shutdown': -26.0,
+}
+SOUND_PEAK_CEILING = -1.0   # dBFS, normalization never pushes peaks above this
+SOUND_SILENCE = -60.0       # dBFS, quieter edges are trimmed
+SOUND_TRIM_PAD = (0.005, 0.05)  # seconds of silence kept before and after the sound
+
+# BS.1770 K-weighting at 48 kHz: high shelf then high-pass, (b, a) biquads
+K_WEIGHTING = (
+    ((1.53512485958697, -2.69169618940638, 1.19839281085285), (1.0, -1.69065929318241, 0.73248077421585)),
+    ((1.0, -2.0, 1.0), (1.0, -1.99004745483398, 0.99007225036621)),
+)
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def target_format(config_path=CAMILLADSP_CONFIG):
+    """(rate, channels, format) CamillaDSP captures, the defaults when config.yml is unreadable"""
+    try:
+        from ruamel.yaml import YAML
+        with open(config_path, 'r') as f:
+            devices = YAML(typ='safe').load(f)['devices']
+        return (devices.get('samplerate', SOUND_RATE), devices['capture'].get('channels', SOUND_CHANNELS),
+                devices['capture'].get('format', SOUND_FORMAT))
+    except Exception:
+        return SOUND_RATE, SOUND_CHANNELS, SOUND_FORMAT
+
+
+def _read_native(path, rate, channels):
+    """Interleaved int16 samples of `path`, converted by sox unless it already matches"""
+    try:
+        with wave.open(path, 'rb') as w:
+            if (w.getframerate(), w.getnchannels(), w.getsampwidth()) == (rate, channels, 2):
+                samples = array.array('h', w.readframes(w.getnframes()))
+                if sys.byteorder == 'big':
+                    samples.byteswap()
+                return samples
+    except (wave.Error, EOFError):
+        pass  # not a PCM WAV: let sox decode it
+    fd, tmp = tempfile.mkstemp(suffix='.wav')
+    os.close(fd)
+    try:
+        subprocess.run(['sox', path, '-b', '16', '-e', 'signed-integer', '-c', str(channels),
+                        tmp, 'rate', '-v', str(rate)], check=True, capture_output=True)
+        with wave.open(tmp, 'rb') as w:
+            samples = array.array('h', w.readframes(w.getnframes()))
+    finally:
+        os.unlink(tmp)
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    return samples
+
+
+def trim(samples, rate, channels):
+    """Drop leading and trailing frames below SOUND_SILENCE, keeping SOUND_TRIM_PAD around the sound"""
+    threshold = 32768 * 10 ** (SOUND_SILENCE / 20)
+    loud = [i // channels for i, x in enumerate(samples) if abs(x) > threshold]
+    if not loud:
+        return samples[:0]
+    frames = len(samples) // channels
+    start = max(0, loud[0] - int(SOUND_TRIM_PAD[0] * rate))
+    end = min(frames, loud[-1] + 1 + int(SOUND_TRIM_PAD[1] * rate))
+    return samples[start * channels:end * channels]
+
+
+def loudness(samples, rate, channels):
+    """Integrated loudness (LUFS) after BS.1770: K-weighting, 400 ms blocks, absolute and relative gates"""
+    if rate != 48000:
+        raise ValueError("K-weighting coefficients are for 48 kHz")
+    frames = len(samples) // channels
+    weighted = []
+    for c in range(channels):
+        x = [samples[i] / 32768 for i in range(c, len(samples), channels)]
+        for (b0, b1, b2), (_, a1, a2) in K_WEIGHTING:
+            y = [0.0] * frames
+            x1 = x2 = y1 = y2 = 0.0
+            for n, xn in enumerate(x):
+                yn = b0 * xn + b1 * x1 + b2 * x2 - a1 * y1 - a2 * y2
+                x2, x1, y2, y1 = x1, xn, y1, yn
+                y[n] = yn
+            x = y
+        weighted.append(x)
+
+    block, step = int(0.4 * rate), int(0.1 * rate)
+    starts = range(0, frames - block + 1, step) if frames >= block else [0]
+    powers = []
+    for start in starts:
+        end = min(frames, start + block)
+        powers.append(sum(sum(v * v for v in ch[start:end]) / (end - start) for ch in weighted))
+
+    def lufs(power):
+        return -0.691 + 10 * math.log10(max(power, 1e-12))
+
+    gated = [p for p in powers if lufs(p) > -70]
+    if not gated:
+        return -70.0
+    relative = lufs(sum(gated) / len(gated)) - 10
+    gated = [p for p in gated if lufs(p) > relative]
+    return lufs(sum(gated) / len(gated))
+
+
+def build(sounds_dir=SOUNDS_DIR, config_path=CAMILLADSP_CONFIG):
+    """Write native copies of the sounds in `sounds_dir` and their manifest, return the manifest"""
+    rate, channels, fmt = target_format(config_path)
+    if fmt != SOUND_FORMAT:
+        raise ValueError(f"CamillaDSP captures {fmt}, only {SOUND_FORMAT} sounds can be built")
+    out_dir = os.path.join(sounds_dir, NATIVE_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+    try:
+        with open(os.path.join(out_dir, MANIFEST), 'r') as f:
+            previous = json.load(f)
+    except (OSError, ValueError):
+        previous = {}
+    fmt_info = {'rate': rate, 'channels': channels, 'format': fmt}
+    manifest = {'format': fmt_info, 'sounds': {}}
+
+    for filename in sorted(os.listdir(sounds_dir)):
+        name, ext = os.path.splitext(filename)
+        source = os.path.join(sounds_dir, filename)
+        if ext.lower() not in SOURCE_EXTENSIONS or not os.path.isfile(source):
+            continue
+        source_sha256 = _sha256(source)
+        output = os.path.join(out_dir, name + '.wav')
+        old = previous.get('sounds', {}).get(name)
+        target = SOUND_LOUDNESS_OVERRIDES.get(name, SOUND_LOUDNESS)
+        if (old and previous.get('format') == fmt_info and old['source_sha256'] == source_sha256
+                and old['target_lufs'] == target and os.path.exists(output) and _sha256(output) == old['sha256']):
+            manifest['sounds'][name] = old
+            print(f"{filename}: unchanged")
+            continue
+
+        samples = _read_native(source, rate, channels)
+        before = len(samples) // channels
+        samples = trim(samples, rate, channels)
+        measured = loudness(samples, rate, channels) if samples else -70.0
+        peak = max((abs(x) for x in samples), default=0) / 32768
+        gain = target - measured
+        if peak > 0:
+            gain = min(gain, SOUND_PEAK_CEILING - 20 * math.log10(peak))
+        factor = 10 ** (gain / 20)
+        samples = array.array('h', (max(-32768, min(32767, round(x * factor))) for x in samples))
+        if sys.byteorder == 'big':
+            samples.byteswap()
+
+        with wave.open(output, 'wb') as w:
+            w.setnchannels(channels)
+            w.setsampwidth(2)
+            w.setframerate(rate)
+            w.writeframes(samples.tobytes())
+        manifest['sounds'][name] = {
+            'file': name + '.wav',
+            'sha256': _sha256(output),
+            'source': filename,
+            'source_sha256': source_sha256,
+            'frames': len(samples) // channels,
+            'trimmed_frames': before - len(samples) // channels,
+            'source_lufs': round(measured, 1),
+            'target_lufs': target,
+            'gain_db': round(gain, 1),
+        }
+        print(f"{filename} -> {NATIVE_DIR}/{name}.wav: {measured:.1f} LUFS {gain:+.1f} dB, "
+              f"trimmed {(before - len(samples) // channels) / rate * 1000:.0f} ms")
+
+    for filename in os.listdir(out_dir):
+        if filename != MANIFEST and os.path.splitext(filename)[0] not in manifest['sounds']:
+            os.remove(os.path.join(out_dir, filename))
+    with open(os.path.join(out_dir, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+class SoundAssets:
+    """Event sounds by name: the native build when there is one, else the source file"""
+
+    def __init__(self, sounds_dir=SOUNDS_DIR):
+        self.sounds_dir = sounds_dir
+        self.native_dir = os.path.join(sounds_dir, NATIVE_DIR)
+        try:
+            with open(os.path.join(self.native_dir, MANIFEST), 'r') as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError):
+            logger.warning(f"No sound build in {self.native_dir}, using the source files")
+            self.manifest = {'format': None, 'sounds': {}}
+
+    def is_native(self, name):
+        return name in self.manifest['sounds']
+
+    def path(self, name):
+        entry = self.manifest['sounds'].get(name)
+        if entry is not None:
+            return os.path.join(self.native_dir, entry['file'])
+        for ext in SOURCE_EXTENSIONS:
+            path = os.path.join(self.sounds_dir, name + ext)
+            if os.path.exists(path):
+                return path
+        return os.path.join(self.sounds_dir, name + '.wav')
+
+    def verify(self, name):
+        """True if the native file still matches its manifest checksum"""
+        entry = self.manifest['sounds'].get(name)
+        return entry is not None and _sha256(self.path(name)) == entry['sha256']
+
+    def pcm(self, name):
+        """Read-only memoryview of the native file's PCM data, mapped rather than read"""
+        if not self.is_native(name):
+            raise KeyError(f"{name} has no native build")
+        with open(self.path(name), 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        offset = 12  # after the RIFF/WAVE header, walk the chunks to 'data'
+        while offset + 8 <= len(data):
+            chunk, size = data[offset:offset + 4], int.from_bytes(data[offset + 4:offset + 8], 'little')
+            if chunk == b'data':
+                return memoryview(data)[offset + 8:offset + 8 + size]
+            offset += 8 + size + (size & 1)
+        raise ValueError(f"{self.path(name)} has no data chunk")
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] != ['build']:
+        print(f"Usage: {sys.argv[0]} build [SOUNDS_DIR]")
+        sys.exit(1)
+    build(*sys.argv[2:3])
@@ -0,0 +1,367 @@
+const frequencies = ['32 Hz', '64 Hz', '125 Hz', '250 Hz', '500 Hz', '1 kHz', '2 kHz', '4 kHz', '8 kHz', '16 kHz'];
+const presets = {
+    flat: [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+    rock: [5, 4, -2, -3, -1, 2, 4, 5, 5, 5],
+    pop: [-1, 3, 4, 4, 2, -1, -2, -2, -1, -1],
+    jazz: [4, 3, 1, 2, -1, -1, 0, 1, 2, 3],
+    classical: [5, 4, 3, 2, -1, -1, 0, 2, 3, 4],
+    bass: [6, 5, 4, 2, 0, -1, -2, -3, -3, -3],
+    treble: [-3, -3, -2, -1, 0, 2, 4, 5, 6, 6],
+    vocal: [-2, -3, -2, 1, 3, 3, 2, 1, 0, -1],
+    outdoor: [6, 6, 5, 2, -1, 0, 2, 5, 6, 6],
+    night: [2, 3, 4, 3, 3, 4, 3, 2, 1, 0],
+};
+
+let enabled = true;
+let currentPreset = 'default';
+let bandValues = [0, 0, 0, 0, 0, 0, 0, 0, 0, 0];
+let debounceTimers = {};
+let adaptiveVolume = false;
+let autoPreamp = false;
+
+// --- System Info ---
+function updateSystemInfo() {
+    fetch('/api/system/info')
+        .then(r => r.json())
+        .then(data => {
+            const ip = data.ip === "127.0.1.1" ? "192.168.50.1" : data.ip;
+            document.getElementById('sysIp').textContent = ip || '—';
+
+            const temp = data.cpu_temp;
+            const tempEl = document.getElementById('sysCpuTemp');
+            tempEl.textContent = temp != null ? `${temp}°C` : '—';
+            tempEl.className = 'system-item-value ' + (temp > 70 ? 'danger' : temp > 55 ? 'warning' : 'ok');
+
+            const cpu = data.cpu_usage;
+            const cpuEl = document.getElementById('sysCpuUsage');
+            cpuEl.textContent = cpu != null ? `${cpu}%` : '—';
+            cpuEl.className = 'system-item-value ' + (cpu > 80 ? 'danger' : cpu > 60 ? 'warning' : 'ok');
+
+            const ram = data.ram_usage;
+            const ramEl = document.getElementById('sysRam');
+            ramEl.textContent = ram != null ? `${ram}%` : '—';
+            ramEl.className = 'system-item-value ' + (ram > 80 ? 'danger' : ram > 60 ? 'warning' : 'ok');
+
+            document.getElementById('sysUptime').textContent = data.uptime || '—';
+
+            const dspEl = document.getElementById('sysDsp');
+            dspEl.textContent = data.camilladsp || '—';
+            dspEl.className = 'system-item-value ' + (data.camilladsp === 'active' ? 'ok' : 'danger');
+
+            const btEl = document.getElementById('sysBluetooth');
+            btEl.textContent = data.bluetooth_device || 'No device';
+            btEl.className = 'system-item-value ' + (data.bluetooth_device ? 'ok' : 'muted');
+        })
+        .catch(() => { });
+}
+
+// --- Media ---
+function updateMediaInfo() {
+    fetch('/api/media/info')
+        .then(r => r.json())
+        .then(showMediaInfo)
+        .catch(() => { });
+}
+
+function showMediaInfo(data) {
+    document.getElementById('mediaTitle').textContent = data.title || 'No media playing';
+    document.getElementById('mediaArtist').textContent = data.artist || 'Unknown Artist';
+    document.getElementById('mediaAlbum').textContent = data.album || '';
+    const statusEl = document.getElementById('mediaStatus');
+    statusEl.className = 'media-status ' + (data.status || 'stopped');
+    statusEl.textContent = data.status || 'stopped';
+    document.getElementById('playPauseIcon').textContent = data.status === 'playing' ? '⏸' : '▶️';
+}
+
+// Media info is pushed by the server; polling is only a fallback
+function followMediaInfo() {
+    if (!window.EventSource) {
+        setInterval(updateMediaInfo, 2000);
+        return;
+    }
+    const source = new EventSource('/api/media/events');
+    source.onmessage = e => showMediaInfo(JSON.parse(e.data));
+}
+
+function mediaPlayPause() {
+    fetch('/api/media/play-pause', { method: 'POST' })
+        .then(() => setTimeout(updateMediaInfo, 200))
+        .catch(() => { });
+}
+function mediaNext() {
+    fetch('/api/media/next', { method: 'POST' })
+        .then(() => setTimeout(updateMediaInfo, 200))
+        .catch(() => { });
+}
+function mediaPrevious() {
+    fetch('/api/media/previous', { method: 'POST' })
+        .then(() => setTimeout(updateMediaInfo, 200))
+        .catch(() => { });
+}
+
+// --- Volume ---
+function updateVolume(value) {
+    document.getElementById('volumeValue').textContent = `${value}%`;
+    if (debounceTimers.volume) clearTimeout(debounceTimers.volume);
+    debounceTimers.volume = setTimeout(() => {
+        debounceTimers.volume = null;
+        fetch('/api/volume', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ volume: parseInt(value) })
+        }).catch(() => {});
+    }, 150);
+}
+
+function showVolume(data) {
+    const v = data.volume ?? 75;
+    document.getElementById('volumeSlider').value = v;
+    document.getElementById('volumeValue').textContent = `${v}%`;
+}
+
+function loadVolume() {
+    fetch('/api/volume')
+        .then(r => r.json())
+        .then(showVolume)
+        .catch(() => {});
+}
+
+// Volume changes (rotary encoder, phone) are pushed by the server
+function followVolume() {
+    if (!window.EventSource) {
+        setInterval(loadVolume, 3000);
+        return;
+    }
+    const source = new EventSource('/api/volume/events');
+    source.onmessage = e => {
+        // Don't fight the slider while a local change is still pending
+        if (!debounceTimers.volume) showVolume(JSON.parse(e.data));
+    };
+}
+
+// --- EQ ---
+function initBands() {
+    const container = document.getElementById('bands');
+    frequencies.forEach((freq, index) => {
+        const band = document.createElement('div');
+        band.className = 'band';
+        band.innerHTML = `
+            <div class="band-slider-container">
+                <input type="range" class="slider band-slider"
+                       id="band${index}" min="-12" max="12" value="0"
+                       oninput="updateBand(${index}, this.value)">
+                <div class="band-center-line"></div>
+            </div>
+            <span class="band-value" id="bandValue${index}">0</span>
+            <span class="band-label">${freq}</span>
+        `;
+        container.appendChild(band);
+    });
+}
+
+function updateBand(index, value) {
+    bandValues[index] = parseInt(value);
+    document.getElementById(`bandValue${index}`).textContent = value > 0 ? `+${value}` : value;
+    currentPreset = 'custom';
+    updatePresetButtons();
+    // One batched request for all bands moved during the debounce window
+    if (debounceTimers.bands) clearTimeout(debounceTimers.bands);
+    debounceTimers.bands = setTimeout(() => {
+        sendStateToBackend({ bands: bandValues });
+    }, 150);
+}
+
+function updatePreamp(value) {
+    document.getElementById('preampValue').textContent = `${value > 0 ? '+' : ''}${value} dB`;
+    showAutoPreamp(false);  // a manual preamp turns auto mode off
+    if (debounceTimers.preamp) clearTimeout(debounceTimers.preamp);
+    debounceTimers.preamp = setTimeout(() => {
+        sendToBackend('preamp', { value: parseInt(value) });
+    }, 150);
+}
+
+function togglePower() {
+    enabled = !enabled;
+    const btn = document.getElementById('powerBtn');
+    document.getElementById('powerText').textContent = enabled ? 'ON' : 'OFF';
+    btn.classList.toggle('off', !enabled);
+    sendToBackend('enabled', { value: enabled });
+}
+
+function toggleAdaptiveVolume() {
+    adaptiveVolume = !adaptiveVolume;
+    const btn = document.getElementById('adaptiveBtn');
+    btn.classList.toggle('active', adaptiveVolume);
+    document.getElementById('adaptiveText').textContent = adaptiveVolume ? 'Adaptive ON' : 'Adaptive';
+    sendToBackend('adaptive_volume', { value: adaptiveVolume });
+}
+
+function showAutoPreamp(on) {
+    autoPreamp = on;
+    document.getElementById('autoPreampBtn').classList.toggle('active', on);
+    document.getElementById('autoPreampText').textContent = on ? 'Auto ON' : 'Auto';
+}
+
+function toggleAutoPreamp() {
+    showAutoPreamp(!autoPreamp);
+    sendStateToBackend({ auto_preamp: autoPreamp });
+}
+
+// Preamp chosen by the server in auto mode, and the predicted peak level
+function showPreamp(config) {
+    if (config && config.auto_preamp && !debounceTimers.preamp) {
+        document.getElementById('preampSlider').value = config.preamp;
+        document.getElementById('preampValue').textContent = `${config.preamp > 0 ? '+' : ''}${config.preamp} dB`;
+    }
+    loadHeadroom();
+}
+
+function loadHeadroom() {
+    fetch('/api/equalizer/headroom')
+        .then(r => r.json())
+        .then(headroom => {
+            if (headroom.peak_db === undefined) return;
+            const el = document.getElementById('headroomValue');
+            const peak = headroom.peak_db;
+            let text = `Predicted peak: ${peak > 0 ? '+' : ''}${peak} dBFS at ${Math.round(headroom.peak_freq)} Hz`;
+            if (headroom.preamp_limited) {
+                text += ` — clipping by ${headroom.clipping_db} dB, auto preamp at its ${headroom.preamp} dB limit`;
+            } else if (headroom.clipping) {
+                text += ` — clipping by ${headroom.clipping_db} dB`;
+            }
+            el.textContent = text;
+            el.classList.toggle('clipping', headroom.clipping);
+        })
+        .catch(() => { });
+}
+
+function applyPreset(presetName) {
+    currentPreset = presetName;
+    const values = presets[presetName];
+    if (!values) return;
+    values.forEach((value, index) => {
+        bandValues[index] = value;
+        document.getElementById(`band${index}`).value = value;
+        document.getElementById(`bandValue${index}`).textContent = value > 0 ? `+${value}` : value;
+    });
+    updatePresetButtons();
+    sendToBackend('preset', { name: presetName });
+}
+
+function updatePresetButtons() {
+    document.querySelectorAll('.preset-btn').forEach(btn => {
+        const name = btn.textContent.replace(/[^a-zA-Z]/g, '').toLowerCase();
+        btn.classList.toggle('active', name === currentPreset);
+    });
+}
+
+function resetEqualizer() {
+    applyPreset('flat');
+    document.getElementById('preampSlider').value = 0;
+    document.getElementById('preampValue').textContent = '0 dB';
+}
+
+function sendToBackend(type, data) {
+    fetch('/api/equalizer', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ type, data })
+    })
+        .then(r => r.json())
+        .then(result => showPreamp(result.config))
+        .catch(() => { });
+}
+
+function sendStateToBackend(state) {
+    fetch('/api/equalizer', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(state)
+    })
+        .then(r => r.json())
+        .then(result => showPreamp(result.config))
+        .catch(() => { });
+}
+
+function resetToDefault() {
+    fetch('/api/equalizer/reset-default', { method: 'POST' })
+        .then(r => r.json())
+        .then(config => {
+            loadConfig();
+        })
+        .catch(() => { });
+}
+
+function loadConfig() {
+    fetch('/api/equalizer')
+        .then(r => r.json())
+        .then(config => {
+            enabled = config.enabled;
+            currentPreset = config.preset;
+            adaptiveVolume = config.adaptive_volume || false;
+
+            if (!enabled) {
+                document.getElementById('powerBtn').classList.add('off');
+                document.getElementById('powerText').textContent = 'OFF';
+            }
+            if (adaptiveVolume) {
+                document.getElementById('adaptiveBtn').classList.add('active');
+                document.getElementById('adaptiveText').textContent = 'Adaptive ON';
+            }
+            showAutoPreamp(config.auto_preamp || false);
+
+            config.bands.forEach((value, index) => {
+                document.getElementById(`band${index}`).value = value;
+                document.getElementById(`bandValue${index}`).textContent = value > 0 ? `+${value}` : value;
+            });
+
+            document.getElementById('preampSlider').value = config.preamp;
+            document.getElementById('preampValue').textContent = `${config.preamp > 0 ? '+' : ''}${config.preamp} dB`;
+            loadHeadroom();
+
+            updatePresetButtons();
+        })
+        .catch(() => { });
+}
+
+// --- Recovery Mode ---
+let recoveryActive = false;
+
+function updateRecoveryBtn() {
+    const btn = document.getElementById('recoveryBtn');
+    document.getElementById('recoveryIcon').textContent = recoveryActive ? '⚠️' : '🌐';
+    document.getElementById('recoveryText').textContent = recoveryActive ? 'Quit recovery mode' : 'Start recovery mode';
+    btn.style.background = recoveryActive ? '#7a3030' : '#5a4a3a';
+}
+
+function toggleRecovery() {
+    if (recoveryActive) {
+        fetch('/api/recovery/quit', { method: 'POST' })
+            .then(r => r.json())
+            .then(() => { recoveryActive = false; updateRecoveryBtn(); })
+            .catch(() => { });
+    } else {
+        if (!confirm('Start recovery mode? The AP will stop and NetworkManager will connect to a saved Wi-Fi network.')) return;
+        fetch('/api/recovery/start', { method: 'POST' })
+            .then(r => r.json())
+            .then(() => { recoveryActive = true; updateRecoveryBtn(); })
+            .catch(() => { });
+    }
+}
+
+function loadRecoveryStatus() {
+    fetch('/api/recovery')
+        .then(r => r.json())
+        .then(data => { recoveryActive = data.active; updateRecoveryBtn(); })
+        .catch(() => { });
+}
+
+// Init
+initBands();
+loadConfig();
+followVolume();
+followMediaInfo();
+updateSystemInfo();
+loadRecoveryStatus();
+
+setInterval(updateSystemInfo, 10000);
@@ -0,0 +1,113 @@
+"""
+OaKhz Audio - Velocity-sensitive volume steps for the rotary encoder
+The volume change of a detent depends on how fast the encoder turns: 1% per
+detent when turning slowly, for fine adjustment, up to ACCEL_MAX_STEP when
+spinning, so a full sweep takes a flick instead of several turns.
+
+The turning rate (detents per second) is estimated from the timestamps of the
+detents, as a moving average of the intervals between them. Stopping for
+ACCEL_IDLE or reversing direction starts over from the slow end.
+
+The curve can be changed without editing code, in ~/.oakhz_rotary.json:
+
+    {"volume_acceleration": {"min_step": 1, "max_step": 8, "slow_rate": 5,
+                             "fast_rate": 40, "exponent": 2}}
+"""
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+ROTARY_CONFIG = os.environ.get('OAKHZ_ROTARY_CONFIG', os.path.expanduser('~/.oakhz_rotary.json'))
+
+ACCEL_MIN_STEP = 1      # % per detent when turning slowly
+ACCEL_MAX_STEP = 8      # % per detent when spinning fast
+ACCEL_SLOW_RATE = 5.0   # detents/s up to which steps stay at min_step
+ACCEL_FAST_RATE = 40.0  # detents/s from which steps are max_step (a KY-040 has 20 detents per turn)
+ACCEL_EXPONENT = 2.0    # shape of the curve between the two rates, 1 is linear
+ACCEL_SMOOTHING = 0.5   # weight of the newest interval in the rate estimate
+ACCEL_IDLE = 0.25       # seconds without a detent after which the rate starts over
+
+
+class AccelerationCurve:
+    """Volume step (whole percent) for a turning rate (detents/s)"""
+
+    FIELDS = ('min_step', 'max_step', 'slow_rate', 'fast_rate', 'exponent')
+
+    def __init__(self, min_step=ACCEL_MIN_STEP, max_step=ACCEL_MAX_STEP, slow_rate=ACCEL_SLOW_RATE,
+                 fast_rate=ACCEL_FAST_RATE, exponent=ACCEL_EXPONENT):
+        if not 1 <= min_step <= max_step:
+            raise ValueError(f"Steps must satisfy 1 <= min_step <= max_step, got {min_step} and {max_step}")
+        if not 0 <= slow_rate < fast_rate:
+            raise ValueError(f"Rates must satisfy 0 <= slow_rate < fast_rate, got {slow_rate} and {fast_rate}")
+        if exponent <= 0:
+            raise ValueError(f"Exponent must be positive, got {exponent}")
+        self.min_step = min_step
+        self.max_step = max_step
+        self.slow_rate = slow_rate
+        self.fast_rate = fast_rate
+        self.exponent = exponent
+
+    @classmethod
+    def from_dict(cls, params):
+        unknown = set(params) - set(cls.FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown acceleration parameters: {', '.join(sorted(unknown))}")
+        return cls(**params)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    def step(self, rate):
+        if rate <= self.slow_rate:
+            return round(self.min_step)
+        t = min(1.0, (rate - self.slow_rate) / (self.fast_rate - self.slow_rate))
+        return round(self.min_step + (self.max_step - self.min_step) * t ** self.exponent)
+
+
+def load_curve(path=ROTARY_CONFIG):
+    """Curve from the 'volume_acceleration' section of `path`, the defaults if it is missing or invalid"""
+    try:
+        with open(path, 'r') as f:
+            params = json.load(f).get('volume_acceleration', {})
+        curve = AccelerationCurve.from_dict(params)
+        logger.info(f"Volume acceleration loaded from {path}")
+        return curve
+    except FileNotFoundError:
+        return AccelerationCurve()
+    except Exception as e:
+        logger.error(f"Error loading volume acceleration from {path}: {e}")
+        return AccelerationCurve()
+
+
+class Accelerator:
+    """Turns detents into signed volume steps, following the turning rate"""
+
+    def __init__(self, curve=None, smoothing=ACCEL_SMOOTHING, idle=ACCEL_IDLE, clock=time.monotonic):
+        self.curve = curve or AccelerationCurve()
+        self.smoothing = smoothing
+        self.idle = idle
+        self.clock = clock
+        self.rate = 0.0
+        self._interval = None
+        self._last = None
+        self._direction = 0
+
+    def detent(self, direction, now=None):
+        """Volume change (percent) for one detent, +1 clockwise, -1 counter-clockwise"""
+        if now is None:
+            now = self.clock()
+        if self._last is None or direction != self._direction or now - self._last > self.idle:
+            self._interval = None
+        else:
+            interval = max(now - self._last, 1e-3)
+            if self._interval is None:
+                self._interval = interval
+            else:
+                self._interval = self.smoothing * interval + (1 - self.smoothing) * self._interval
+        self._last = now
+        self._direction = direction
+        self.rate = 0.0 if self._interval is None else 1 / self._interval
+        return direction * self.curve.step(self.rate)
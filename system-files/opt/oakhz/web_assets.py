@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+OaKhz Audio - Static assets of the web UI
+The CSS and JS in static/ are published under content-hashed names
+(oakhz.<sha256>.css) with gzip and brotli copies, built once at install time:
+
+    python3 /opt/oakhz/web_assets.py build
+
+AssetStore keeps every variant in memory and serves the best encoding the
+browser accepts, with a strong ETag and a one-year immutable Cache-Control; a
+new build changes the names, so caches never need to be invalidated. Pages
+(the rendered index.html shell) are cached the same way but revalidated on
+every visit, which costs a 304 and no body while nothing changed.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import sys
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST = 'manifest.json'
+ASSET_URL_PREFIX = '/assets/'
+ASSET_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+PAGE_CACHE_CONTROL = 'no-cache'  # always revalidate, answered with 304 while unchanged
+
+# Content-Encoding -> file suffix, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def _compress(data):
+    """{encoding: bytes} for every encoding available here, identity included"""
+    variants = {'identity': data, 'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(data, quality=11)
+    return variants
+
+
+def compile_assets(static_dir=STATIC_DIR):
+    """{name: (hashed name, variants)} for the source files of `static_dir`"""
+    assets = {}
+    for name in sorted(os.listdir(static_dir)):
+        path = os.path.join(static_dir, name)
+        if not os.path.isfile(path):
+            continue
+        with open(path, 'rb') as f:
+            data = f.read()
+        stem, ext = os.path.splitext(name)
+        assets[name] = (f"{stem}.{_digest(data)}{ext}", _compress(data))
+    return assets
+
+
+def build(static_dir=STATIC_DIR, dist_dir=DIST_DIR):
+    """Write hashed and precompressed assets plus their manifest to `dist_dir`"""
+    os.makedirs(dist_dir, exist_ok=True)
+    manifest = {}
+    keep = {MANIFEST}
+    for name, (hashed, variants) in compile_assets(static_dir).items():
+        manifest[name] = hashed
+        for encoding, data in variants.items():
+            filename = hashed + dict(ENCODINGS).get(encoding, '')
+            keep.add(filename)
+            with open(os.path.join(dist_dir, filename), 'wb') as f:
+                f.write(data)
+        sizes = ', '.join(f"{e}={len(d)}" for e, d in sorted(variants.items()))
+        print(f"{name} -> {hashed} ({sizes})")
+    with open(os.path.join(dist_dir, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    for filename in os.listdir(dist_dir):
+        if filename not in keep:
+            os.remove(os.path.join(dist_dir, filename))
+    return manifest
+
+
+def _accepted(accept_encoding):
+    accepted = set()
+    for token in (accept_encoding or '').split(','):
+        coding, _, params = token.strip().partition(';')
+        if params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class AssetStore:
+    """In-memory hashed assets and cached pages, served with ETag negotiation"""
+
+    def __init__(self, static_dir=STATIC_DIR, dist_dir=DIST_DIR):
+        self.static_dir = static_dir
+        self.dist_dir = dist_dir
+        self._urls = {}     # source name -> /assets/<hashed name>
+        self._files = {}    # hashed name or page name -> entry
+        self._loaded = False
+
+    def _add(self, key, variants, content_type, cache_control):
+        digest = _digest(variants['identity'])
+        self._files[key] = {
+            'content_type': content_type,
+            'cache_control': cache_control,
+            'variants': {encoding: (f'"{digest}-{encoding}"', data) for encoding, data in variants.items()},
+        }
+
+    def load(self):
+        """Read the built assets, or compile them in memory when no build exists"""
+        manifest_path = os.path.join(self.dist_dir, MANIFEST)
+        try:
+            with open(manifest_path, 'r') as f:
+                manifest = json.load(f)
+            assets = {}
+            for name, hashed in manifest.items():
+                variants = {}
+                for encoding, suffix in (('identity', ''),) + ENCODINGS:
+                    path = os.path.join(self.dist_dir, hashed + suffix)
+                    if os.path.exists(path):
+                        with open(path, 'rb') as f:
+                            variants[encoding] = f.read()
+                assets[name] = (hashed, variants)
+        except FileNotFoundError:
+            logger.warning(f"{manifest_path} not found, compiling web assets in memory")
+            assets = compile_assets(self.static_dir)
+        for name, (hashed, variants) in assets.items():
+            content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+            if content_type.startswith('text/') or content_type.endswith('javascript'):
+                content_type += '; charset=utf-8'
+            self._urls[name] = ASSET_URL_PREFIX + hashed
+            self._add(hashed, variants, content_type, ASSET_CACHE_CONTROL)
+        self._loaded = True
+
+    def url(self, name):
+        """Hashed URL of a source asset, for templates"""
+        if not self._loaded:
+            self.load()
+        return self._urls[name]
+
+    def page(self, key, render):
+        """Serve page `key`, rendering it with `render()` the first time"""
+        if key not in self._files:
+            data = render().encode('utf-8')
+            self._add(key, _compress(data), 'text/html; charset=utf-8', PAGE_CACHE_CONTROL)
+        return key
+
+    def serve(self, key, request_headers):
+        """(body, status, headers) for a Flask view, None if `key` is unknown"""
+        if not self._loaded:
+            self.load()
+        entry = self._files.get(key)
+        if entry is None:
+            return None
+        accepted = _accepted(request_headers.get('Accept-Encoding'))
+        encoding = next((e for e, _ in ENCODINGS if e in accepted and e in entry['variants']), 'identity')
+        etag, data = entry['variants'][encoding]
+        headers = {
+            'ETag': etag,
+            'Cache-Control': entry['cache_control'],
+            'Vary': 'Accept-Encoding',
+        }
+        if_none_match = request_headers.get('If-None-Match', '')
+        tags = [tag.strip().replace('W/', '', 1) for tag in if_none_match.split(',')]
+        if etag in tags or '*' in tags:
+            return b'', 304, headers
+        headers['Content-Type'] = entry['content_type']
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+        return data, 200, headers
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] != ['build']:
+        print(f"Usage: {sys.argv[0]} build")
+        sys.exit(1)
+    build()
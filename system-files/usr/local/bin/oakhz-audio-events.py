@@ -11,23 +11,112 @@ import time
 import logging
 import sys
 import os
+import queue
+import socket
+import threading
+
+# Shared OaKhz modules (bluez_client) are installed next to eq_server.py
+sys.path.insert(0, '/opt/oakhz')
+from bluez_client import (BluezClient, BluezMonitor, EventRecorder, DEVICE_IFACE,
+                          load_events, replay_events)
+from pulse_client import PulseVolume, PulseSamples
+from sound_assets import SoundAssets
+from alsa_playback import ALSA_DEVICE, DeviceBusy, play_pcm, wait_for_capture
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
-# Sound files
-SOUND_READY = '/opt/oakhz/sounds/ready.wav'
-SOUND_CONNECT = "/opt/oakhz/sounds/connect.wav"
-SOUND_DISCONNECT = "/opt/oakhz/sounds/disconnect.wav"
+# Sound files: the 48 kHz S16LE builds of sound_assets.py, or the sources without a build
+sounds = SoundAssets()
+SOUND_READY = sounds.path('ready')
+SOUND_CONNECT = sounds.path('connect')
+SOUND_DISCONNECT = sounds.path('disconnect')
+SOUNDS = (SOUND_READY, SOUND_CONNECT, SOUND_DISCONNECT)
+SOUND_VOLUME = 0.6  # relative to the sink volume, as `paplay --volume` had it
+
+# 'alsa': the ready chime goes straight into the loopback as soon as CamillaDSP captures,
+# without waiting for PulseAudio; 'pulse': every sound goes through PulseAudio
+SOUND_BACKEND = os.environ.get('OAKHZ_SOUND_BACKEND', 'alsa')
+SOUND_DEVICE = os.environ.get('OAKHZ_SOUND_DEVICE', ALSA_DEVICE)  # or 'null', 'file:/tmp/out.raw'
+CAMILLADSP_WAIT = 10      # seconds to wait for CamillaDSP's capture before playing anyway
+PULSE_WAIT_INTERVAL = 0.2  # seconds between PulseAudio connection attempts
+
+_pulse = None
+_samples = None
+
+
+def get_pulse():
+    """Shared PulseAudio connection and sample cache, created on first use"""
+    global _pulse, _samples
+    if _pulse is None:
+        _pulse = PulseVolume()
+        _samples = PulseSamples(_pulse)
+    return _pulse, _samples
+
+
+def wait_for_pulse():
+    """Block until PulseAudio accepts connections"""
+    while True:
+        try:
+            get_pulse()[0].get()
+            return
+        except Exception as e:
+            logger.debug(f'Waiting for PulseAudio: {e}')
+            time.sleep(PULSE_WAIT_INTERVAL)
 
-def play_sound(sound_file, restore_volume=True):
-    """Play sound using paplay (PulseAudio) with volume adjustment"""
+
+def notify_systemd(state='READY=1'):
+    """Report start-up to systemd (Type=notify); does nothing outside such a service"""
+    address = os.environ.get('NOTIFY_SOCKET')
+    if not address:
+        return
+    if address.startswith('@'):
+        address = '\0' + address[1:]  # abstract socket
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.connect(address)
+            sock.sendall(state.encode())
+    except OSError as e:
+        logger.warning(f'systemd notification failed: {e}')
+
+
+def play_direct(name):
+    """Play the native build of `name` straight into the ALSA loopback, False if it cannot be"""
+    if SOUND_BACKEND != 'alsa' or not sounds.is_native(name):
+        return False
+    try:
+        fmt = sounds.manifest['format']
+        if SOUND_DEVICE == ALSA_DEVICE and not wait_for_capture(CAMILLADSP_WAIT):
+            logger.warning('CamillaDSP is not capturing yet, playing anyway')
+        play_pcm(sounds.pcm(name), fmt['rate'], fmt['channels'], device=SOUND_DEVICE)
+        return True
+    except DeviceBusy:
+        logger.info(f'{SOUND_DEVICE} is held by PulseAudio, playing {name} through it')
+        return False
+    except Exception as e:
+        logger.warning(f'Direct ALSA playback of {name} failed ({e}), using PulseAudio')
+        return False
+
+
+def preload_sounds():
+    """Upload the event sounds to PulseAudio's sample cache so events play them by name"""
+    try:
+        get_pulse()[1].preload(SOUNDS)
+    except Exception as e:
+        logger.error(f'Sound preload error: {e}')
+
+
+def play_sound(sound_file, restore_volume=True, volume=SOUND_VOLUME):
+    """Play a sound from PulseAudio's sample cache, with paplay as the fallback"""
     try:
         logger.info(f'Playing: {sound_file}')
-        
-        volume_percent = 60
-        pa_volume = int(65536 * volume_percent / 100)
+        get_pulse()[1].play(sound_file, volume)
+        return
+    except Exception as e:
+        logger.warning(f'Sample cache playback failed ({e}), falling back to paplay')
+    try:
+        pa_volume = int(65536 * volume)
 
         env = os.environ.copy()
         env['PULSE_SERVER'] = 'unix:/run/pulse/native'
@@ -49,105 +138,117 @@ def play_sound(sound_file, restore_volume=True):
 def play_ready_sound():
     """Play ready sound at startup"""
     logger.info('Playing ready sound (Bluetooth discoverable)')
+    played = play_direct('ready')
+    # pulseaudio.service is ordered after this one: its camilladsp_out sink opens the
+    # loopback subdevice the chime held, so it may only start now
+    notify_systemd()
+    if played:
+        logger.info('Ready sound played (direct ALSA)')
+        return
 
-    env = os.environ.copy()
-    env['PULSE_SERVER'] = 'unix:/run/pulse/native'
-
+    wait_for_pulse()
     # Force sink to 100% before playing
-    subprocess.run(
-        ['pactl', 'set-sink-volume', '@DEFAULT_SINK@', '100%'],
-        env=env
-    )
-    # Wait for audio system to be fully ready
-    play_sound(SOUND_READY, restore_volume=False)
-    logger.info('Ready sound played')
-
-def disconnect_device(mac_address):
-    """Disconnect a Bluetooth device"""
     try:
-        result = subprocess.run(
-            ['bluetoothctl', 'disconnect', mac_address],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        if result.returncode == 0:
-            logger.info(f"Disconnected old device: {mac_address}")
-            return True
-        return False
+        get_pulse()[0].set(100)
     except Exception as e:
-        logger.error(f"Disconnect error: {e}")
-        return False
+        logger.error(f'Set volume error: {e}')
+    # The native ready build is normalized for unattenuated direct playback: full sample
+    # volume then; the source file gets the usual event volume
+    play_sound(SOUND_READY, restore_volume=False, volume=1.0 if sounds.is_native('ready') else SOUND_VOLUME)
+    logger.info('Ready sound played')
 
-def get_connected_devices():
-    """Get list of connected device MAC addresses using bluetoothctl info"""
-    try:
-        result = subprocess.run(
-            ['bluetoothctl', 'devices'],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        devices = set()
-        for line in result.stdout.splitlines():
-            if 'Device' in line:
-                mac = line.split()[1]
-                # Check if device is connected
-                info = subprocess.run(
-                    ['bluetoothctl', 'info', mac],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-                if 'Connected: yes' in info.stdout:
-                    devices.add(mac)
-        return devices
-    except Exception as e:
-        logger.error(f'Device retrieval error: {e}')
-        return set()
+class ConnectionMonitor:
+    """Single device mode driven by BlueZ signals.
+
+    Reacts to Device1 `Connected` changes instead of polling bluetoothctl: the
+    connect sound and the disconnection of older devices are queued as soon as
+    the signal arrives. Sounds and disconnections run on a worker thread so the
+    D-Bus main loop is never blocked.
+    """
 
-def monitor_bluetooth():
-    """Monitor Bluetooth connections (single device mode, robust reconnection detection)"""
+    def __init__(self, monitor, client, dry_run=False):
+        self.monitor = monitor
+        self.client = client
+        self.dry_run = dry_run
+        self.connected = []  # device paths, oldest first
+        self.disconnecting = set()  # device paths with a disconnection queued or running
+        self.jobs = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run_jobs, daemon=True)
+        monitor.add_listener(self._on_event)
+
+    def start(self):
+        self._worker.start()
+
+    def _on_event(self, event, path, interface, changed):
+        if event == 'reset':
+            self._sync()
+        elif event in ('added', 'removed') and DEVICE_IFACE in changed:
+            self._sync()
+        elif event == 'changed' and interface == DEVICE_IFACE and 'Connected' in changed:
+            self._sync()
+
+    def _sync(self):
+        current = [d['path'] for d in self.client.connected_devices(self.monitor.objects)]
+        with self._lock:
+            for path in [p for p in self.connected if p not in current]:
+                logger.info(f'Device disconnected: {path}')
+                self.connected.remove(path)
+            self.disconnecting.intersection_update(current)
+            new_devices = [p for p in current if p not in self.connected]
+            for path in new_devices:
+                logger.info(f'Device connected/reconnected: {path}')
+                self.connected.append(path)
+            if new_devices:
+                self.jobs.put(('sound', SOUND_CONNECT))
+            if len(self.connected) > 1:
+                logger.warning(f"Multiple devices connected: {self.connected}. Enforcing single device mode.")
+                # BlueZ sends several signals per connection: queue each disconnection once
+                for path in self.connected[:-1]:
+                    if path not in self.disconnecting:
+                        self.disconnecting.add(path)
+                        self.jobs.put(('disconnect', path))
+
+    def _run_jobs(self):
+        while True:
+            job, arg = self.jobs.get()
+            try:
+                if self.dry_run:
+                    logger.info(f'[dry-run] {job}: {arg}')
+                elif job == 'sound':
+                    play_sound(arg)
+                elif job == 'disconnect':
+                    logger.info(f"Disconnecting extra device: {arg}")
+                    self.client.disconnect(arg)
+            except Exception as e:
+                logger.error(f'{job} error: {e}')
+                if job == 'disconnect':
+                    with self._lock:
+                        self.disconnecting.discard(arg)  # the next signal retries it
+            finally:
+                self.jobs.task_done()
+
+
+def monitor_bluetooth(replay_file=None, record_file=None):
+    """Monitor Bluetooth connections (single device mode, driven by BlueZ signals)"""
     logger.info('Starting Bluetooth monitor (single device mode)')
-    previous_devices = set()
-    last_connected_device = None
+    monitor = BluezMonitor()
+    connections = ConnectionMonitor(monitor, BluezClient(), dry_run=replay_file is not None)
+    connections.start()
 
-    while True:
-        try:
-            current_devices = get_connected_devices()
-            logger.info(f"🔍 Current: {current_devices}, Last: {last_connected_device}")
-
-            if len(current_devices) > 1:
-                logger.warning(f"Multiple devices connected: {current_devices}. Enforcing single device mode.")
-                first_device = list(current_devices)[0]
-                for mac in current_devices:
-                    if mac != first_device:
-                        logger.info(f"Disconnecting extra device: {mac}")
-                        disconnect_device(mac)
-                current_devices = {first_device}
-                time.sleep(1)
-
-            if current_devices:
-                current_device = list(current_devices)[0]
-                if current_device != last_connected_device:
-                    logger.info(f'Device connected/reconnected: {current_device}')
-                    # time.sleep(2)
-                    play_sound(SOUND_CONNECT)
-                    last_connected_device = current_device
-            else:
-                if last_connected_device is not None:
-                    logger.info(f'Device disconnected: {last_connected_device}')
-                    last_connected_device = None
-
-            previous_devices = current_devices.copy()
-            time.sleep(1)
-
-        except KeyboardInterrupt:
-            logger.info('Stopping Bluetooth monitor')
-            break
-        except Exception as e:
-            logger.error(f'Error: {e}')
-            time.sleep(5)
+    if replay_file:
+        # Replay a recording instead of listening to the bus; actions are only logged
+        replay_events(monitor, load_events(replay_file), realtime=True)
+        connections.jobs.join()
+        return
+
+    if record_file:
+        monitor.add_listener(EventRecorder(record_file))
+    monitor.start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        logger.info('Stopping Bluetooth monitor')
 
 def main():
     logger.info('=' * 60)
@@ -162,11 +263,25 @@ def main():
             return
         elif sys.argv[1] == '--monitor-only':
             # Only monitor Bluetooth (no ready sound)
+            notify_systemd()
+            wait_for_pulse()
+            preload_sounds()
             monitor_bluetooth()
             return
+        elif sys.argv[1] == '--replay' and len(sys.argv) > 2:
+            # Replay recorded BlueZ events (dry run, no bus needed)
+            monitor_bluetooth(replay_file=sys.argv[2])
+            return
+        elif sys.argv[1] == '--record' and len(sys.argv) > 2:
+            # Monitor and record BlueZ events for later replay
+            notify_systemd()
+            monitor_bluetooth(record_file=sys.argv[2])
+            return
 
     # Default: play ready sound, then monitor Bluetooth
     play_ready_sound()
+    wait_for_pulse()
+    preload_sounds()
     monitor_bluetooth()
 
 if __name__ == '__main__':
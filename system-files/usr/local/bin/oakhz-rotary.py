@@ -6,10 +6,17 @@ Using gpiozero library (RPi.GPIO event detection doesn't work on this system)
 from gpiozero import RotaryEncoder, Button
 import subprocess
 import sys
-from time import sleep, time
+from time import sleep, monotonic
 import logging
 import threading
 
+# Shared OaKhz modules (bluez_client) are installed next to eq_server.py
+sys.path.insert(0, '/opt/oakhz')
+from bluez_client import BluezClient
+from pulse_client import PulseVolume
+from volume_accel import Accelerator, load_curve
+from button_gestures import ButtonGestures, ActionWorker, SHORT, DOUBLE, MEDIUM, LONG, PRESS_TURN
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
@@ -19,154 +26,126 @@ program_version = "4.0"
 CLK_PIN = 23  # pin_a
 DT_PIN = 24   # pin_b
 SW_PIN = 22   # button
+BUTTON_BOUNCE = 0.05  # seconds, short enough not to swallow the second press of a double click
 
 # Volume settings
 MIN_VOLUME = 1
 MAX_VOLUME = 100
-VOLUME_STEP = 5
+# Per-detent step: 1% turning slowly up to 8% spinning, see volume_accel.py
+# (curve configurable in ~/.oakhz_rotary.json)
+
+# Volume write pacing: detents are accumulated and written as one absolute
+# volume per frame, so fast spins are never dropped
+VOLUME_FRAME = 0.02         # seconds, at most one volume write per frame
+VOLUME_RESYNC_GUARD = 0.3   # seconds after our own write during which sink events are ours
 
-# Throttling settings
-THROTTLE_DELAY = 0.05  # 50ms between volume changes
-last_volume_change = 0
-volume_lock = threading.Lock()
+pulse = PulseVolume()
 
 def get_volume():
-    """Get current volume from PulseAudio camilladsp_out sink"""
+    """Get current volume from the PulseAudio sink (camilladsp_out by default)"""
     try:
-        result = subprocess.run(
-            ['pactl', 'get-sink-volume', 'camilladsp_out'],
-            capture_output=True,
-            text=True,
-            timeout=2
-        )
-        # Parse: "Volume: front-left: 52428 /  80% / -5.81 dB"
-        for line in result.stdout.splitlines():
-            if 'Volume:' in line:
-                parts = line.split('/')
-                if len(parts) >= 2:
-                    vol_str = parts[1].strip().replace('%', '')
-                    return int(vol_str)
-        return 50
+        return pulse.get()
     except Exception as e:
         logger.error(f"Get volume error: {e}")
         return 50
 
 def set_volume(volume):
-    """Set volume via PulseAudio camilladsp_out sink"""
+    """Set volume on the PulseAudio sink"""
     volume = max(MIN_VOLUME, min(MAX_VOLUME, volume))
     try:
-        subprocess.run(
-            ['pactl', 'set-sink-volume', 'camilladsp_out', f'{volume}%'],
-            capture_output=True,
-            timeout=2
-        )
+        pulse.set(volume)
         logger.info(f"Volume: {volume}%")
         return True
     except Exception as e:
         logger.error(f"Set volume error: {e}")
         return False
 
-def volume_up():
-    """Increase volume with throttling"""
-    global last_volume_change
-
-    with volume_lock:
-        now = time()
-        if now - last_volume_change < THROTTLE_DELAY:
-            return
+class VolumeController:
+    """Authoritative local volume for the encoder.
+
+    Encoder callbacks only add each detent's step (sized by the turning rate) to
+    a counter; a writer thread applies the accumulated steps as one absolute
+    `set_volume` per frame. The local value is re-synced from PulseAudio sink
+    change events, so changes made elsewhere (web UI, phone) are picked up
+    without reading the volume on every detent.
+    """
+
+    def __init__(self):
+        self.volume = None
+        self.accel = Accelerator(load_curve())
+        self._pending = 0
+        self._external = None   # latest volume pushed by a sink event, not applied yet
+        self._last_write = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+
+    def start(self):
+        self.volume = get_volume()
+        threading.Thread(target=self._write_loop, daemon=True).start()
+        pulse.subscribe(self._on_sink_volume)
+        return self.volume
+
+    def step(self, direction):
+        """Queue one detent (+1 = up); never blocks the encoder callback"""
+        now = monotonic()  # taken before the lock: the detent's own time
+        with self._lock:
+            self._pending += self.accel.detent(direction, now)
+        self._wake.set()
+
+    def _write_loop(self):
+        while True:
+            self._wake.wait(VOLUME_RESYNC_GUARD)
+            self._wake.clear()
+            with self._lock:
+                change, self._pending = self._pending, 0
+                external = None
+                if self._external is not None and monotonic() - self._last_write >= VOLUME_RESYNC_GUARD:
+                    external, self._external = self._external, None
+            # An external change is taken first, so detents of the same frame apply on top of it
+            if external is not None and external != self.volume:
+                logger.info(f"Volume changed externally: {external}%")
+                self.volume = external
+            if change:
+                new_vol = max(MIN_VOLUME, min(MAX_VOLUME, self.volume + change))
+                if new_vol != self.volume:
+                    self.volume = new_vol
+                    set_volume(new_vol)
+                    self._last_write = monotonic()
+                sleep(VOLUME_FRAME)
+
+    def _on_sink_volume(self, percent):
+        """Keep the volume of every sink change, applied once the guard after our own write is over"""
+        with self._lock:
+            self._external = percent
+        self._wake.set()
+
+
+volume = VolumeController()
+gestures = None   # ButtonGestures, set up in main()
+worker = None     # ActionWorker running the button actions
 
-        current = get_volume()
-        new_vol = min(MAX_VOLUME, current + VOLUME_STEP)
-        if set_volume(new_vol):
-            last_volume_change = now
+def volume_up():
+    """Increase volume by one detent, unless the button is held (press-and-turn)"""
+    if gestures is None or not gestures.rotated(1):
+        volume.step(1)
 
 def volume_down():
-    """Decrease volume with throttling"""
-    global last_volume_change
+    """Decrease volume by one detent, unless the button is held (press-and-turn)"""
+    if gestures is None or not gestures.rotated(-1):
+        volume.step(-1)
 
-    with volume_lock:
-        now = time()
-        if now - last_volume_change < THROTTLE_DELAY:
-            return
-
-        current = get_volume()
-        new_vol = max(MIN_VOLUME, current - VOLUME_STEP)
-        if set_volume(new_vol):
-            last_volume_change = now
-
-def get_bluetooth_device_path():
-    """Get the D-Bus path of the connected Bluetooth device"""
-    try:
-        result = subprocess.run(['bluetoothctl', 'devices', 'Connected'],
-                              capture_output=True, text=True, timeout=2)
-        for line in result.stdout.splitlines():
-            if 'Device' in line:
-                parts = line.split()
-                if len(parts) >= 2:
-                    mac = parts[1].replace(':', '_')
-                    return f"/org/bluez/hci0/dev_{mac}"
-        return None
-    except Exception:
-        return None
-
-def get_playback_status(device_path):
-    """Get current playback status (playing/paused/stopped)"""
-    try:
-        result = subprocess.run([
-            'dbus-send', '--system', '--print-reply',
-            '--dest=org.bluez',
-            f'{device_path}/player0',
-            'org.freedesktop.DBus.Properties.Get',
-            'string:org.bluez.MediaPlayer1',
-            'string:Status'
-        ], capture_output=True, text=True, timeout=2)
-
-        if result.returncode == 0:
-            for line in result.stdout.splitlines():
-                if 'variant' in line and 'string' in line:
-                    parts = line.strip().split('"')
-                    if len(parts) >= 2:
-                        return parts[1].lower()
-        return None
-    except Exception:
-        return None
+bluez = BluezClient()
 
 def bluetooth_play_pause():
     """Toggle play/pause for Bluetooth media"""
     try:
-        device_path = get_bluetooth_device_path()
-        if not device_path:
+        # Current status is read first to send the correct command
+        command = bluez.play_pause()
+        if command is None:
             logger.warning("No Bluetooth device connected")
             return False
-
-        # Get current status first to send the correct command
-        status = get_playback_status(device_path)
-
-        if status == 'playing':
-            # Currently playing, so pause
-            result = subprocess.run([
-                'dbus-send', '--system', '--type=method_call',
-                '--dest=org.bluez',
-                device_path,
-                'org.bluez.MediaControl1.Pause'
-            ], capture_output=True, timeout=2)
-            if result.returncode == 0:
-                logger.info("Pause command sent via BlueZ MediaControl1")
-                return True
-        else:
-            # Currently paused or stopped, so play
-            result = subprocess.run([
-                'dbus-send', '--system', '--type=method_call',
-                '--dest=org.bluez',
-                device_path,
-                'org.bluez.MediaControl1.Play'
-            ], capture_output=True, timeout=2)
-            if result.returncode == 0:
-                logger.info("Play command sent via BlueZ MediaControl1")
-                return True
-
-        logger.warning("Play/Pause command failed")
-        return False
+        logger.info(f"{command} command sent via BlueZ MediaControl1")
+        return True
 
     except Exception as e:
         logger.error(f"Play/Pause error: {e}")
@@ -175,67 +154,59 @@ def bluetooth_play_pause():
 def bluetooth_next():
     """Skip to next track"""
     try:
-        device_path = get_bluetooth_device_path()
-        if not device_path:
+        # AVRCP Next command via BlueZ MediaControl1
+        if not bluez.media_command('Next'):
             logger.warning("No Bluetooth device connected")
             return False
+        logger.info("Next track via BlueZ MediaControl1")
+        return True
 
-        # Use D-Bus to send AVRCP Next command via BlueZ MediaControl1
-        result = subprocess.run([
-            'dbus-send', '--system', '--type=method_call',
-            '--dest=org.bluez',
-            device_path,
-            'org.bluez.MediaControl1.Next'
-        ], capture_output=True, timeout=2)
-
-        if result.returncode == 0:
-            logger.info("Next track via BlueZ MediaControl1")
-            return True
-
-        logger.warning("Next track command failed")
+    except Exception as e:
+        logger.error(f"Next track error: {e}")
         return False
 
+def bluetooth_previous():
+    """Go back to previous track"""
+    try:
+        if not bluez.media_command('Previous'):
+            logger.warning("No Bluetooth device connected")
+            return False
+        logger.info("Previous track via BlueZ MediaControl1")
+        return True
+
     except Exception as e:
-        logger.error(f"Next track error: {e}")
+        logger.error(f"Previous track error: {e}")
         return False
 
-def button_pressed():
-    """Handle button press - play/pause, skip, or shutdown"""
-    global button
-
-    press_start = time()
-
-    # Wait for button release
-    while button.is_pressed:
-        sleep(0.01)
-        if time() - press_start > 5:  # Safety timeout
-            break
-
-    press_duration = time() - press_start
-
-    if press_duration >= 3.0:
-        # Long press: shutdown
-        logger.warning("Long press → Shutdown")
-        try:
-            subprocess.run(['mpg123', '-q', '-a', 'hw:Loopback,0', '/opt/oakhz/sounds/shutdown.mp3'],
-                         timeout=3, capture_output=True)
-            sleep(1)
-        except:
-            pass
-        subprocess.run(['sudo', 'shutdown', '-h', 'now'], check=False)
-
-    elif press_duration >= 1.0:
-        # Medium press: skip track
-        logger.info("Medium press (≥1s) → Skip track")
-        bluetooth_next()
+def shutdown():
+    """Power off; oakhz-shutdown-sound.service plays the shutdown sound on the way down"""
+    logger.warning("Long press → Shutdown")
+    subprocess.run(['sudo', 'shutdown', '-h', 'now'], check=False)
 
+def on_press_turn(direction):
+    """Press and turn: next track clockwise, previous counter-clockwise"""
+    logger.info(f"Press and turn {'clockwise' if direction > 0 else 'counter-clockwise'}")
+    if direction > 0:
+        bluetooth_next()
     else:
-        # Short press: play/pause
-        logger.info("Short press (<1s) → Play/Pause")
-        bluetooth_play_pause()
+        bluetooth_previous()
+
+# Gesture actions, run one at a time by the worker thread (never in a gpiozero callback)
+BUTTON_ACTIONS = {
+    SHORT: lambda _: bluetooth_play_pause(),
+    DOUBLE: lambda _: bluetooth_previous(),
+    MEDIUM: lambda _: bluetooth_next(),
+    LONG: lambda _: shutdown(),
+    PRESS_TURN: on_press_turn,
+}
+
+def on_gesture(gesture, direction):
+    """Log the gesture and queue its action"""
+    logger.info(f"Button gesture: {gesture}")
+    worker.submit(gesture, direction)
 
 def main():
-    global button
+    global gestures, worker
 
     logger.info("=" * 50)
     logger.info(f"OaKhz Rotary Controller v{program_version} (gpiozero)")
@@ -254,19 +225,22 @@ def main():
 
     # Initialize button
     try:
-        button = Button(SW_PIN, bounce_time=0.2, hold_time=3.0)
-        button.when_pressed = button_pressed
+        button = Button(SW_PIN, bounce_time=BUTTON_BOUNCE)
+        worker = ActionWorker(BUTTON_ACTIONS)
+        gestures = ButtonGestures(button, on_gesture)
         logger.info("Button initialized")
     except Exception as e:
         logger.error(f"Failed to initialize button: {e}")
         sys.exit(1)
 
-    current_vol = get_volume()
+    current_vol = volume.start()
     logger.info(f"Current volume: {current_vol}%")
     logger.info("Controls:")
-    logger.info("  🔄 Rotate:           Volume ±3%")
+    logger.info(f"  🔄 Rotate:           Volume ±{volume.accel.curve.min_step}% (slow) to ±{volume.accel.curve.max_step}% (fast)")
     logger.info("  🔘 Short press (<1s): Play/Pause")
+    logger.info("  🔘 Double click:      Previous track")
     logger.info("  🔘 Medium press (1s): Skip track")
+    logger.info("  🔘 Press + rotate:    Next/previous track")
     logger.info("  ⏱️  Long press (3s):  Shutdown")
     logger.info("=" * 50)
     logger.info("Rotary controller ready")
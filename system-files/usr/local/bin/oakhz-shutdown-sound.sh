@@ -1,7 +1,7 @@
 #!/bin/bash
 # Play shutdown sound directly via ALSA (bypass PulseAudio)
 # Stop CamillaDSP first to release the DAC
-# Uses pre-adjusted 25% volume WAV file
+# Uses the native build of sound_assets.py (48 kHz S16LE, loudness-normalized) when present
 
 # Stop CamillaDSP to release the HiFiBerry DAC
 systemctl stop camilladsp.service 2>/dev/null
@@ -9,9 +9,12 @@ systemctl stop camilladsp.service 2>/dev/null
 # Small delay to ensure DAC is released
 sleep 0.2
 
-# Play directly to HiFiBerry DAC using plughw for automatic rate conversion
-# Volume is pre-adjusted to 25% in the WAV file
-aplay -D plughw:1,0 /opt/oakhz/sounds/shutdown.wav 2>/dev/null
+SOUND=/opt/oakhz/sounds/native/shutdown.wav
+[ -f "$SOUND" ] || SOUND=/opt/oakhz/sounds/shutdown.wav
+
+# Play directly to HiFiBerry DAC (plughw only converts when the build is missing)
+# Level is set at build time (quieter than the other sounds, no volume control here)
+aplay -D plughw:1,0 "$SOUND" 2>/dev/null
 
 # Wait for playback to complete
 sleep 1
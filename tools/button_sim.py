@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+OaKhz Audio - Encoder button gesture harness
+Drives button_gestures.py through gpiozero's mock pin factory: press sequences
+are played on a mock SW pin and quadrature detents on mock CLK/DT pins, and the
+gestures received are checked against the expected ones. Timings are scaled down
+(--scale) so the run takes seconds.
+
+The last scenario makes every action block for a second, as a slow D-Bus call
+would, and turns the encoder meanwhile: all detents must still arrive.
+
+    python3 tools/button_sim.py
+"""
+import argparse
+import os
+import sys
+import time
+
+from gpiozero import Button, Device, RotaryEncoder
+from gpiozero.pins.mock import MockFactory
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'system-files', 'opt', 'oakhz'))
+from button_gestures import (ButtonGestures, ActionWorker, GESTURES, SHORT, DOUBLE, MEDIUM,  # noqa: E402
+                             LONG, PRESS_TURN, GESTURE_DOUBLE_CLICK, GESTURE_MEDIUM, GESTURE_LONG)
+
+CLK_PIN, DT_PIN, SW_PIN = 23, 24, 22
+
+
+class Rig:
+    """Mock button and encoder wired to a ButtonGestures, recording what comes out"""
+
+    def __init__(self, scale, action_delay=0.0):
+        Device.pin_factory = MockFactory()
+        self.scale = scale
+        self.gestures_seen = []
+        self.actions_run = []
+        self.detents = 0
+        self.button = Button(SW_PIN, bounce_time=None)
+        self.encoder = RotaryEncoder(CLK_PIN, DT_PIN, max_steps=0)
+        self.sw = Device.pin_factory.pin(SW_PIN)
+        self.clk = Device.pin_factory.pin(CLK_PIN)
+        self.dt = Device.pin_factory.pin(DT_PIN)
+
+        def action(gesture):
+            def run(direction):
+                time.sleep(action_delay)
+                self.actions_run.append(gesture)
+            return run
+
+        self.worker = ActionWorker({gesture: action(gesture) for gesture in GESTURES})
+        self.gestures = ButtonGestures(self.button, self.on_gesture, double_click=GESTURE_DOUBLE_CLICK * scale,
+                                       medium=GESTURE_MEDIUM * scale, long=GESTURE_LONG * scale)
+        self.encoder.when_rotated_clockwise = lambda: self.rotated(1)
+        self.encoder.when_rotated_counter_clockwise = lambda: self.rotated(-1)
+
+    def close(self):
+        self.button.close()
+        self.encoder.close()
+        Device.pin_factory.reset()
+
+    def on_gesture(self, gesture, direction):
+        self.gestures_seen.append(f"{gesture}{'+' if direction > 0 else '-' if direction < 0 else ''}")
+        self.worker.submit(gesture, direction)
+
+    def rotated(self, direction):
+        if not self.gestures.rotated(direction):
+            self.detents += direction
+
+    def wait(self, seconds):
+        time.sleep(seconds * self.scale)
+
+    def press(self, seconds):
+        self.sw.drive_low()
+        self.wait(seconds)
+        self.sw.drive_high()
+
+    def turn(self, detents):
+        """Quadrature sequence of one detent per step, clockwise for positive counts"""
+        for _ in range(abs(detents)):
+            first, second = (self.clk, self.dt) if detents > 0 else (self.dt, self.clk)
+            first.drive_low()
+            second.drive_low()
+            first.drive_high()
+            second.drive_high()
+
+
+def press_and_turn(rig, direction):
+    rig.sw.drive_low()
+    rig.wait(0.2)
+    rig.turn(direction * 3)
+    rig.wait(0.2)
+    rig.sw.drive_high()
+
+
+SCENARIOS = [
+    ('short press', lambda rig: rig.press(0.2), [SHORT]),
+    ('double click', lambda rig: (rig.press(0.1), rig.wait(0.15), rig.press(0.1)), [DOUBLE]),
+    ('two slow clicks', lambda rig: (rig.press(0.1), rig.wait(1.0), rig.press(0.1)), [SHORT, SHORT]),
+    ('medium press', lambda rig: rig.press(1.5), [MEDIUM]),
+    ('long press', lambda rig: rig.press(3.5), [LONG]),
+    ('click then medium', lambda rig: (rig.press(0.1), rig.wait(0.15), rig.press(1.5)), [SHORT, MEDIUM]),
+    ('press and turn cw', lambda rig: press_and_turn(rig, 1), [PRESS_TURN + '+']),
+    ('press and turn ccw', lambda rig: press_and_turn(rig, -1), [PRESS_TURN + '-']),
+]
+
+
+def run_scenario(name, play, expected, scale):
+    rig = Rig(scale)
+    try:
+        play(rig)
+        rig.wait(GESTURE_DOUBLE_CLICK * 2)
+        rig.worker.join()
+        ok = rig.gestures_seen == expected and rig.actions_run == [g.rstrip('+-') for g in expected]
+        ok = ok and rig.detents == 0
+        print(f"{'ok  ' if ok else 'FAIL'} {name:<22}{' '.join(rig.gestures_seen) or '-'}"
+              f"{'' if ok else f'  (expected {expected}, detents {rig.detents})'}")
+        return ok
+    finally:
+        rig.close()
+
+
+def run_blocking_actions(scale):
+    """Detents turned while slow actions run must all reach the volume counter"""
+    rig = Rig(scale, action_delay=1.0)
+    try:
+        for _ in range(3):
+            rig.press(0.2)
+            rig.wait(GESTURE_DOUBLE_CLICK * 1.5)
+        start = time.monotonic()
+        rig.turn(20)
+        rig.turn(-5)
+        turning = time.monotonic() - start
+        pending = len(rig.gestures_seen) - len(rig.actions_run)
+        rig.worker.join()
+        ok = rig.detents == 15 and rig.actions_run == [SHORT] * 3 and pending > 0
+        print(f"{'ok  ' if ok else 'FAIL'} {'turn during actions':<22}{rig.detents} detents in "
+              f"{turning * 1000:.1f} ms with {pending} action(s) still pending")
+        return ok
+    finally:
+        rig.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check button gestures against gpiozero mock pins')
+    parser.add_argument('--scale', type=float, default=0.2, help='factor applied to all gesture timings')
+    args = parser.parse_args()
+
+    results = [run_scenario(name, play, expected, args.scale) for name, play, expected in SCENARIOS]
+    results.append(run_blocking_actions(args.scale))
+    print(f"{sum(results)}/{len(results)} passed")
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+OaKhz Audio - Offline CamillaDSP pipeline simulator and benchmark
+Runs a CamillaDSP config (filters, mixers and pipeline) over a WAV file or a
+generated test signal, block by block at the configured chunksize, the way the
+speaker would. Reports output level, clipped samples, how hard each limiter is
+driven, and the CPU time of every filter per block against the real-time budget
+of one chunk.
+
+    python3 tools/dsp_sim.py system-files/opt/camilladsp/config.yml --input song.wav --output out.wav
+    python3 tools/dsp_sim.py system-files/opt/camilladsp/*.yml --seconds 20
+    python3 tools/dsp_sim.py system-files/opt/camilladsp/config.yml --flat --prune
+
+With several configs, a comparison table follows the individual reports. Timings
+are from this machine, not a Pi Zero; compare configs relative to each other.
+Requires numpy and PyYAML (or ruamel.yaml). Biquads run through scipy's sosfilt
+when scipy is installed, else through a pure-Python fallback (much slower).
+"""
+import argparse
+import math
+import os
+import sys
+import time
+import wave
+
+import numpy as np
+
+try:
+    from scipy.signal import sosfilt
+except ImportError:
+    sosfilt = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'system-files', 'opt', 'oakhz'))
+from eq_response import filter_sections, DEFAULT_SAMPLERATE  # noqa: E402
+from dsp_cost import is_identity  # noqa: E402
+
+DEFAULT_CHUNKSIZE = 1024
+SAMPLE_WIDTHS = {'S16LE': 2, 'S24LE3': 3, 'S24LE': 4, 'S32LE': 4}
+
+
+def load_config(path):
+    with open(path, 'r') as f:
+        text = f.read()
+    try:
+        import yaml
+        return yaml.safe_load(text)
+    except ImportError:
+        from ruamel.yaml import YAML
+        return YAML(typ='safe').load(text)
+
+
+def flatten_eq(config):
+    """Set every eq_* band to 0 dB, as the flat preset or a disabled EQ does"""
+    for name, definition in (config.get('filters') or {}).items():
+        if name.startswith('eq_'):
+            definition['parameters']['gain'] = 0.0
+    return config
+
+
+def prune_identity(config):
+    """Copy of `config` with unity filters left out of the pipeline, as eq_server runs it"""
+    filters = config.get('filters') or {}
+    pipeline = []
+    for step in config.get('pipeline') or []:
+        if step.get('type') == 'Filter':
+            step = dict(step, names=[n for n in step.get('names', []) if not is_identity(filters[n])])
+        pipeline.append(step)
+    return dict(config, pipeline=pipeline)
+
+
+# --- Signals ---
+
+def read_wav(path):
+    """(samples as float array [channels, frames], samplerate)"""
+    with wave.open(path, 'rb') as w:
+        width, channels, rate = w.getsampwidth(), w.getnchannels(), w.getframerate()
+        raw = w.readframes(w.getnframes())
+    if width == 3:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        data = (b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)) << 8 >> 8
+        scale = 2 ** 23
+    elif width == 1:
+        data = np.frombuffer(raw, dtype=np.uint8).astype(np.int32) - 128
+        scale = 2 ** 7
+    else:
+        data = np.frombuffer(raw, dtype={2: '<i2', 4: '<i4'}[width])
+        scale = 2 ** (8 * width - 1)
+    return (data.astype(np.float64) / scale).reshape(-1, channels).T, rate
+
+
+def write_wav(path, samples, rate, width=2):
+    scale = 2 ** (8 * width - 1)
+    ints = np.clip(np.round(samples.T * scale), -scale, scale - 1).astype('<i4')
+    if width == 2:
+        raw = ints.astype('<i2').tobytes()
+    elif width == 3:
+        raw = ints.view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+    else:
+        raw = ints.tobytes()
+    with wave.open(path, 'wb') as w:
+        w.setnchannels(samples.shape[0])
+        w.setsampwidth(width)
+        w.setframerate(rate)
+        w.writeframes(raw)
+
+
+def test_signal(kind, seconds, rate, channels, level_db, seed=1):
+    """Pink noise, white noise or a log sweep (20 Hz - 20 kHz), RMS at `level_db` dBFS"""
+    n = int(seconds * rate)
+    rng = np.random.default_rng(seed)
+    if kind == 'sweep':
+        t = np.arange(n) / rate
+        k = math.log(20000 / 20)
+        x = np.sin(2 * math.pi * 20 * seconds / k * (np.exp(t / seconds * k) - 1))
+    else:
+        x = rng.standard_normal(n)
+        if kind == 'pink':
+            spectrum = np.fft.rfft(x)
+            f = np.fft.rfftfreq(n, 1 / rate)
+            f[0] = f[1]
+            x = np.fft.irfft(spectrum / np.sqrt(f), n)
+    x *= 10 ** (level_db / 20) / np.sqrt(np.mean(x ** 2))
+    return np.tile(x, (channels, 1))
+
+
+# --- Stages ---
+
+def _sosfilt_py(sos, x, zi):
+    """Transposed direct form II cascade, for machines without scipy"""
+    y = x.copy()
+    for s, (b0, b1, b2, _, a1, a2) in enumerate(sos):
+        z1, z2 = zi[s]
+        out = np.empty_like(y)
+        for i, v in enumerate(y):
+            o = b0 * v + z1
+            z1 = b1 * v - a1 * o + z2
+            z2 = b2 * v - a2 * o
+            out[i] = o
+        zi[s] = (z1, z2)
+        y = out
+    return y
+
+
+class BiquadStage:
+    """Cascade of biquad sections with state carried from block to block"""
+
+    def __init__(self, sections):
+        sos = np.asarray(sections, dtype=float)
+        self.sos = sos / sos[:, 3:4]
+        self.zi = np.zeros((len(sos), 2))
+
+    def process(self, x):
+        if sosfilt is not None:
+            y, self.zi = sosfilt(self.sos, x, zi=self.zi)
+            return y
+        return _sosfilt_py(self.sos, x, self.zi)
+
+
+class GainStage:
+    def __init__(self, gain):
+        self.gain = gain
+
+    def process(self, x):
+        return x * self.gain
+
+
+class LimiterStage:
+    """CamillaDSP Limiter: hard clip, or cubic soft clip reaching the limit at 1.5x"""
+
+    def __init__(self, params):
+        self.limit = 10 ** (params.get('clip_limit', 0.0) / 20)
+        self.soft = params.get('soft_clip', False)
+        self.over = 0  # samples that reached the limiter above its clip level
+
+    def process(self, x):
+        self.over += int(np.count_nonzero(np.abs(x) > self.limit))
+        if not self.soft:
+            return np.clip(x, -self.limit, self.limit)
+        scaled = np.clip(x / self.limit, -1.5, 1.5)
+        return (scaled - 4 / 27 * scaled ** 3) * self.limit
+
+
+def make_stage(name, definition, rate):
+    if definition.get('type') == 'Limiter':
+        return LimiterStage(definition.get('parameters', {}))
+    sections = filter_sections(definition, rate)
+    if sections is None:
+        raise ValueError(f"{name}: filter type {definition.get('type')} is not simulated")
+    if len(sections) == 1 and not any(sections[0][1:3]) and not any(sections[0][4:]):
+        return GainStage(sections[0][0] / sections[0][3])
+    return BiquadStage(sections)
+
+
+def mixer_matrix(mixer):
+    matrix = np.zeros((mixer['channels']['out'], mixer['channels']['in']))
+    for mapping in mixer.get('mapping', []):
+        if mapping.get('mute'):
+            continue
+        for source in mapping.get('sources', []):
+            if source.get('mute'):
+                continue
+            gain = 10 ** (source.get('gain', 0) / 20)
+            matrix[mapping['dest'], source['channel']] += -gain if source.get('inverted') else gain
+    return matrix
+
+
+class Pipeline:
+    """A CamillaDSP pipeline instantiated with its own filter state per channel"""
+
+    def __init__(self, config):
+        devices = config.get('devices', {})
+        self.rate = devices.get('samplerate', DEFAULT_SAMPLERATE)
+        self.chunksize = devices.get('chunksize', DEFAULT_CHUNKSIZE)
+        self.channels = devices.get('capture', {}).get('channels', 2)
+        self.out_width = SAMPLE_WIDTHS.get(devices.get('playback', {}).get('format'), 2)
+        filters = config.get('filters') or {}
+        mixers = config.get('mixers') or {}
+        self.steps = []
+        self.limiters = {}
+        channels = self.channels
+        for step in config.get('pipeline') or []:
+            if step.get('bypassed'):
+                continue
+            if step['type'] == 'Mixer':
+                matrix = mixer_matrix(mixers[step['name']])
+                self.steps.append(('mixer', step['name'], matrix))
+                channels = matrix.shape[0]
+            elif step['type'] == 'Filter':
+                targets = step.get('channels')
+                if targets is None:
+                    targets = [step['channel']] if 'channel' in step else list(range(channels))
+                for channel in targets:
+                    stages = []
+                    for name in step.get('names', []):
+                        stage = make_stage(name, filters[name], self.rate)
+                        if isinstance(stage, LimiterStage):
+                            self.limiters.setdefault(name, []).append(stage)
+                        stages.append((name, stage))
+                    self.steps.append(('filter', channel, stages))
+            else:
+                raise ValueError(f"pipeline step {step['type']} is not simulated")
+        self.times = {}  # filter name -> seconds spent per block
+
+    def process(self, block):
+        """Run one chunk [channels, frames] through the pipeline"""
+        spent = {}
+        for kind, target, payload in self.steps:
+            if kind == 'mixer':
+                start = time.perf_counter()
+                block = payload @ block
+                spent[target] = spent.get(target, 0.0) + time.perf_counter() - start
+                continue
+            x = block[target]
+            for name, stage in payload:
+                start = time.perf_counter()
+                x = stage.process(x)
+                spent[name] = spent.get(name, 0.0) + time.perf_counter() - start
+            block[target] = x
+        for name, seconds in spent.items():
+            self.times.setdefault(name, []).append(seconds)
+        return block
+
+    def run(self, samples):
+        if samples.shape[0] == 1 and self.channels > 1:
+            samples = np.tile(samples, (self.channels, 1))
+        if samples.shape[0] != self.channels:
+            raise ValueError(f"input has {samples.shape[0]} channels, config captures {self.channels}")
+        blocks = []
+        for start in range(0, samples.shape[1], self.chunksize):
+            block = samples[:, start:start + self.chunksize].copy()
+            blocks.append(self.process(block))
+        return np.concatenate(blocks, axis=1)
+
+
+# --- Reports ---
+
+def db(x):
+    return 20 * math.log10(max(x, 1e-12))
+
+
+def simulate(config, label, samples, rate, signal_label, output=None):
+    pipeline = Pipeline(config)
+    if rate != pipeline.rate:
+        print(f"warning: input is {rate} Hz, config runs at {pipeline.rate} Hz (no resampling simulated)")
+    start = time.perf_counter()
+    out = pipeline.run(samples)
+    cpu = time.perf_counter() - start
+    audio_seconds = samples.shape[1] / pipeline.rate
+    budget = pipeline.chunksize / pipeline.rate
+
+    clipped = int(np.count_nonzero(np.abs(out) >= 1.0))
+    result = {
+        'config': label,
+        'cpu_rt': cpu / audio_seconds,
+        'peak_db': db(float(np.abs(out).max())),
+        'rms_db': db(float(np.sqrt(np.mean(out ** 2)))),
+        'clipped': clipped,
+        'limiters': {name: sum(s.over for s in stages) for name, stages in pipeline.limiters.items()},
+        'blocks': len(next(iter(pipeline.times.values()), [])),
+    }
+
+    print(f"\n{result['config']}  ({pipeline.rate} Hz, chunk {pipeline.chunksize}, "
+          f"{pipeline.channels}->{out.shape[0]} ch, {audio_seconds:.1f} s {signal_label})")
+    print(f"  output    peak {result['peak_db']:.1f} dBFS, rms {result['rms_db']:.1f} dBFS, "
+          f"{clipped} clipped samples")
+    for name, over in result['limiters'].items():
+        print(f"  limiter   {name}: {over} samples over clip_limit")
+    print(f"  cpu       {cpu * 1000:.0f} ms for {audio_seconds:.1f} s of audio "
+          f"({result['cpu_rt'] * 100:.2f} % of real time, budget {budget * 1e6:.0f} us per block)")
+    print(f"  {'stage':<22}{'mean us':>10}{'max us':>10}{'% budget':>10}")
+    for name, times in sorted(pipeline.times.items(), key=lambda item: -sum(item[1])):
+        mean = sum(times) / len(times)
+        print(f"  {name:<22}{mean * 1e6:>10.1f}{max(times) * 1e6:>10.1f}{mean / budget * 100:>10.2f}")
+
+    if output:
+        write_wav(output, out, pipeline.rate, pipeline.out_width)
+        print(f"  wrote     {output}")
+    result['times'] = pipeline.times
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run CamillaDSP configs offline and benchmark them')
+    parser.add_argument('configs', nargs='+', help='CamillaDSP YAML config(s)')
+    parser.add_argument('--input', help='WAV file (default: generated signal)')
+    parser.add_argument('--signal', choices=('pink', 'white', 'sweep'), default='pink')
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--level', type=float, default=-12.0, help='generated signal RMS in dBFS')
+    parser.add_argument('--output', help='write the processed WAV (single config only)')
+    parser.add_argument('--flat', action='store_true', help='set every eq_* band to 0 dB first')
+    parser.add_argument('--prune', action='store_true',
+                        help='also run each config with its unity filters pruned, as eq_server does')
+    args = parser.parse_args()
+    if sosfilt is None:
+        print("warning: scipy not installed, using the pure-Python biquad fallback")
+
+    results = []
+    for path in args.configs:
+        config = load_config(path)
+        devices = config.get('devices', {})
+        rate = devices.get('samplerate', DEFAULT_SAMPLERATE)
+        channels = devices.get('capture', {}).get('channels', 2)
+        if args.input:
+            samples, rate = read_wav(args.input)
+            label = os.path.basename(args.input)
+        else:
+            samples = test_signal(args.signal, args.seconds, rate, channels, args.level)
+            label = f"{args.signal} noise at {args.level:.0f} dBFS" if args.signal != 'sweep' else 'sweep'
+        if args.flat:
+            flatten_eq(config)
+        output = args.output if len(args.configs) == 1 else None
+        name = os.path.basename(path)
+        results.append(simulate(config, name, samples, rate, label, output))
+        if args.prune:
+            full = results[-1]
+            results.append(simulate(prune_identity(config), f"{name} (pruned)", samples, rate, label))
+            saved = 1 - results[-1]['cpu_rt'] / full['cpu_rt']
+            print(f"  pruning unity filters saves {saved * 100:.0f}% of the pipeline CPU time")
+
+    if len(results) > 1:
+        print(f"\n{'config':<24}{'% RT':>8}{'peak dBFS':>11}{'clipped':>9}  limiter hits")
+        for r in sorted(results, key=lambda r: r['cpu_rt']):
+            hits = ', '.join(f"{n}={c}" for n, c in r['limiters'].items()) or '-'
+            print(f"{r['config']:<24}{r['cpu_rt'] * 100:>8.2f}{r['peak_db']:>11.1f}{r['clipped']:>9}  {hits}")
+
+
+if __name__ == '__main__':
+    main()
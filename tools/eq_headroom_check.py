@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+OaKhz Audio - Headroom and pipeline cost checks of the equalizer controller
+Runs eq_server.EqualizerController against a scratch copy of config.yml (with
+the PulseAudio stand-in of fake_pulse.py, no CamillaDSP and nothing written back)
+and checks that the headroom prediction, auto preamp and cost estimate describe
+the pipeline actually sent to CamillaDSP, pruned 0 dB bands included, and that
+clipping left by a preamp at its limit is reported.
+
+    python3 tools/eq_headroom_check.py
+    python3 tools/eq_headroom_check.py --config system-files/opt/camilladsp/config-boostq.yml
+
+Needs numpy, flask and ruamel.yaml.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.join(TOOLS_DIR, '..')
+sys.path.insert(0, os.path.join(REPO, 'system-files', 'opt', 'oakhz'))
+sys.path.insert(0, TOOLS_DIR)
+
+SCRATCH = tempfile.mkdtemp(prefix='oakhz-eq-')
+os.environ['HOME'] = SCRATCH  # ~/.oakhz_eq.json of the controller
+
+import pulse_client  # noqa: E402
+from fake_pulse import FakePulseServer  # noqa: E402
+pulse_client.PulsectlBackend = FakePulseServer
+import eq_server  # noqa: E402
+
+CONFIG = os.path.join(REPO, 'system-files', 'opt', 'camilladsp', 'config.yml')
+
+
+def controller(config_path):
+    """The server's controller, pointed at a scratch copy of `config_path`"""
+    eq = eq_server.eq
+    path = os.path.join(SCRATCH, 'config.yml')
+    shutil.copy(config_path, path)
+    eq.forget_dsp_state()
+    eq.dsp_config.path = path
+    eq.dsp_config.schedule_write = lambda reload=False: None
+    return eq
+
+
+def check(name, ok, detail):
+    print(f"{'ok  ' if ok else 'FAIL'} {name:<40}{detail}")
+    return ok
+
+
+def pipeline_bands(eq):
+    return {name for step in eq.dsp_config.doc['pipeline'] for name in step.get('names') or []
+            if name in eq.band_names}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check headroom and cost predictions against the pruned pipeline')
+    parser.add_argument('--config', default=CONFIG, help='CamillaDSP config to start from')
+    args = parser.parse_args()
+
+    eq = controller(args.config)
+    if eq.curve is None:
+        print("numpy is not installed")
+        sys.exit(1)
+    full = eq.dsp_config.snapshot()  # every band in the pipeline, as shipped
+    results = []
+
+    eq.apply_state({'preset': 'flat', 'auto_preamp': True})
+    results.append(check('flat preset prunes every band', not pipeline_bands(eq),
+                         f"bands left: {sorted(pipeline_bands(eq)) or 'none'}"))
+
+    preview = eq.preview_headroom({'bands': {0: 12}})
+    results.append(check('preview of a pruned band boost', preview['peak_db'] <= 0,
+                         f"peak {preview['peak_db']} dBFS, preamp {preview['preamp']} dB"))
+
+    eq.apply_state({'bands': {0: 12}})
+    applied = eq.preview_headroom()
+    overrides = {name: {'gain': gain} for name, gain in eq._target_gains().items()}
+    reference = eq.curve.headroom(full, overrides)  # independent of pruning: 0 dB bands are identities
+    results.append(check('applied pruned band boost', reference['peak_db'] <= 0,
+                         f"peak {reference['peak_db']} dBFS, preamp {eq.config['preamp']} dB"))
+    results.append(check('preview preamp is the applied preamp',
+                         preview['preamp'] == applied['preamp'] == eq.config['preamp'],
+                         f"preview {preview['preamp']}, reported {applied['preamp']}, "
+                         f"applied {eq.config['preamp']} dB"))
+
+    results.append(check('prediction matches the unpruned chain',
+                         abs(reference['peak_db'] - applied['peak_db']) < 0.01,
+                         f"pruned {applied['peak_db']}, unpruned {reference['peak_db']} dBFS"))
+
+    cost = eq.estimate_cost()
+    results.append(check('cost counts only active bands',
+                         set(cost['filters']) & set(eq.band_names) == {'eq_31'},
+                         f"bands costed: {sorted(set(cost['filters']) & set(eq.band_names))}"))
+
+    eq.apply_state({'preset': 'bass', 'auto_preamp': True})
+    bass = eq.preview_headroom()
+    results.append(check('bass preset reports the clipping left', bass['preamp_limited'] and
+                         bass['clipping'] and bass['clipping_db'] == bass['peak_db'] > 0,
+                         f"peak {bass['peak_db']} dBFS, preamp {bass['preamp']} dB, "
+                         f"clipping by {bass['clipping_db']} dB"))
+    results.append(check('reported preamp is the applied preamp', bass['preamp'] == eq.config['preamp'],
+                         f"reported {bass['preamp']}, applied {eq.config['preamp']} dB"))
+
+    print(f"{sum(results)}/{len(results)} passed")
+    shutil.rmtree(SCRATCH, ignore_errors=True)
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == '__main__':
+    main()
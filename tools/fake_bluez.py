@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+OaKhz Audio - BlueZ stand-in for development
+Exports a minimal org.bluez on the session bus (ObjectManager, Device1,
+MediaControl1, MediaPlayer1) so bluez_client.py and the daemons using it can run
+on any Linux box:
+
+    python3 tools/fake_bluez.py &
+    OAKHZ_BLUEZ_BUS=session python3 system-files/opt/oakhz/eq_server.py
+
+Requires python3-dbus and python3-gi.
+"""
+import argparse
+import logging
+
+import dbus
+import dbus.service
+from dbus.mainloop.glib import DBusGMainLoop
+from gi.repository import GLib
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+BLUEZ_SERVICE = 'org.bluez'
+DEVICE_IFACE = 'org.bluez.Device1'
+MEDIA_CONTROL_IFACE = 'org.bluez.MediaControl1'
+MEDIA_PLAYER_IFACE = 'org.bluez.MediaPlayer1'
+OBJECT_MANAGER_IFACE = 'org.freedesktop.DBus.ObjectManager'
+PROPERTIES_IFACE = 'org.freedesktop.DBus.Properties'
+ADAPTER_PATH = '/org/bluez/hci0'
+
+
+class FakeObject(dbus.service.Object):
+    """Object exposing org.freedesktop.DBus.Properties over a dict of interfaces"""
+
+    def __init__(self, bus, path, interfaces):
+        super().__init__(bus, path)
+        self.path = path
+        self.interfaces = interfaces
+
+    @dbus.service.method(PROPERTIES_IFACE, in_signature='ss', out_signature='v')
+    def Get(self, interface, name):
+        return self.interfaces[interface][name]
+
+    @dbus.service.method(PROPERTIES_IFACE, in_signature='s', out_signature='a{sv}')
+    def GetAll(self, interface):
+        return self.interfaces.get(interface, {})
+
+    @dbus.service.signal(PROPERTIES_IFACE, signature='sa{sv}as')
+    def PropertiesChanged(self, interface, changed, invalidated):
+        pass
+
+    def update(self, interface, **changed):
+        self.interfaces[interface].update(changed)
+        self.PropertiesChanged(interface, changed, dbus.Array([], signature='s'))
+
+
+class FakeDevice(FakeObject):
+    """Device1 + MediaControl1; media commands are recorded in `calls`"""
+
+    def __init__(self, bluez, path, properties):
+        super().__init__(bluez.bus, path, {DEVICE_IFACE: properties, MEDIA_CONTROL_IFACE: {}})
+        self.bluez = bluez
+        self.calls = []
+
+    def _media(self, command, status=None):
+        self.calls.append(command)
+        logger.info(f"{self.path}: {command}")
+        player = self.bluez.players.get(self.path)
+        if player is not None and status is not None:
+            player.update(MEDIA_PLAYER_IFACE, Status=status)
+
+    @dbus.service.method(MEDIA_CONTROL_IFACE)
+    def Play(self):
+        self._media('Play', 'playing')
+
+    @dbus.service.method(MEDIA_CONTROL_IFACE)
+    def Pause(self):
+        self._media('Pause', 'paused')
+
+    @dbus.service.method(MEDIA_CONTROL_IFACE)
+    def Next(self):
+        self._media('Next')
+
+    @dbus.service.method(MEDIA_CONTROL_IFACE)
+    def Previous(self):
+        self._media('Previous')
+
+    @dbus.service.method(DEVICE_IFACE)
+    def Disconnect(self):
+        self.calls.append('Disconnect')
+        self.bluez.set_connected(self.path, False)
+
+
+class FakeBluez(dbus.service.Object):
+    """Root object: ObjectManager over the fake devices and players"""
+
+    def __init__(self, bus):
+        super().__init__(bus, '/')
+        self.bus = bus
+        self.devices = {}
+        self.players = {}  # device path -> player object
+
+    @dbus.service.method(OBJECT_MANAGER_IFACE, out_signature='a{oa{sa{sv}}}')
+    def GetManagedObjects(self):
+        objects = {}
+        for obj in list(self.devices.values()) + list(self.players.values()):
+            objects[obj.path] = obj.interfaces
+        return objects
+
+    @dbus.service.signal(OBJECT_MANAGER_IFACE, signature='oa{sa{sv}}')
+    def InterfacesAdded(self, path, interfaces):
+        pass
+
+    @dbus.service.signal(OBJECT_MANAGER_IFACE, signature='oas')
+    def InterfacesRemoved(self, path, interfaces):
+        pass
+
+    def add_device(self, address, name, connected=True):
+        path = f"{ADAPTER_PATH}/dev_{address.replace(':', '_')}"
+        device = FakeDevice(self, path, {
+            'Address': address,
+            'Name': name,
+            'Alias': name,
+            'Paired': True,
+            'Connected': dbus.Boolean(connected),
+        })
+        self.devices[path] = device
+        self.InterfacesAdded(path, device.interfaces)
+        return device
+
+    def set_connected(self, path, connected):
+        self.devices[path].update(DEVICE_IFACE, Connected=dbus.Boolean(connected))
+        if not connected and path in self.players:
+            player = self.players.pop(path)
+            self.InterfacesRemoved(player.path, [MEDIA_PLAYER_IFACE])
+            player.remove_from_connection()
+
+    def add_player(self, device_path, status='paused', title='', artist='', album=''):
+        player = FakeObject(self.bus, f"{device_path}/player0", {MEDIA_PLAYER_IFACE: {
+            'Device': dbus.ObjectPath(device_path),
+            'Status': status,
+            'Track': dbus.Dictionary({'Title': title, 'Artist': artist, 'Album': album}, signature='sv'),
+        }})
+        self.players[device_path] = player
+        self.InterfacesAdded(player.path, player.interfaces)
+        return player
+
+    def set_track(self, device_path, title, artist, album=''):
+        self.players[device_path].update(MEDIA_PLAYER_IFACE, Track=dbus.Dictionary(
+            {'Title': title, 'Artist': artist, 'Album': album}, signature='sv'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='BlueZ stand-in on the session bus')
+    parser.add_argument('--address', default='AA:BB:CC:DD:EE:01')
+    parser.add_argument('--name', default='Test Phone')
+    parser.add_argument('--track-interval', type=float, default=0,
+                        help='seconds between simulated track changes (0 = never)')
+    args = parser.parse_args()
+
+    DBusGMainLoop(set_as_default=True)
+    bus = dbus.SessionBus()
+    name = dbus.service.BusName(BLUEZ_SERVICE, bus)  # noqa: F841 (keeps the name owned)
+    bluez = FakeBluez(bus)
+    device = bluez.add_device(args.address, args.name)
+    bluez.add_player(device.path, title='Track 1', artist='Fake Artist', album='Fake Album')
+    logger.info(f"Fake BlueZ ready on the session bus: {device.path}")
+
+    if args.track_interval > 0:
+        counter = {'n': 1}
+
+        def next_track():
+            counter['n'] += 1
+            bluez.set_track(device.path, f"Track {counter['n']}", 'Fake Artist', 'Fake Album')
+            return True
+
+        GLib.timeout_add(int(args.track_interval * 1000), next_track)
+
+    GLib.MainLoop().run()
+
+
+if __name__ == '__main__':
+    main()
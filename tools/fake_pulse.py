@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+OaKhz Audio - PulseAudio stand-in for development
+In-process replacement for the PulsectlBackend of pulse_client.py: sinks live in
+memory, changes made through any connection (or with `change()`, standing in for
+another client) wake every listener, and `restart()` drops all connections the
+way a PulseAudio restart would.
+
+    from fake_pulse import FakePulseServer
+    volume = PulseVolume(backend=FakePulseServer())
+
+Running this file exercises get/set, subscription, reconnection and the sample
+cache across a restart.
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'system-files', 'opt', 'oakhz'))
+from pulse_client import PulseVolume, PulseSamples  # noqa: E402
+
+
+class FakeConnection:
+    def __init__(self, server):
+        self.server = server
+        self.generation = server.generation
+        self.seen = server.serial
+
+    def check(self):
+        if self.generation != self.server.generation:
+            raise ConnectionError("connection reset by fake server")
+
+
+class FakePulseServer:
+    """Backend with the same surface as pulse_client.PulsectlBackend"""
+
+    def __init__(self, sinks=None):
+        self.sinks = dict(sinks or {'camilladsp_out': 0.75})
+        self.serial = 0       # bumped on every sink change
+        self.generation = 0   # bumped on every restart
+        self.down = False
+        self.connections = 0
+        self.samples = {}     # sample cache: name -> file contents
+        self.played = []      # (sample name, volume) in play order
+        self._cond = threading.Condition()
+
+    # --- Backend surface ---
+
+    def connect(self):
+        if self.down:
+            raise ConnectionRefusedError("fake server is down")
+        self.connections += 1
+        return FakeConnection(self)
+
+    def get_volume(self, conn, sink):
+        conn.check()
+        return self.sinks[sink]
+
+    def set_volume(self, conn, sink, value):
+        conn.check()
+        self.change(sink, value)
+
+    def listen(self, conn, stop):
+        with self._cond:
+            while conn.seen == self.serial and not stop.is_set():
+                conn.check()
+                self._cond.wait(0.1)
+            conn.check()
+            changed = conn.seen != self.serial
+            conn.seen = self.serial
+            return changed
+
+    def close(self, conn):
+        pass
+
+    def upload_sample(self, name, path):
+        with open(path, 'rb') as f:
+            self.samples[name] = f.read()
+
+    def play_sample(self, conn, name, volume):
+        conn.check()
+        if name not in self.samples:
+            raise KeyError(f"no sample {name}")
+        self.played.append((name, volume))
+
+    # --- Test controls ---
+
+    def change(self, sink, value):
+        """Change a sink volume as another client would"""
+        with self._cond:
+            self.sinks[sink] = value
+            self.serial += 1
+            self._cond.notify_all()
+
+    def restart(self, downtime=0.0):
+        """Drop every connection and the sample cache, optionally refusing new connections for `downtime` seconds"""
+        with self._cond:
+            self.generation += 1
+            self.samples.clear()
+            self.down = downtime > 0
+            self._cond.notify_all()
+        if downtime > 0:
+            threading.Timer(downtime, lambda: setattr(self, 'down', False)).start()
+
+
+def main():
+    server = FakePulseServer()
+    volume = PulseVolume(sink='camilladsp_out', backend=server)
+    seen = []
+    volume.subscribe(seen.append)
+
+    assert volume.get() == 75
+    volume.set(40)
+    server.change('camilladsp_out', 0.6)
+    time.sleep(0.3)
+    print(f"after set + external change: get()={volume.get()} events={seen}")
+
+    server.restart(downtime=0.5)
+    server.change('camilladsp_out', 0.3)
+    time.sleep(3)
+    print(f"after restart: get()={volume.get()} events={seen} connections={server.connections}")
+
+    samples = PulseSamples(volume)
+    with tempfile.NamedTemporaryFile(suffix='.wav') as sound:
+        samples.play(sound.name, 0.6)
+        server.restart()
+        samples.play(sound.name, 0.6)  # the cache is empty now: uploaded again, not failed
+        print(f"sample cache across a restart: played={len(server.played)} cached={sorted(server.samples)}")
+    volume.close()
+
+
+if __name__ == '__main__':
+    main()
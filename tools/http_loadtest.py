@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+OaKhz Audio - HTTP load test for the equalizer web server
+Runs N concurrent clients against the web UI routes and prints p50/p99 latency
+per route. Without --url it starts a local stand-in: a WSGI app with the latency
+profile of the speaker (a slow D-Bus call on /api/media/info, fast volume calls,
+captive-portal probes answered by captive_portal.py) served by async_server.py, or by a single-threaded
+wsgiref server with --server wsgiref for comparison.
+
+    python3 tools/http_loadtest.py                       # stand-in on async_server
+    python3 tools/http_loadtest.py --server wsgiref      # stand-in, blocking server
+    python3 tools/http_loadtest.py --url http://192.168.50.1
+
+Stdlib only.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+from wsgiref.simple_server import make_server, WSGIRequestHandler
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'system-files', 'opt', 'oakhz'))
+import async_server  # noqa: E402
+from captive_portal import ProbeResponder  # noqa: E402
+
+# Request mix of one client loop: (method, path), weighted like a page open + probes
+REQUEST_MIX = [
+    ('GET', '/api/volume'),
+    ('GET', '/api/equalizer'),
+    ('GET', '/api/system/info'),
+    ('GET', '/api/media/info'),
+    ('GET', '/generate_204'),
+    ('GET', '/hotspot-detect.html'),
+    ('GET', '/connecttest.txt'),
+]
+
+# Seconds each stand-in route blocks; media info stands for a slow D-Bus round trip
+STANDIN_DELAYS = {
+    '/api/media/info': 0.5,
+    '/api/volume': 0.01,
+    '/api/equalizer': 0.002,
+    '/api/system/info': 0.001,
+}
+STANDIN_LIMITS = {'/api/media/info': 4}
+
+
+def standin_app(environ, start_response):
+    """WSGI app with the speaker's latency profile"""
+    path = environ['PATH_INFO']
+    time.sleep(STANDIN_DELAYS.get(path, 0))
+    if path.startswith('/api/'):
+        body = json.dumps({'status': 'ok', 'path': path}).encode()
+        start_response('200 OK', [('Content-Type', 'application/json'),
+                                  ('Content-Length', str(len(body)))])
+        return [body]
+    start_response('302 Found', [('Location', 'http://192.168.50.1/'), ('Content-Length', '0')])
+    return [b'']
+
+
+def start_standin(server, port):
+    probes = ProbeResponder()
+    if server == 'wsgiref':
+        class QuietHandler(WSGIRequestHandler):
+            def log_message(self, *args):
+                pass
+        httpd = make_server('127.0.0.1', port, probes.middleware(standin_app), handler_class=QuietHandler)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    else:
+        threading.Thread(target=async_server.serve, daemon=True, args=(standin_app, '127.0.0.1', port),
+                         kwargs={'limits': STANDIN_LIMITS, 'fast_path': probes.fast_path}).start()
+    time.sleep(0.5)
+
+
+# --- Client ---
+
+class Connection:
+    """Minimal HTTP/1.1 client connection with keep-alive"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n\r\n".encode())
+        await self.writer.drain()
+        version, status = (await self.reader.readline()).split()[:2]
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        length = headers.get('content-length')
+        if length is not None:
+            await self.reader.readexactly(int(length))
+        else:
+            await self.reader.read()
+        if length is None or version != b'HTTP/1.1' or headers.get('connection', '').lower() == 'close':
+            self.close()
+        return int(status)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+async def client(host, port, rounds, latencies, errors):
+    conn = Connection(host, port)
+    for _ in range(rounds):
+        for method, path in REQUEST_MIX:
+            start = time.monotonic()
+            try:
+                status = await conn.request(method, path)
+                if status >= 500:
+                    errors[path] = errors.get(path, 0) + 1
+                    continue
+            except (OSError, asyncio.IncompleteReadError, IndexError):
+                errors[path] = errors.get(path, 0) + 1
+                conn.close()
+                continue
+            latencies.setdefault(path, []).append(time.monotonic() - start)
+    conn.close()
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def run(host, port, clients, rounds):
+    latencies, errors = {}, {}
+    start = time.monotonic()
+    await asyncio.gather(*(client(host, port, rounds, latencies, errors) for _ in range(clients)))
+    elapsed = time.monotonic() - start
+
+    print(f"{clients} clients x {rounds} rounds in {elapsed:.1f}s")
+    print(f"{'route':<24}{'n':>6}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for _, path in REQUEST_MIX:
+        values = latencies.get(path, [])
+        if values:
+            print(f"{path:<24}{len(values):>6}{percentile(values, 50) * 1000:>10.1f}"
+                  f"{percentile(values, 99) * 1000:>10.1f}{errors.get(path, 0):>8}")
+        elif path in errors:
+            print(f"{path:<24}{0:>6}{'-':>10}{'-':>10}{errors[path]:>8}")
+    fast = [v for p, vs in latencies.items() if p != '/api/media/info' for v in vs]
+    if fast:
+        print(f"{'all but media/info':<24}{len(fast):>6}{statistics.median(fast) * 1000:>10.1f}"
+              f"{percentile(fast, 99) * 1000:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent-client latency test for the web UI')
+    parser.add_argument('--url', help='server to test (default: start a local stand-in)')
+    parser.add_argument('--server', choices=('async', 'wsgiref'), default='async',
+                        help='server for the local stand-in')
+    parser.add_argument('--port', type=int, default=8099, help='port for the local stand-in')
+    parser.add_argument('--clients', type=int, default=20)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        host, port = '127.0.0.1', args.port
+        start_standin(args.server, port)
+    asyncio.run(run(host, port, args.clients, args.rounds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+OaKhz Audio - Loudness ramp checks across a controller restart
+config.yml is saved with the compensated loudness gains, so a restarted
+eq_server must ramp from those, not from the voicing gains. This starts a fresh
+EqualizerController on a scratch copy of config.yml carrying the compensation for
+a low volume (with the PulseAudio stand-in of fake_pulse.py, no CamillaDSP and
+nothing written back), records the steps of its loudness ramp and checks that
+none of them jumps.
+
+    python3 tools/loudness_check.py
+    python3 tools/loudness_check.py --config system-files/opt/camilladsp/config.clean.yml
+
+Needs flask and ruamel.yaml.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.join(TOOLS_DIR, '..')
+sys.path.insert(0, os.path.join(REPO, 'system-files', 'opt', 'oakhz'))
+sys.path.insert(0, TOOLS_DIR)
+
+SCRATCH = tempfile.mkdtemp(prefix='oakhz-loudness-')
+os.environ['HOME'] = SCRATCH  # ~/.oakhz_eq.json of the controller
+
+import pulse_client  # noqa: E402
+from fake_pulse import FakePulseServer  # noqa: E402
+pulse_client.PulsectlBackend = FakePulseServer
+import eq_server  # noqa: E402
+from loudness import LOUDNESS_RAMP_DB_PER_SECOND, LOUDNESS_RAMP_INTERVAL  # noqa: E402
+
+CONFIG = os.path.join(REPO, 'system-files', 'opt', 'camilladsp', 'config-boostq.yml')  # has loudness filters
+VOLUME = 20            # % the compensated config was saved at
+SETTLE = 3.0           # seconds allowed for a ramp to finish
+STEP = round(LOUDNESS_RAMP_DB_PER_SECOND * LOUDNESS_RAMP_INTERVAL, 1)
+
+
+def restart(config_path, adaptive):
+    """A new controller, as after a restart, on config.yml saved with the compensation at VOLUME"""
+    path = os.path.join(SCRATCH, 'config.yml')
+    shutil.copy(config_path, path)
+    saved = eq_server.CamillaDSPConfig(path)
+    saved.set_filter_gains(eq_server.eq.loudness_table[VOLUME])
+    saved.schedule_write()
+    saved.flush()
+    with open(os.path.join(SCRATCH, '.oakhz_eq.json'), 'w') as f:
+        json.dump(dict(eq_server.eq.config, adaptive_volume=adaptive), f)
+
+    eq = eq_server.EqualizerController(path)
+    steps = []
+    eq.loudness.apply = steps.append  # CamillaDSP is not running: record the steps instead
+    return eq, steps
+
+
+def settle(eq, target):
+    deadline = time.monotonic() + SETTLE
+    while eq.loudness.current != target and time.monotonic() < deadline:
+        time.sleep(LOUDNESS_RAMP_INTERVAL)
+
+
+def largest_step(start, steps):
+    largest = 0.0
+    for gains in steps:
+        largest = max([largest] + [abs(gains[name] - start[name]) for name in gains])
+        start = gains
+    return round(largest, 1)
+
+
+def check(name, ok, detail):
+    print(f"{'ok  ' if ok else 'FAIL'} {name:<40}{detail}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the loudness ramp after a restart from a compensated config')
+    parser.add_argument('--config', default=CONFIG, help='CamillaDSP config to start from')
+    args = parser.parse_args()
+
+    compensated = eq_server.eq.loudness_table[VOLUME]
+    voicing = {name: base for name, (base, _, _) in eq_server.LOUDNESS_FILTERS.items()}
+    results = []
+
+    eq, steps = restart(args.config, adaptive=True)
+    results.append(check('ramp starts from the saved gains', eq.loudness.current == compensated,
+                         f"start {eq.loudness.current}, saved {compensated}"))
+    eq.on_volume(VOLUME + 10)
+    settle(eq, eq.loudness_table[VOLUME + 10])
+    results.append(check('first adaptive step does not jump', bool(steps) and
+                         largest_step(compensated, steps) <= STEP,
+                         f"{len(steps)} step(s), largest {largest_step(compensated, steps)} dB (max {STEP})"))
+
+    eq, steps = restart(args.config, adaptive=False)
+    eq._sync_loudness()
+    settle(eq, voicing)
+    results.append(check('adaptive off ramps back to voicing', bool(steps) and steps[-1] == voicing,
+                         f"{len(steps)} step(s), ends at {steps[-1] if steps else eq.loudness.current}"))
+    results.append(check('ramp back does not jump', largest_step(compensated, steps) <= STEP,
+                         f"largest {largest_step(compensated, steps)} dB (max {STEP})"))
+
+    print(f"{sum(results)}/{len(results)} passed")
+    shutil.rmtree(SCRATCH, ignore_errors=True)
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+OaKhz Audio - Simulated encoder input for the volume acceleration curve
+Loads oakhz-rotary.py and drives its VolumeController with timed detent
+sequences (slow turns, flicks, spins, reversals), in real time, as the encoder
+callbacks would. PulseAudio is the in-process stand-in of fake_pulse.py, which
+records every volume write and can change the volume as the web UI or a phone
+would. Each sequence is checked for the steps the curve gave, the final volume
+and the spacing of the writes (one per VOLUME_FRAME at most).
+
+    python3 tools/rotary_sim.py
+    python3 tools/rotary_sim.py --config ~/.oakhz_rotary.json --table
+
+Checks assume the default curve; with --config they are reported but not enforced
+(the write spacing and the final volume always are). Needs gpiozero, which
+oakhz-rotary.py imports.
+"""
+import argparse
+import importlib.util
+import os
+import sys
+import threading
+import time
+from importlib.machinery import SourceFileLoader
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.join(TOOLS_DIR, '..')
+sys.path.insert(0, os.path.join(REPO, 'system-files', 'opt', 'oakhz'))
+sys.path.insert(0, TOOLS_DIR)
+
+import pulse_client  # noqa: E402
+from pulse_client import PulseVolume  # noqa: E402
+from fake_pulse import FakePulseServer  # noqa: E402
+from volume_accel import Accelerator, AccelerationCurve, load_curve  # noqa: E402
+
+ROTARY_SCRIPT = os.path.join(REPO, 'system-files', 'usr', 'local', 'bin', 'oakhz-rotary.py')
+START_VOLUME = 50
+SETTLE = 0.2  # seconds left to the writer after the last detent
+
+
+class RecordingPulse(FakePulseServer):
+    """Fake server keeping (time, percent) of every volume write"""
+
+    def __init__(self):
+        super().__init__({'camilladsp_out': START_VOLUME / 100})
+        self.writes = []
+
+    def set_volume(self, conn, sink, value):
+        self.writes.append((time.monotonic(), round(value * 100)))
+        super().set_volume(conn, sink, value)
+
+
+def load_rotary():
+    """oakhz-rotary.py as a module; its PulseVolume gets a fake backend, its main() is not run"""
+    pulse_client.PulsectlBackend = FakePulseServer
+    loader = SourceFileLoader('oakhz_rotary', ROTARY_SCRIPT)
+    module = importlib.util.module_from_spec(importlib.util.spec_from_loader(loader.name, loader))
+    loader.exec_module(module)
+    module.logger.setLevel('WARNING')
+    return module
+
+
+def turn(count, rate, start=0.0, direction=1):
+    """Timestamps and directions of `count` evenly spaced detents at `rate` detents/s"""
+    return [(start + i / rate, direction) for i in range(count)]
+
+
+def simulate(rotary, curve, detents, external=()):
+    """Play `detents` = [(time, direction)] into a fresh VolumeController: (steps, writes, final volume).
+
+    `external` = [(time, percent)] are volume changes made by another client.
+    """
+    server = RecordingPulse()
+    rotary.pulse = PulseVolume(backend=server)
+    controller = rotary.VolumeController()
+    controller.accel = Accelerator(curve)
+    steps = []
+    detent = controller.accel.detent
+
+    def recording_detent(direction, now=None):
+        step = detent(direction, now)
+        steps.append(step)
+        return step
+    controller.accel.detent = recording_detent
+
+    controller.start()
+    start = time.monotonic()
+    for at, percent in external:
+        threading.Timer(at, server.change, ('camilladsp_out', percent / 100)).start()
+    for at, direction in detents:
+        delay = start + at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        controller.step(direction)
+    time.sleep(SETTLE)
+    rotary.pulse.close()
+    return steps, server.writes, controller.volume
+
+
+SCENARIOS = [
+    # name, detents, external changes, check(steps, writes, final volume)
+    ('single detent', turn(1, 1), [], lambda s, w, v: s == [1] and v == 51),
+    ('slow turn 3/s', turn(10, 3), [], lambda s, w, v: s == [1] * 10 and v == 60),
+    ('steady turn 8/s', turn(10, 8), [], lambda s, w, v: max(s) <= 2 and v == START_VOLUME + sum(s)),
+    ('flick 30/s', turn(10, 30), [], lambda s, w, v: 10 < sum(s) < 50 and v == START_VOLUME + sum(s)),
+    ('spin 60/s', turn(20, 60), [], lambda s, w, v: max(s) == 8 and v == 100 and len(w) < 20),
+    ('spin then fine down', turn(20, 60) + turn(3, 3, start=1.0, direction=-1), [],
+     lambda s, w, v: s[-3:] == [-1, -1, -1] and v == 97),
+    ('spin, instant reversal', turn(10, 60) + turn(3, 60, start=10 / 60, direction=-1), [],
+     lambda s, w, v: s[10] == -1),
+    ('pause mid-turn', turn(10, 60) + turn(2, 60, start=0.6), [],
+     lambda s, w, v: s[10] == 1 and v == 100),
+    # set to 20% from the web UI between two detents: the next detent wakes the writer together
+    # with the change, which must be kept, and the remaining 7 detents apply on top of it
+    ('external change mid-turn', turn(10, 2), [(1.25, 20)], lambda s, w, v: v == 27),
+]
+
+
+def check_writes(writes, final, frame):
+    """At most one write per frame, and the last one is the controller's volume"""
+    spaced = all(b[0] - a[0] >= frame * 0.9 for a, b in zip(writes, writes[1:]))
+    return spaced and bool(writes) and writes[-1][1] == final
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Drive the rotary volume controller with simulated input')
+    parser.add_argument('--config', help='rotary config file with a volume_acceleration section')
+    parser.add_argument('--table', action='store_true', help='print the step for a range of rates')
+    args = parser.parse_args()
+
+    rotary = load_rotary()
+    curve = load_curve(args.config) if args.config else AccelerationCurve()
+    print(f"curve: {curve.to_dict()}")
+    if args.table:
+        for rate in (1, 3, 5, 8, 10, 15, 20, 30, 40, 60):
+            print(f"  {rate:>3} detents/s -> {curve.step(rate)}%")
+
+    results = []
+    for name, detents, external, check in SCENARIOS:
+        steps, writes, final = simulate(rotary, curve, detents, external)
+        ok = check_writes(writes, final, rotary.VOLUME_FRAME)
+        ok = ok and (args.config is not None or check(steps, writes, final))
+        results.append(ok)
+        duration = detents[-1][0] - detents[0][0]
+        print(f"{'ok  ' if ok else 'FAIL'} {name:<24}{len(detents):>3} detents in {duration:.2f} s -> "
+              f"{final:>3}%, {len(writes)} write(s)  steps {steps}")
+    print(f"{sum(results)}/{len(results)} passed")
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+OaKhz Audio - Event sound latency, paplay vs the PulseAudio sample cache
+Run on the speaker (needs python3-pulsectl and a running PulseAudio). Each sound
+is triggered the old way (a paplay process streaming the file) and the new way
+(PulseSamples playing the cached sample by name). The latency is the time from
+the trigger to PulseAudio creating the playback stream's sink input, which is
+when the first samples are mixed into the sink.
+
+    sudo -u oakhz PULSE_SERVER=unix:/run/pulse/native python3 tools/sound_latency.py --runs 10
+
+Drop the page cache first (echo 1 > /proc/sys/vm/drop_caches) to see the cold SD
+card read paplay pays after boot.
+"""
+import argparse
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+import pulsectl
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'system-files', 'opt', 'oakhz'))
+from pulse_client import PulseVolume, PulseSamples, PULSE_SERVER  # noqa: E402
+
+SOUNDS_DIR = '/opt/oakhz/sounds'
+SOUNDS = ('connect.wav', 'disconnect.wav', 'ready.wav')
+
+
+def watch_sink_inputs(events, stop):
+    """Put perf_counter() timestamps of new sink inputs on `events`"""
+    with pulsectl.Pulse('oakhz-latency-watch', server=PULSE_SERVER) as conn:
+        def on_event(ev):
+            if ev.t == 'new':
+                events.put(time.perf_counter())
+        conn.event_mask_set('sink_input')
+        conn.event_callback_set(on_event)
+        while not stop.is_set():
+            conn.event_listen(timeout=0.5)
+
+
+def measure(trigger, events, timeout=5.0):
+    while not events.empty():
+        events.get_nowait()
+    start = time.perf_counter()
+    done = trigger()
+    try:
+        latency = events.get(timeout=timeout) - start
+    except queue.Empty:
+        latency = None
+    if done:
+        done()
+    return latency
+
+
+def paplay(path):
+    def trigger():
+        process = subprocess.Popen(['paplay', '--volume', str(int(65536 * 0.6)), path],
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return process.wait
+    return trigger
+
+
+def cached(samples, path):
+    def trigger():
+        samples.play(path, 0.6)
+        return lambda: time.sleep(1.0)  # let the sound finish, as paplay.wait does
+    return trigger
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure event sound latency, paplay vs sample cache')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--sounds-dir', default=SOUNDS_DIR)
+    args = parser.parse_args()
+
+    events = queue.Queue()
+    stop = threading.Event()
+    threading.Thread(target=watch_sink_inputs, args=(events, stop), daemon=True).start()
+    time.sleep(0.5)
+
+    samples = PulseSamples(PulseVolume())
+    paths = [os.path.join(args.sounds_dir, name) for name in SOUNDS]
+    start = time.perf_counter()
+    samples.preload(paths)
+    print(f"uploaded {len(paths)} sounds in {(time.perf_counter() - start) * 1000:.0f} ms (once, at startup)")
+
+    print(f"{'sound':<16}{'method':<10}{'p50 ms':>9}{'max ms':>9}")
+    for path in paths:
+        for method, trigger in (('paplay', paplay(path)), ('cache', cached(samples, path))):
+            latencies = [measure(trigger, events) for _ in range(args.runs)]
+            ok = sorted(l for l in latencies if l is not None)
+            if not ok:
+                print(f"{os.path.basename(path):<16}{method:<10}{'no stream seen':>18}")
+                continue
+            print(f"{os.path.basename(path):<16}{method:<10}{ok[len(ok) // 2] * 1000:>9.1f}{ok[-1] * 1000:>9.1f}")
+    stop.set()
+
+
+if __name__ == '__main__':
+    main()